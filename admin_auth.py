@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+# bcrypt bir denemede ~100-300 ms CPU harcar; event loop yerine bu havuzda çalışır.
+# bcrypt hesaplama sırasında GIL'i bırakır, yani işler gerçekten paralel yürür.
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+# Kuyrukta bekleyebilecek en fazla iş; fazlası beklemeden reddedilir
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 16))
+# Doğrulanmış admin'in token'a göre önbellekte kalma süresi (sn)
+ADMIN_PRINCIPAL_TTL = int(os.getenv('ADMIN_PRINCIPAL_TTL', 30))
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """bcrypt işlerini sınırlı bir thread havuzunda çalıştırır"""
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_pending: int = BCRYPT_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class PrincipalCache:
+    """JWT -> Admin önbelleği; admin panelinin periyodik istekleri veritabanına gitmez.
+
+    Anahtar token'daki jti (eski token'larda token'ın hash'i). Şifre değişince ya da
+    admin silinince invalidate_admin() ile o admin'in tüm girdileri atılır; diğer
+    worker'larda girdi en fazla ADMIN_PRINCIPAL_TTL saniye yaşar.
+    """
+
+    def __init__(self, ttl: int = ADMIN_PRINCIPAL_TTL, maxsize: int = 1024):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(token: str, payload: dict) -> str:
+        return payload.get('jti') or hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def put(self, key: str, admin):
+        self._cache[key] = admin
+
+    def invalidate_admin(self, admin_id: int):
+        for key, admin in list(self._cache.items()):
+            if admin.id == admin_id:
+                self._cache.pop(key, None)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger('instatest')
+
+# Çözünürlük -> (bucket süresi sn, saklama süresi sn)
+RESOLUTIONS = {
+    'hour': (3600, 35 * 86400),
+    'day': (86400, 730 * 86400),
+}
+
+DIMENSIONS = ('media_type', 'format', 'lang', 'status')
+
+# Sorgu başına okunabilecek en fazla bucket (ör. 31 günlük saatlik seri = 744)
+MAX_BUCKETS = 1000
+
+# Hata yanıtı alıp bir sonraki flush'ı bekleyen en fazla komut (kalıcı WRONGTYPE'ta büyümesin)
+MAX_RETRY_COMMANDS = 10000
+
+
+def _bucket(timestamp: float, resolution: str) -> int:
+    step = RESOLUTIONS[resolution][0]
+    return int(timestamp // step * step)
+
+
+def pick_resolution(start: float, end: float) -> str:
+    return 'hour' if end - start <= 3 * 86400 else 'day'
+
+
+class DownloadAnalytics:
+    """İndirme istatistikleri: istek yolunda sadece process içi sayaçlar artar,
+    flush() bunları tek pipeline ile Redis'e yazar.
+
+    analytics:{resolution}:{bucket} hash'inde "n|media|format|lang|status" alanı
+    indirme sayısını, "b|..." alanı gönderilen byte'ı tutar. Tekil istemciler
+    analytics:uniq:{resolution}:{bucket} HyperLogLog'unda (~12 KB, %0.8 hata) sayılır.
+    """
+
+    def __init__(self, redis_client, prefix: str = 'analytics'):
+        self.redis = redis_client
+        self.prefix = prefix
+        self._counts = defaultdict(lambda: [0, 0])
+        self._clients = defaultdict(set)
+        # Hata yanıtı alan komutlar: (komut, anahtar, çözünürlük, argümanlar)
+        self._retry = []
+
+    def _key(self, resolution: str, bucket: int) -> str:
+        return f"{self.prefix}:{resolution}:{bucket}"
+
+    def _uniq_key(self, resolution: str, bucket: int) -> str:
+        return f"{self.prefix}:uniq:{resolution}:{bucket}"
+
+    def record(self, media_type: str, format_type: str, lang: str, status: str,
+               client_id: Optional[str], nbytes: int = 0, count: int = 1, timestamp: float = None):
+        """İndirmeyi tamponla (Redis'e gitmez)"""
+        hour = _bucket(timestamp or time.time(), 'hour')
+        entry = self._counts[(hour, media_type, format_type, lang, status)]
+        entry[0] += count
+        entry[1] += nbytes
+        if client_id and count:
+            self._clients[hour].add(client_id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._counts)
+
+    async def flush(self):
+        """Tamponu saatlik ve günlük bucket'lara tek pipeline ile yaz.
+
+        Pipeline transaction değil: bir komutun hatası diğerlerini geri almaz. Sadece
+        hata yanıtı alan komutlar tekrar denenir; bağlantı gönderimden sonra koparsa
+        hangi HINCRBY'ların uygulandığı bilinmez, çift saymamak için bunlar düşürülür.
+        """
+        if not self._counts and not self._clients and not self._retry:
+            return
+        counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+        clients, self._clients = self._clients, defaultdict(set)
+        commands, self._retry = self._retry, []
+
+        for (hour, *dims), (count, nbytes) in counts.items():
+            field = '|'.join(dims)
+            for resolution in RESOLUTIONS:
+                key = self._key(resolution, _bucket(hour, resolution))
+                if count:
+                    commands.append(('hincrby', key, resolution, (f"n|{field}", count)))
+                if nbytes:
+                    commands.append(('hincrby', key, resolution, (f"b|{field}", nbytes)))
+        for hour, members in clients.items():
+            for resolution in RESOLUTIONS:
+                key = self._uniq_key(resolution, _bucket(hour, resolution))
+                commands.append(('pfadd', key, resolution, tuple(members)))
+
+        pipe = self.redis.pipeline(transaction=False)
+        touched = {}
+        for command, key, resolution, args in commands:
+            getattr(pipe, command)(key, *args)
+            touched[key] = resolution
+        for key, resolution in touched.items():
+            pipe.expire(key, RESOLUTIONS[resolution][1])
+
+        try:
+            replies = await pipe.execute(raise_on_error=False)
+        except (RedisConnectionError, RedisTimeoutError, OSError) as e:
+            # PFADD tekrar edilebilir; HINCRBY'lar kısmen uygulanmış olabilir
+            retry = [entry for entry in commands if entry[0] == 'pfadd']
+            self._requeue(retry)
+            logger.error(f"Analytics flush interrupted, dropped {len(commands) - len(retry)} counter writes: {str(e)}")
+            return
+
+        failed = [entry for entry, reply in zip(commands, replies) if isinstance(reply, Exception)]
+        if failed:
+            self._requeue(failed)
+            errors = {str(reply) for reply in replies if isinstance(reply, Exception)}
+            logger.error(f"Analytics flush: {len(failed)} writes failed, retrying next flush: {'; '.join(errors)}")
+
+    def _requeue(self, commands: list):
+        self._retry.extend(commands)
+        if len(self._retry) > MAX_RETRY_COMMANDS:
+            dropped = len(self._retry) - MAX_RETRY_COMMANDS
+            del self._retry[:dropped]
+            logger.error(f"Analytics retry buffer full, dropped {dropped} writes")
+
+    async def run(self, interval: int = 10):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Analytics flush failed: {str(e)}")
+
+    async def query(self, start: float, end: float, resolution: Optional[str] = None,
+                    group_by: tuple = ()) -> dict:
+        """[start, end] aralığındaki bucket'ları ve toplamları döndür (log taraması yok)"""
+        resolution = resolution or pick_resolution(start, end)
+        step = RESOLUTIONS[resolution][0]
+        buckets = list(range(_bucket(start, resolution), int(end) + 1, step))
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Range too large for resolution {resolution} (max {MAX_BUCKETS} buckets)")
+
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(self._key(resolution, bucket))
+            pipe.pfcount(self._uniq_key(resolution, bucket))
+        uniq_keys = [self._uniq_key(resolution, bucket) for bucket in buckets]
+        # Birden fazla HLL'e PFCOUNT birleşimin tahminini verir (aralık boyunca tekil istemci)
+        pipe.pfcount(*uniq_keys)
+        replies = await pipe.execute()
+
+        indexes = [DIMENSIONS.index(name) for name in group_by]
+        series = []
+        totals = {'downloads': 0, 'bytes': 0, 'unique_clients': replies[-1], 'groups': {}}
+        for i, bucket in enumerate(buckets):
+            fields, uniques = replies[2 * i], replies[2 * i + 1]
+            point = {'timestamp': bucket, 'downloads': 0, 'bytes': 0, 'unique_clients': uniques, 'groups': {}}
+            for field, value in fields.items():
+                field = field.decode() if isinstance(field, bytes) else field
+                kind, *dims = field.split('|')
+                metric = 'downloads' if kind == 'n' else 'bytes'
+                value = int(value)
+                point[metric] += value
+                totals[metric] += value
+                if indexes:
+                    group = '|'.join(dims[index] for index in indexes)
+                    for target in (point['groups'], totals['groups']):
+                        target.setdefault(group, {'downloads': 0, 'bytes': 0})[metric] += value
+            series.append(point)
+
+        return {
+            'resolution': resolution,
+            'group_by': list(group_by),
+            'series': series,
+            'totals': totals,
+        }
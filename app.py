@@ -15,15 +15,19 @@ from typing import Optional, Dict
 import json
 from collections import defaultdict
 import asyncio
+from contextlib import asynccontextmanager
+from functools import cached_property
+from cachetools import TTLCache
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 import logging
 import logging.handlers
+import atexit
 import traceback
 import sys
 import redis
 import random
 from pathlib import Path
+from urllib.parse import urlparse
 import aiohttp
 import io
 import requests
@@ -38,10 +42,41 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import secrets
 import jwt
 import tempfile
-import subprocess
 import shutil
 import ssl
 import certifi
+from log_queue import JsonMessage, start_queue_logging
+from metrics import (
+    REQUEST_LATENCY, RATE_LIMIT_REJECTIONS, LOG_RECORDS_DROPPED, CACHE_LOOKUPS,
+    LOADER_POOL_SIZE, LOADER_POOL_IN_USE,
+    STAGE_METADATA, STAGE_LOADER_WAIT, STAGE_UPSTREAM,
+    stage_timer, timed_body, render_metrics
+)
+from tracing import setup_tracing, span, server_span, set_attribute
+from system_monitor import SystemStatusCollector, read_rate_limits
+from timeseries import TimeSeriesStore, RESOLUTIONS, METRICS
+from redis_pool import get_redis, get_async_redis, close_redis
+from redis_manager import register_key
+from http_range import file_response
+from compression import CompressionMiddleware, PrecompressedStaticFiles
+from media_cache import MediaCache, MEDIA_TYPES
+from admin_auth import PasswordHasher, PasswordHasherBusy, PrincipalCache
+from instagram_url import (
+    InstagramURL, parse_instagram_url, is_cdn_url, MEDIA_KINDS, KIND_STORY, KIND_SHARE, KIND_CDN
+)
+from analytics import DownloadAnalytics, DIMENSIONS as ANALYTICS_DIMENSIONS, RESOLUTIONS as ANALYTICS_RESOLUTIONS
+from transcode import AUDIO_CODECS, extract_audio
+from deadline import (
+    REQUEST_DEADLINE, DOWNLOAD_DEADLINE, RETRY_BASE_DELAY, RETRY_MAX_DELAY, DeadlineExceeded,
+    backoff_delay, current_deadline, run_blocking, run_request
+)
+from negative_cache import NegativeCache, classify_error, PERMANENT, LOGIN_REQUIRED, RATE_LIMITED, TRANSIENT
+from circuit_breaker import BREAKERS, CircuitBreaker, CircuitOpen
+from thumbnails import ThumbnailService, FORMAT_TYPES as THUMBNAIL_TYPES, negotiate_format, snap_width
+from profiling import (
+    WorkerProfiler, ProfilerBusy, FORMATS as PROFILE_FORMATS, MAX_PROFILE_SECONDS,
+    should_profile_request, start_request_profile, save_request_profile, request_profile_path
+)
 
 # Logging konfigürasyonu
 def setup_logging():
@@ -100,16 +135,28 @@ def setup_logging():
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
     
-    # Handler'ları logger'a ekle
-    logger.addHandler(general_handler)
-    logger.addHandler(error_handler)
-    logger.addHandler(debug_handler)
-    logger.addHandler(console_handler)
+    handlers = [general_handler, error_handler, debug_handler, console_handler]
+    
+    # LOG_ASYNC=0 ise eski davranış: handler'lar doğrudan logger'a eklenir
+    if os.getenv('LOG_ASYNC', '1') == '0':
+        for handler in handlers:
+            logger.addHandler(handler)
+        return logger, None, None
     
-    return logger
+    # Dosya yazma, rotasyon ve formatlama arka plandaki listener thread'inde yapılır,
+    # event loop sadece kaydı sınırlı kuyruğa bırakır
+    queue_handler, listener = start_queue_logging(
+        logger, handlers, maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    )
+    atexit.register(listener.stop)
+    
+    return logger, queue_handler, listener
 
 # Logger'ı oluştur
-logger = setup_logging()
+logger, log_queue_handler, log_listener = setup_logging()
+
+# OpenTelemetry (OTEL_TRACES_EXPORTER=otlp|file ile açılır)
+setup_tracing('instatest-web')
 
 # SSL context oluştur
 ssl_context = ssl.create_default_context()
@@ -119,22 +166,24 @@ ssl_context.verify_mode = ssl.CERT_NONE
 # SSL uyarılarını kapat
 requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
-# aiohttp için SSL context ayarları
-connector = aiohttp.TCPConnector(ssl=False)
-session = aiohttp.ClientSession(connector=connector)
-
 # Request modeli
 class DownloadRequest(BaseModel):
     url: str  # Only URL is needed, type will be auto-detected
 
+# instaloader'ın tek bir HTTP isteği için bekleyeceği en uzun süre (varsayılanı 300 sn);
+# iptal edilen bir isteğin thread'i loader'ı en fazla bu kadar tutar
+LOADER_REQUEST_TIMEOUT = float(os.getenv('LOADER_REQUEST_TIMEOUT', 15))
+
 # Instaloader instance pool
 class InstaloaderPool:
-    def __init__(self, pool_size: int = 5):
+    def __init__(self, cookie_manager, pool_size: int = 5, breaker: Optional[CircuitBreaker] = None):
         self.pool = []
         self.pool_size = pool_size
         self.current = 0
         self.lock = asyncio.Lock()
-        self.cookie_manager = CookieManager()
+        self.cookie_manager = cookie_manager
+        # Instagram metadata çağrıları bu devre kesiciden geçer
+        self.breaker = breaker
         
         # Her instance için ayrı rate controller
         for _ in range(pool_size):
@@ -147,15 +196,24 @@ class InstaloaderPool:
                 max_connection_attempts=1,  # Tek deneme hakkı
                 filename_pattern="{shortcode}",
                 quiet=True,
-                sleep=True  # Rate limiting aktif
+                sleep=True,  # Rate limiting aktif
+                request_timeout=LOADER_REQUEST_TIMEOUT
             )
             self.pool.append({
                 'loader': loader,
                 'cookie_id': None,
                 'in_use': False
             })
+        
+        LOADER_POOL_SIZE.inc(pool_size)
             
     async def get_loader(self):
+        with stage_timer(STAGE_LOADER_WAIT):
+            instance = await current_deadline().wait(self._checkout())
+        LOADER_POOL_IN_USE.inc()
+        return instance
+    
+    async def _checkout(self):
         async with self.lock:
             # Aktif ve cooldown'da olmayan bir cookie bul
             available_cookies = [c for c in self.cookie_manager.get_cookies() 
@@ -200,25 +258,40 @@ class InstaloaderPool:
             raise HTTPException(status_code=503, 
                               detail="No available loaders")
     
+    async def run(self, instance, func):
+        """instaloader çağrısını thread'de, isteğin kalan bütçesi içinde çalıştır"""
+        def track(future):
+            instance['pending'] = future
+        if self.breaker is None:
+            return await run_blocking(func, on_submit=track)
+        # Bütçe loader beklerken / backoff'ta bittiyse Instagram'a hiç gidilmedi: devreye
+        # hata yazılmasın, half_open'da deneme hakkı harcanmasın
+        current_deadline().timeout()
+        async with self.breaker.guard(is_upstream_failure):
+            return await run_blocking(func, on_submit=track)
+
     async def release_loader(self, instance, success: bool):
         async with self.lock:
             if not success:
                 # Başarısız işlemde cookie'yi cooldown'a al
                 await self.cookie_manager.set_cooldown(instance['cookie_id'])
             
-            instance['in_use'] = False
-            instance['cookie_id'] = None
+            pending = instance.pop('pending', None)
+            if pending is not None and not pending.done():
+                # İptal edilen isteğin thread'i loader'ı hâlâ kullanıyor; bitince boşa çıkar
+                pending.add_done_callback(lambda _: self._free(instance))
+            else:
+                self._free(instance)
+
+    def _free(self, instance):
+        instance['in_use'] = False
+        instance['cookie_id'] = None
+        LOADER_POOL_IN_USE.dec()
 
 class CookieManager:
-    def __init__(self):
+    def __init__(self, redis_client):
         self.cookies_dir = "cookies"
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=int(os.getenv('REDIS_DB', 0)),
-            password=os.getenv('REDIS_PASSWORD', None),
-            decode_responses=True
-        )
+        self.redis_client = redis_client
         
         if not os.path.exists(self.cookies_dir):
             os.makedirs(self.cookies_dir)
@@ -462,29 +535,9 @@ class CookieManager:
 # Global instances
 load_dotenv()
 
-# Redis connection settings
-REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
-REDIS_DB = int(os.getenv('REDIS_DB', 0))
-REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
-
-# Redis client
-redis_client = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    password=REDIS_PASSWORD,
-    decode_responses=True
-)
-
 class RedisRateLimiter:
-    def __init__(self, max_requests=100, time_window=60):
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=int(os.getenv('REDIS_DB', 0)),
-            password=os.getenv('REDIS_PASSWORD', None)
-        )
+    def __init__(self, redis_client, max_requests=100, time_window=60):
+        self.redis_client = redis_client
         self.max_requests = max_requests
         self.time_window = time_window
         
@@ -492,11 +545,15 @@ class RedisRateLimiter:
         try:
             current = self.redis_client.get(key)
             if current is None:
-                self.redis_client.setex(key, self.time_window, 1)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, self.time_window, 1)
+                register_key(pipe, key)
+                pipe.execute()
                 return False
             
             count = int(current)
             if count >= self.max_requests:
+                RATE_LIMIT_REJECTIONS.labels(source='api').inc()
                 return True
             
             self.redis_client.incr(key)
@@ -518,12 +575,6 @@ class RedisRateLimiter:
 class TaskManager:
     def __init__(self):
         self.tasks = {}
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=int(os.getenv('REDIS_DB', 0)),
-            password=os.getenv('REDIS_PASSWORD', None)
-        )
 
     def add_task(self, task_id: str):
         """Yeni task ekle"""
@@ -552,44 +603,210 @@ class TaskManager:
             if current_time - task_data["created_at"] < max_age
         }
 
-rate_limiter = RedisRateLimiter(max_requests=100, time_window=60)
-task_manager = TaskManager()
-cookie_manager = CookieManager()
+class PreviewCache:
+    """/api/preview yanıtlarını shortcode'a göre Redis'te tutar (tüm worker'lar paylaşır).
 
-# Instaloader pool'unu oluştur ve cookie'leri yükle
-loader_pool = InstaloaderPool()
+    Yer tutucu hesaplanınca aynı kayda eklenir; sonraki istekler resmi yeniden çekmez.
+    """
 
-# İlk cookie yükleme işlemini kaldır çünkü artık get_loader() metodu bunu otomatik yapıyor
-try:
-    logger.info("Instaloader pool initialized successfully")
-except Exception as e:
-    logger.error(f"Instaloader pool initialization failed: {str(e)}")
+    def __init__(self, redis_client, ttl: int = None):
+        self.redis = redis_client
+        self.ttl = ttl if ttl is not None else int(os.getenv('PREVIEW_CACHE_TTL', 1800))
+
+    async def get(self, shortcode: str) -> Optional[dict]:
+        try:
+            data = await self.redis.get(f"preview:{shortcode}")
+        except Exception as e:
+            logger.warning(f"Preview cache read failed: {str(e)}")
+            return None
+        CACHE_LOOKUPS.labels(cache='preview', result='hit' if data else 'miss').inc()
+        return json.loads(data) if data else None
+
+    async def put(self, shortcode: str, preview_info: dict, keep_ttl: bool = False):
+        try:
+            key = f"preview:{shortcode}"
+            if keep_ttl:
+                # Yer tutucu eklenirken metadata'nın ömrü uzatılmaz
+                await self.redis.set(key, json.dumps(preview_info), keepttl=True)
+            else:
+                await self.redis.set(key, json.dumps(preview_info), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Preview cache write failed: {str(e)}")
+
+class Services:
+    """Redis client'ı, instaloader pool'u, HTTP session'ı gibi servisleri ilk kullanımda oluşturur.
+
+    Modülü import etmek bağlantı açmaz; her servis ilk erişimde bir kez kurulur,
+    lifespan kapanırken close() ile kapatılır.
+    """
+
+    @cached_property
+    def redis(self) -> redis.Redis:
+        # Tüm bileşenler process'in paylaşılan bağlantı havuzunu kullanır (redis_pool.py)
+        return get_redis()
+
+    @cached_property
+    def redis_async(self) -> "redis.asyncio.Redis":
+        return get_async_redis()
+
+    @cached_property
+    def rate_limiter(self) -> RedisRateLimiter:
+        return RedisRateLimiter(self.redis, max_requests=100, time_window=60)
+
+    @cached_property
+    def task_manager(self) -> TaskManager:
+        return TaskManager()
+
+    @cached_property
+    def cookie_manager(self) -> CookieManager:
+        return CookieManager(self.redis)
+
+    @cached_property
+    def loader_pool(self) -> InstaloaderPool:
+        pool = InstaloaderPool(self.cookie_manager, breaker=self.circuit_breakers['metadata'])
+        logger.info("Instaloader pool initialized successfully")
+        return pool
+
+    @cached_property
+    def status_collector(self) -> SystemStatusCollector:
+        # /system-status bölümlerini arka planda hesaplayan collector
+        return SystemStatusCollector(self.redis, self.cookie_manager)
+
+    @cached_property
+    def health_history(self) -> TimeSeriesStore:
+        # monitor_system_health task'ının yazdığı sağlık geçmişi
+        return TimeSeriesStore(self.redis)
+
+    @cached_property
+    def admin_login_limiter(self) -> "AdminLoginRateLimiter":
+        return AdminLoginRateLimiter(self.redis)
+
+    @cached_property
+    def password_hasher(self) -> PasswordHasher:
+        # bcrypt event loop'ta değil sınırlı bir thread havuzunda çalışır
+        return PasswordHasher()
+
+    @cached_property
+    def admin_principals(self) -> PrincipalCache:
+        return PrincipalCache()
+
+    @cached_property
+    def media_cache(self) -> MediaCache:
+        # İndirilen / dönüştürülen medya, Range ile devam eden indirmeler buradan sunulur
+        return MediaCache()
+
+    @cached_property
+    def thumbnails(self) -> ThumbnailService:
+        # Önizleme küçük resimleri; küçültme ayrı process'lerde, sonuçlar diskte
+        return ThumbnailService()
+
+    @cached_property
+    def preview_cache(self) -> PreviewCache:
+        return PreviewCache(self.redis_async)
+
+    @cached_property
+    def negative_cache(self) -> NegativeCache:
+        # Bulunamayan / gizli / erişilemeyen post'lar kısa süre loader'a gitmeden yanıtlanır
+        return NegativeCache(self.redis_async)
+
+    @cached_property
+    def circuit_breakers(self) -> dict:
+        # Upstream işlemi başına devre kesici; durum Redis'te, tüm worker'larda ortak
+        return {name: CircuitBreaker(self.redis_async, name) for name in BREAKERS}
+
+    @cached_property
+    def analytics(self) -> DownloadAnalytics:
+        # İndirme istatistikleri process içinde birikir, arka planda toplu yazılır
+        return DownloadAnalytics(self.redis_async)
+
+    @cached_property
+    def http_session(self) -> aiohttp.ClientSession:
+        # Event loop içinde, ilk kullanımda oluşturulmalı. Bağlantılar istekler arasında
+        # yeniden kullanılır; cookie'ler paylaşılmasın diye jar tutulmaz, her istek kendi
+        # cookie'lerini cookies= ile gönderir.
+        return aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar())
+
+    async def close(self):
+        if 'password_hasher' in self.__dict__:
+            self.__dict__.pop('password_hasher').shutdown()
+        if 'thumbnails' in self.__dict__:
+            self.__dict__.pop('thumbnails').shutdown()
+        if 'http_session' in self.__dict__:
+            await self.http_session.close()
+            del self.__dict__['http_session']
+        self.__dict__.pop('redis', None)
+        self.__dict__.pop('redis_async', None)
+        await close_redis()
+
+services = Services()
+
+# Admin'in bu worker'da başlattığı CPU / bellek profilleri
+worker_profiler = WorkerProfiler()
+
+# İstek sayacı: middleware sadece process içi sayacı artırır, Redis'e toplu yazılır
+request_counter = 0
+
+async def flush_request_counter(interval: int = 10):
+    global request_counter
+    while True:
+        await asyncio.sleep(interval)
+        count, request_counter = request_counter, 0
+        if count:
+            try:
+                await services.redis_async.incrby('stats:requests_total', count)
+            except Exception as e:
+                request_counter += count
+                logger.error(f"Request counter flush failed: {str(e)}")
 
 # Periyodik temizlik işlemi
 async def periodic_cleanup():
+    reported_drops = 0
     while True:
-        task_manager.cleanup_old_tasks()
+        services.task_manager.cleanup_old_tasks()
+        await asyncio.to_thread(services.media_cache.cleanup)
+        await asyncio.to_thread(services.thumbnails.cleanup)
+        
+        # Log kuyruğu taştıysa düşen kayıt sayısını bildir
+        if log_queue_handler and log_queue_handler.dropped > reported_drops:
+            dropped = log_queue_handler.dropped - reported_drops
+            LOG_RECORDS_DROPPED.inc(dropped)
+            logger.warning(f"Log queue full, {dropped} records dropped")
+            reported_drops += dropped
+        
         await asyncio.sleep(300)  # 5 dakikada bir
 
-app = FastAPI(title="InstaTest - Instagram Media Downloader")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+app = FastAPI(title="InstaTest - Instagram Media Downloader", lifespan=lifespan)
 
 # Templates ve static dosyalar için klasörler
 templates = Jinja2Templates(directory="templates")
 os.makedirs("downloads", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 app.mount("/downloads", StaticFiles(directory="downloads"), name="downloads")
 
 # Admin kimlik doğrulama
-def get_current_admin_from_token(admin_token: str = Cookie(None)):
-    """JWT token'dan admin bilgilerini al"""
+async def get_current_admin_from_token(admin_token: str = Cookie(None)):
+    """JWT token'dan admin bilgilerini al (kısa süreli önbellekten, yoksa veritabanından)"""
     if not admin_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     try:
         payload = jwt.decode(admin_token, "your-secret-key", algorithms=["HS256"])
-        admin = get_admin(payload["sub"])
+        cache_key = services.admin_principals.key(admin_token, payload)
+        admin = services.admin_principals.get(cache_key)
+        if admin is not None:
+            return admin
+        admin = await asyncio.to_thread(get_admin, payload["sub"])
         if not admin:
             raise HTTPException(status_code=401, detail="Invalid token")
+        services.admin_principals.put(cache_key, admin)
         return admin
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -642,9 +859,6 @@ class AdminLoginRateLimiter:
             logger.error(f"Error getting remaining attempts: {str(e)}")
             return 0
 
-# Rate limiter instance'ı oluştur
-admin_login_limiter = AdminLoginRateLimiter(redis_client)
-
 # Admin login sayfası
 @app.get("/admin/login", response_class=HTMLResponse)
 async def admin_login_page(request: Request, error: str = None):
@@ -665,20 +879,24 @@ async def admin_login(
     client_ip = request.client.host
 
     # Brute force koruması
-    if admin_login_limiter.is_locked_out(username, client_ip):
+    if services.admin_login_limiter.is_locked_out(username, client_ip):
         return templates.TemplateResponse(
             "admin_login.html",
             {
                 "request": request,
-                "error": f"Çok fazla başarısız deneme. Lütfen {admin_login_limiter.lockout_minutes} dakika bekleyin."
+                "error": f"Çok fazla başarısız deneme. Lütfen {services.admin_login_limiter.lockout_minutes} dakika bekleyin."
             }
         )
 
-    admin = get_admin(username)
-    if not admin or not verify_admin_password(admin, password):
+    admin = await asyncio.to_thread(get_admin, username)
+    try:
+        password_ok = admin is not None and await services.password_hasher.run(verify_admin_password, admin, password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts in progress, try again shortly")
+    if not password_ok:
         # Başarısız girişi kaydet
-        admin_login_limiter.record_attempt(username, client_ip, success=False)
-        remaining = admin_login_limiter.get_remaining_attempts(username, client_ip)
+        services.admin_login_limiter.record_attempt(username, client_ip, success=False)
+        remaining = services.admin_login_limiter.get_remaining_attempts(username, client_ip)
         
         return templates.TemplateResponse(
             "admin_login.html",
@@ -689,18 +907,19 @@ async def admin_login(
         )
     
     # Başarılı girişi kaydet
-    admin_login_limiter.record_attempt(username, client_ip, success=True)
+    services.admin_login_limiter.record_attempt(username, client_ip, success=True)
     
     # JWT token oluştur
     token_data = {
         "sub": admin.username,
         "id": admin.id,
+        "jti": uuid.uuid4().hex,
         "exp": datetime.utcnow() + timedelta(days=1)
     }
     token = jwt.encode(token_data, "your-secret-key", algorithm="HS256")
     
     # Son giriş zamanını güncelle
-    update_admin_last_login(admin.id)
+    await asyncio.to_thread(update_admin_last_login, admin.id)
     
     # Token'ı cookie olarak kaydet ve yönlendir
     response = RedirectResponse(url="/admin", status_code=302)
@@ -725,7 +944,7 @@ async def admin_panel(
         languages = get_languages()
         
         # Cookie bilgilerini getir
-        cookies = cookie_manager.get_cookies()
+        cookies = services.cookie_manager.get_cookies()
         
         # Admin listesini getir
         admins = get_all_admins()
@@ -756,22 +975,10 @@ async def admin_logout():
 @app.post("/api/admin/admins")
 async def add_admin_endpoint(
     request: Request,
-    admin_token: str = Cookie(None)
+    admin: Admin = Depends(get_current_admin_from_token)
 ):
     """Yeni admin ekle"""
-    if not admin_token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-        
     try:
-        # Token'ı doğrula
-        try:
-            payload = jwt.decode(admin_token, "your-secret-key", algorithms=["HS256"])
-            admin = get_admin(payload["sub"])
-            if not admin:
-                raise HTTPException(status_code=401, detail="Invalid token")
-        except (jwt.ExpiredSignatureError, jwt.JWTError):
-            raise HTTPException(status_code=401, detail="Invalid token")
-            
         data = await request.json()
         username = data.get('username')
         password = data.get('password')
@@ -779,12 +986,16 @@ async def add_admin_endpoint(
         if not all([username, password]):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        new_admin = add_admin(username, password)
+        new_admin = await services.password_hasher.run(add_admin, username, password)
         return {"success": True, "admin": {
             "id": new_admin.id,
             "username": new_admin.username,
             "created_at": new_admin.created_at.isoformat()
         }}
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Password hashing is busy, try again shortly")
     except Exception as e:
         logger.error(f"Add admin error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -792,27 +1003,18 @@ async def add_admin_endpoint(
 @app.delete("/api/admin/admins/{admin_id}")
 async def delete_admin_endpoint(
     admin_id: int,
-    admin_token: str = Cookie(None)
+    admin: Admin = Depends(get_current_admin_from_token)
 ):
     """Admin sil"""
-    if not admin_token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-        
     try:
-        # Token'ı doğrula
-        try:
-            payload = jwt.decode(admin_token, "your-secret-key", algorithms=["HS256"])
-            admin = get_admin(payload["sub"])
-            if not admin:
-                raise HTTPException(status_code=401, detail="Invalid token")
-        except (jwt.ExpiredSignatureError, jwt.JWTError):
-            raise HTTPException(status_code=401, detail="Invalid token")
-            
         if admin.id == admin_id:
             raise HTTPException(status_code=400, detail="Cannot delete yourself")
         
-        delete_admin(admin_id)
+        await asyncio.to_thread(delete_admin, admin_id)
+        services.admin_principals.invalidate_admin(admin_id)
         return {"success": True}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Delete admin error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -906,7 +1108,7 @@ async def add_cookie_endpoint(
             json.dump(cookie_data, f, indent=2)
         
         # Cookie manager'ı yeniden yükle
-        cookie_manager.load_cookies()
+        services.cookie_manager.load_cookies()
         
         return {"success": True}
     except Exception as e:
@@ -925,17 +1127,17 @@ async def delete_cookie_endpoint(
             raise HTTPException(status_code=404, detail="Cookie not found")
         
         # Redis'teki cookie verilerini temizle
-        health_key = cookie_manager._get_cookie_health_key(cookie_id)
-        cooldown_key = cookie_manager._get_cookie_cooldown_key(cookie_id)
-        request_key = cookie_manager._get_request_count_key(cookie_id)
+        health_key = services.cookie_manager._get_cookie_health_key(cookie_id)
+        cooldown_key = services.cookie_manager._get_cookie_cooldown_key(cookie_id)
+        request_key = services.cookie_manager._get_request_count_key(cookie_id)
         
-        redis_client.delete(health_key, cooldown_key, request_key)
+        services.redis.delete(health_key, cooldown_key, request_key)
         
         # Cookie dosyasını sil
         cookie_path.unlink()
         
         # Cookie manager'ı yeniden yükle
-        cookie_manager.load_cookies()
+        services.cookie_manager.load_cookies()
         
         return {"success": True}
     except Exception as e:
@@ -947,8 +1149,7 @@ async def get_cookies_endpoint(
     username: str = Depends(get_current_admin_from_token)
 ):
     try:
-        cookie_manager = CookieManager()
-        cookies = cookie_manager.get_cookies()
+        cookies = services.cookie_manager.get_cookies()
         
         return cookies
     except Exception as e:
@@ -961,115 +1162,158 @@ async def system_status(
 ):
     """Sistem durumu sayfası - Sadece admin erişebilir"""
     try:
-        # Redis durumunu kontrol et
-        redis_status = {"status": "OK", "error": None}
-        try:
-            redis_client.ping()
-            # Rate limit sayacını oku
-            rate_limits = redis_client.keys("rate_limit:*")
-            rate_limit_counts = {
-                key: redis_client.zcard(key)
-                for key in rate_limits
-            }
-            redis_status["rate_limits"] = rate_limit_counts
-        except Exception as e:
-            redis_status = {"status": "ERROR", "error": str(e)}
-
-        # Cookie durumunu kontrol et
-        cookie_status = {"status": "OK", "error": None}
-        try:
-            cookies = []
-            for cookie in cookie_manager.cookies:
-                cookie_id = cookie['id']
-                health_key = cookie_manager._get_cookie_health_key(cookie_id)
-                cooldown_key = cookie_manager._get_cookie_cooldown_key(cookie_id)
-                request_key = cookie_manager._get_request_count_key(cookie_id)
-                
-                health = redis_client.hgetall(health_key) or {}
-                cooldown = redis_client.get(cooldown_key)
-                request_count = redis_client.zcard(request_key)
-                
-                cookies.append({
-                    "id": cookie_id,
-                    "health": health,
-                    "cooldown": cooldown,
-                    "request_count": request_count
-                })
-            cookie_status["cookies"] = cookies
-        except Exception as e:
-            cookie_status = {"status": "ERROR", "error": str(e)}
-
-        # Sistem kaynaklarını kontrol et
-        import psutil
-        system_resources = {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memory": {
-                "total": psutil.virtual_memory().total,
-                "available": psutil.virtual_memory().available,
-                "percent": psutil.virtual_memory().percent
-            },
-            "disk": {
-                "total": psutil.disk_usage('/').total,
-                "used": psutil.disk_usage('/').used,
-                "free": psutil.disk_usage('/').free,
-                "percent": psutil.disk_usage('/').percent
-            }
-        }
-
-        # Log dosyalarının durumunu kontrol et
-        log_status = {"status": "OK", "error": None}
-        try:
-            log_files = {
-                "general": os.path.getsize("logs/instatest.log"),
-                "error": os.path.getsize("logs/error.log"),
-                "debug": os.path.getsize("logs/debug.log")
-            }
-            log_status["files"] = log_files
-        except Exception as e:
-            log_status = {"status": "ERROR", "error": str(e)}
-
-        # Son hataları getir
-        last_errors = []
-        try:
-            with open("logs/error.log", "r") as f:
-                errors = f.readlines()[-10:]  # Son 10 hata
-                last_errors = [error.strip() for error in errors]
-        except Exception as e:
-            last_errors = [f"Error reading log file: {str(e)}"]
-
-        # Veritabanı durumunu kontrol et
-        db_status = {"status": "OK", "error": None}
-        try:
-            session = Session()
-            language_count = session.query(Language).count()
-            translation_count = session.query(Translation).count()
-            db_status["stats"] = {
-                "languages": language_count,
-                "translations": translation_count
-            }
-        except Exception as e:
-            db_status = {"status": "ERROR", "error": str(e)}
-        finally:
-            session.close()
+        # Bölümler arka plandaki collector tarafından hesaplanır, burada sadece snapshot okunur
+        if not services.status_collector.ready:
+            await asyncio.to_thread(services.status_collector.refresh, True)
+        snapshot = services.status_collector.get_snapshot()
 
         # Template'i render et
         return templates.TemplateResponse(
             "system_status.html",
-            {
-                "request": request,
-                "redis_status": redis_status,
-                "cookie_status": cookie_status,
-                "system_resources": system_resources,
-                "log_status": log_status,
-                "last_errors": last_errors,
-                "db_status": db_status
-            },
+            {"request": request, **snapshot},
             headers={"Cache-Control": "no-store"}  # Önbelleklemeyi devre dışı bırak
         )
     except Exception as e:
         logger.error(f"System status page error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/admin/health-history")
+async def health_history_endpoint(
+    metric: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[str] = None,
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """Sistem sağlığı geçmişi (varsayılan: son 24 saat)"""
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric. Available: {', '.join(METRICS)}")
+    if resolution and resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution. Available: {', '.join(RESOLUTIONS)}")
+    
+    end = end or time.time()
+    start = start or end - 86400
+    resolution = resolution or services.health_history.pick_resolution(start, end)
+    points = await asyncio.to_thread(services.health_history.range, metric, start, end, resolution)
+    return {
+        "metric": metric,
+        "resolution": resolution,
+        "points": [{"timestamp": ts, "value": value} for ts, value in points]
+    }
+
+@app.get("/api/admin/analytics")
+async def analytics_endpoint(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[str] = None,
+    group_by: Optional[str] = None,
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """İndirme istatistikleri (varsayılan: son 24 saat, saatlik)"""
+    if resolution and resolution not in ANALYTICS_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution. Available: {', '.join(ANALYTICS_RESOLUTIONS)}")
+    dimensions = tuple(name for name in (group_by or "").split(",") if name)
+    unknown = [name for name in dimensions if name not in ANALYTICS_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimension. Available: {', '.join(ANALYTICS_DIMENSIONS)}")
+    
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 86400
+    try:
+        return await services.analytics.query(start, end, resolution, dimensions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _profile_response(output: str, output_format: str) -> Response:
+    headers = {"Cache-Control": "no-store"}
+    if output_format == "speedscope":
+        # https://www.speedscope.app üzerine sürüklenip açılabilir
+        headers["Content-Disposition"] = f'attachment; filename="profile-{os.getpid()}.speedscope.json"'
+    return Response(content=output, media_type=PROFILE_FORMATS[output_format], headers=headers)
+
+def _check_profile_args(seconds: float, output_format: str = "html"):
+    if not worker_profiler.available:
+        raise HTTPException(status_code=501, detail="pyinstrument is not installed")
+    if output_format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format. Available: {', '.join(PROFILE_FORMATS)}")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+
+@app.get("/api/admin/profile")
+async def profile_status_endpoint(admin: Admin = Depends(get_current_admin_from_token)):
+    """Bu worker'daki profiler durumu"""
+    return worker_profiler.status()
+
+@app.post("/api/admin/profile/cpu")
+async def profile_cpu_endpoint(
+    seconds: float = 10,
+    format: str = "html",
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """Bu worker'ın event loop'unu verilen süre boyunca örnekle"""
+    _check_profile_args(seconds, format)
+    try:
+        output = await worker_profiler.capture(seconds, format)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"CPU profile captured by {admin.username}: {seconds}s, pid {os.getpid()}")
+    return _profile_response(output, format)
+
+@app.post("/api/admin/profile/cpu/start")
+async def profile_cpu_start_endpoint(admin: Admin = Depends(get_current_admin_from_token)):
+    """Profili başlat; /stop çağrılana kadar örnekler"""
+    _check_profile_args(1)
+    try:
+        worker_profiler.start()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"CPU profile started by {admin.username}, pid {os.getpid()}")
+    return worker_profiler.status()
+
+@app.post("/api/admin/profile/cpu/stop")
+async def profile_cpu_stop_endpoint(
+    format: str = "html",
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """Çalışan profili durdur ve çıktısını döndür"""
+    _check_profile_args(1, format)
+    try:
+        output = worker_profiler.stop(format)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _profile_response(output, format)
+
+@app.post("/api/admin/profile/memory")
+async def profile_memory_endpoint(
+    seconds: float = 10,
+    limit: int = 25,
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """Verilen süre içindeki bellek artışlarını tracemalloc ile ölç"""
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+    try:
+        return await worker_profiler.capture_memory(seconds, max(1, min(limit, 200)))
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/admin/profile/requests/{profile_id}", response_class=HTMLResponse)
+async def request_profile_endpoint(
+    profile_id: str,
+    admin: Admin = Depends(get_current_admin_from_token)
+):
+    """X-Profile ile kaydedilmiş istek profili"""
+    path = request_profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrikleri"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 # Middleware'ler
 app.add_middleware(
     CORSMiddleware,
@@ -1078,26 +1322,97 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# HTML/JSON brotli veya gzip ile sıkıştırılır; medya ve Range yanıtları olduğu gibi geçer
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 app.add_middleware(SessionMiddleware, secret_key="your-secret-key")
 
+# Analytics'e indirme olarak sayılan route'lar
+ANALYTICS_ROUTES = {'/api/download-media'}
+_LANG_PATH = re.compile(r'^/([a-z]{2})(?:/|$)')
+
+def _request_language(request: Request) -> str:
+    """İndirmenin yapıldığı sayfanın dili (Referer'daki /tr/ gibi), yoksa Accept-Language"""
+    referer = request.headers.get("referer")
+    if referer:
+        match = _LANG_PATH.match(urlparse(referer).path)
+        if match:
+            return match.group(1)
+        return "en"
+    accept = request.headers.get("accept-language", "")[:2].lower()
+    return accept if accept.isalpha() and len(accept) == 2 else "unknown"
+
+async def _count_download(body_iterator, request: Request, response):
+    """Gönderilen byte'ları say, gövde bitince indirmeyi analytics'e kaydet"""
+    sent = 0
+    try:
+        async for chunk in body_iterator:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        ok = 200 <= response.status_code < 300
+        content_type = response.headers.get("content-type", "")
+        services.analytics.record(
+            media_type=content_type.split("/")[0] if ok and content_type else "none",
+            format_type="sound" if request.query_params.get("format") == "sound" else "original",
+            lang=_request_language(request),
+            status=f"{response.status_code // 100}xx",
+            client_id=request.client.host if request.client else None,
+            nbytes=sent if ok else 0,
+            # Range devam istekleri (206) yeni indirme sayılmaz, sadece byte'ları eklenir
+            count=0 if response.status_code == 206 else 1,
+        )
+
 # Middleware for request logging and language redirection
 @app.middleware("http")
 async def combined_middleware(request: Request, call_next):
+    global request_counter
     # Request başlangıç zamanı
     start_time = time.time()
+    request_counter += 1
     
     # Sistem durumu ve admin sayfası için yönlendirme yapma
     if request.url.path in ["/system-status", "/admin"]:
         return await call_next(request)
     
-    response = await call_next(request)
+    # X-Profile: örneklenen istekler pyinstrument ile profillenir (PROFILE_SAMPLE_RATE)
+    request_profiler = None
+    if not worker_profiler.running and should_profile_request(request.headers):
+        request_profiler = start_request_profile()
+    
+    with server_span(f"{request.method} {request.url.path}", request.headers,
+                     **{"http.method": request.method, "http.target": request.url.path}) as request_span:
+        try:
+            response = await call_next(request)
+        finally:
+            if request_profiler is not None:
+                # Profiler başlatıldığı thread'de durdurulmalı; render etmek ve yazmak thread'de
+                request_profiler.stop()
+                profile_id = await asyncio.to_thread(save_request_profile, request_profiler, request.url.path)
+        if request_span is not None:
+            request_span.set_attribute("http.status_code", response.status_code)
+    
+    if request_profiler is not None:
+        response.headers["X-Profile-Id"] = profile_id
     
     # Response süresini hesapla ve logla
     process_time = time.time() - start_time
     response.headers["X-Process-Time"] = str(process_time)
     
+    # Route şablonu ile etiketle (/api/status/{task_id} gibi), eşleşmeyen path'ler tek etikette toplanır
+    route = request.scope.get("route")
+    REQUEST_LATENCY.labels(
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code
+    ).observe(process_time)
+    
+    # Gövdenin istemciye aktarılma süresi middleware döndükten sonra ölçülür
+    if hasattr(response, "body_iterator"):
+        response.body_iterator = timed_body(response.body_iterator)
+        if route and route.path in ANALYTICS_ROUTES:
+            response.body_iterator = _count_download(response.body_iterator, request, response)
+    
     # Log formatı
     log_dict = {
         "timestamp": datetime.now().isoformat(),
@@ -1108,21 +1423,18 @@ async def combined_middleware(request: Request, call_next):
         "process_time": process_time
     }
     
-    # JSON formatında log
-    logger.info(json.dumps(log_dict))
+    # JSON formatında log - json.dumps listener thread'inde formatlanırken çalışır
+    logger.info(JsonMessage(log_dict), extra={
+        'client_ip': log_dict["client_ip"],
+        'endpoint': log_dict["path"],
+        'response_time': process_time * 1000,
+        'status_code': response.status_code
+    })
     
     return response
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Application starting up", extra={
-        'client_ip': '-',
-        'endpoint': 'startup',
-        'response_time': 0.0,
-        'status_code': 0
-    })
-    
-    # Veritabanını başlat
+def init_database():
+    """Tabloları oluştur, boşsa varsayılan admin, dil ve çevirileri ekle"""
     init_db()
     
     # Varsayılan admin kullanıcısını ekle
@@ -1220,10 +1532,27 @@ async def startup_event():
         logger.error(f"Error adding default languages and translations: {str(e)}")
     finally:
         session.close()
+
+background_tasks = []
+
+async def startup_event():
+    logger.info("Application starting up", extra={
+        'client_ip': '-',
+        'endpoint': 'startup',
+        'response_time': 0.0,
+        'status_code': 0
+    })
     
-    asyncio.create_task(periodic_cleanup())
+    # SQLite işleri event loop'u bloklamasın
+    await asyncio.to_thread(init_database)
+    
+    background_tasks.extend([
+        asyncio.create_task(periodic_cleanup()),
+        asyncio.create_task(services.status_collector.run()),
+        asyncio.create_task(flush_request_counter()),
+        asyncio.create_task(services.analytics.run()),
+    ])
 
-@app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down", extra={
         'client_ip': '-',
@@ -1231,91 +1560,93 @@ async def shutdown_event():
         'response_time': 0.0,
         'status_code': 0
     })
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    try:
+        await services.analytics.flush()
+    except Exception as e:
+        logger.error(f"Analytics flush failed: {str(e)}")
+    await services.close()
 
 # Instagram kimlik bilgileri
 INSTAGRAM_USERNAME = os.getenv('INSTAGRAM_USERNAME')
 INSTAGRAM_PASSWORD = os.getenv('INSTAGRAM_PASSWORD')
 
-# Global Instaloader instance
-L = instaloader.Instaloader(
-    download_video_thumbnails=False,
-    save_metadata=False,
-    download_geotags=False,
-    download_comments=False,
-    post_metadata_txt_pattern="",
-    max_connection_attempts=3,
-    filename_pattern="{shortcode}",
-    quiet=True,
-    sleep=False,  # Rate limiting'i kapat
-    download_pictures=True,
-    download_videos=True,
-    compress_json=False
-)
-
-# SSL ayarlarını güncelle
-L.context._session.verify = False
+def is_upstream_failure(error: BaseException) -> bool:
+    """Metadata devre kesicisi için: zaman aşımı ve rate limit / bağlantı hataları
+    Instagram'ın sorunudur; silinmiş, gizli post ya da login isteyen cookie değildir"""
+    if isinstance(error, (DeadlineExceeded, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, instaloader.exceptions.InstaloaderException):
+        return classify_error(error) in (RATE_LIMITED, TRANSIENT)
+    return False
 
-async def retry_with_backoff(func, max_retries=5, initial_delay=10):
-    """Exponential backoff ile retry mekanizması"""
+async def retry_with_backoff(func, max_retries=5, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Jitter'lı, üst sınırlı backoff ile retry; beklemeler isteğin kalan bütçesinden düşer"""
+    deadline = current_deadline()
     for attempt in range(max_retries):
         try:
-            if asyncio.iscoroutinefunction(func):
-                return await func()
-            else:
-                return func()
+            with span("retry_with_backoff.attempt", attempt=attempt + 1):
+                if asyncio.iscoroutinefunction(func):
+                    return await func()
+                else:
+                    return func()
         except instaloader.exceptions.InstaloaderException as e:
-            if attempt == max_retries - 1:
+            # Silinmiş / gizli post beklemekle düzelmez
+            if attempt == max_retries - 1 or classify_error(e) in PERMANENT:
                 raise
-                
-            # Hata mesajını kontrol et
-            error_msg = str(e).lower()
-            if any(msg in error_msg for msg in ["unauthorized", "please wait", "failed", "not found"]):
-                # Yeni cookie dene
-                try:
-                    # Yeni cookie denemesi için bekle
-                    delay = initial_delay * (2 ** attempt) + random.uniform(1, 5)
-                    logger.warning(f"Retry attempt {attempt + 1}/{max_retries}, waiting {delay:.2f} seconds...")
-                    await asyncio.sleep(delay)
-                except Exception as cookie_error:
-                    logger.error(f"Cookie değiştirme hatası: {str(cookie_error)}")
             
-            # Exponential backoff ile bekle
-            delay = initial_delay * (2 ** attempt) + random.uniform(1, 5)
+            delay = backoff_delay(attempt, base_delay, max_delay)
             logger.warning(f"Retry attempt {attempt + 1}/{max_retries}, waiting {delay:.2f} seconds...")
-            await asyncio.sleep(delay)
+            # Bekledikten sonra deneyecek süre kalmayacaksa DeadlineExceeded
+            await deadline.sleep(delay)
 
 async def download_media_from_instagram(url: str, client_id: str) -> dict:
     """Instagram'dan medya URL'lerini al"""
+    with span("download_media_from_instagram", url=url):
+        return await _download_media_from_instagram(url, client_id)
+
+async def _download_media_from_instagram(url: str, client_id: str) -> dict:
     extra = {
         'client_ip': client_id,
         'url': url
     }
     logger.info(f"Download request received", extra=extra)
     
+    # Geçersiz URL ve yakın zamanda başarısız olmuş post loader havuzuna girmez
+    shortcode = await resolve_shortcode(url)
+    if not shortcode:
+        raise HTTPException(status_code=400, detail="Invalid Instagram URL")
+    set_attribute("instagram.shortcode", shortcode)
+    await services.negative_cache.check(shortcode)
+    # Instagram yanıt vermiyorsa loader ve cookie harcamadan 503
+    await services.circuit_breakers['metadata'].fail_fast()
+    
     current_cookie = None
     loader_instance = None
     try:
         # Get a loader from the pool
-        loader_instance = await loader_pool.get_loader()
+        loader_instance = await services.loader_pool.get_loader()
         loader = loader_instance['loader']
         current_cookie = loader_instance['cookie_id']
         
         # SSL doğrulama ayarlarını güncelle
         loader.context._session.verify = False
         
-        # Get the shortcode from the URL
-        shortcode = get_shortcode_from_url(url)
-        if not shortcode:
-            raise ValueError("Invalid Instagram URL")
-        
         async def download_attempt():
             post = None
             try:
-                # Post.from_shortcode'u sync olarak çağır
-                def get_post():
-                    return instaloader.Post.from_shortcode(loader.context, shortcode)
+                # Post.from_shortcode bloklar; thread'de, kalan bütçe içinde çalışır
+                async def get_post():
+                    with span("instaloader.post_from_shortcode", shortcode=shortcode):
+                        return await services.loader_pool.run(
+                            loader_instance, lambda: instaloader.Post.from_shortcode(loader.context, shortcode)
+                        )
                 
-                post = await retry_with_backoff(get_post)
+                with stage_timer(STAGE_METADATA):
+                    post = await retry_with_backoff(get_post)
             except Exception as e:
                 logger.error(f"Error getting post: {str(e)}", extra=extra)
                 raise
@@ -1342,7 +1673,7 @@ async def download_media_from_instagram(url: str, client_id: str) -> dict:
 
             # Mark cookie as successful
             if current_cookie:
-                cookie_manager.mark_cookie_success({"id": current_cookie})
+                services.cookie_manager.mark_cookie_success({"id": current_cookie})
 
             return {
                 'success': True,
@@ -1356,48 +1687,68 @@ async def download_media_from_instagram(url: str, client_id: str) -> dict:
         result = await download_attempt()
         return result
 
+    except HTTPException:
+        raise
+
     except instaloader.exceptions.ConnectionException as e:
         logger.error(f"Connection error: {str(e)}", extra=extra)
-        if "429" in str(e) and current_cookie:  # Rate limit response
-            cookie_manager.mark_cookie_rate_limited({"id": current_cookie})
-        raise HTTPException(status_code=429, detail="Rate limited. Please try again later.")
+        kind = classify_error(e)
+        if kind == RATE_LIMITED:
+            if current_cookie:
+                services.cookie_manager.mark_cookie_rate_limited({"id": current_cookie})
+            RATE_LIMIT_REJECTIONS.labels(source='instagram').inc()
+        # Zaman aşımı / 5xx transient, 404 not_found olarak önbelleğe girer
+        await services.negative_cache.fail(shortcode, kind)
     
     except instaloader.exceptions.LoginRequiredException as e:
         logger.error(f"Login required: {str(e)}", extra=extra)
         if current_cookie:
-            cookie_manager.mark_cookie_challenge({"id": current_cookie})
-        raise HTTPException(status_code=401, detail="Login required to access this content")
+            services.cookie_manager.mark_cookie_challenge({"id": current_cookie})
+        await services.negative_cache.fail(shortcode, LOGIN_REQUIRED)
 
     except Exception as e:
         logger.error(f"Error downloading media: {str(e)}", extra=extra)
+        kind = classify_error(e)
+        if kind in PERMANENT:
+            await services.negative_cache.fail(shortcode, kind)
         raise HTTPException(status_code=500, detail=f"Failed to download media: {str(e)}")
     
     finally:
         if loader_instance:
-            await loader_pool.release_loader(loader_instance, success=False)
+            await services.loader_pool.release_loader(loader_instance, success=False)
 
 @app.post("/api/download")
 async def handle_download(request: Request, download_req: DownloadRequest):
     """Download endpoint'i"""
+    return await run_request(request, _handle_download(request, download_req), route='/api/download')
+
+async def _handle_download(request: Request, download_req: DownloadRequest):
     try:
         client_id = request.client.host
         task_id = str(uuid.uuid4())
         
-        task_manager.add_task(task_id)
+        services.task_manager.add_task(task_id)
         
         try:
-            result = await download_media_from_instagram(download_req.url, client_id)
-            task_manager.update_task(task_id, "completed", result)
+            with span("handle_download", task_id=task_id):
+                result = await download_media_from_instagram(download_req.url, client_id)
+            services.task_manager.update_task(task_id, "completed", result)
             
             return {
                 "task_id": task_id,
                 "status": "SUCCESS",
                 "result": result
             }
+        except HTTPException as e:
+            # 404 / 403 / 429 gibi durum kodları istemciye olduğu gibi gider
+            services.task_manager.update_task(task_id, "failed", {"error": e.detail})
+            raise
         except Exception as e:
-            task_manager.update_task(task_id, "failed", {"error": str(e)})
+            services.task_manager.update_task(task_id, "failed", {"error": str(e)})
             raise HTTPException(status_code=500, detail=str(e))
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1405,7 +1756,7 @@ async def handle_download(request: Request, download_req: DownloadRequest):
 @app.get("/api/status/{task_id}")
 async def get_status(task_id: str):
     """İndirme durumunu kontrol et"""
-    task = task_manager.get_task(task_id)
+    task = services.task_manager.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task bulunamadı")
     
@@ -1420,22 +1771,15 @@ async def test_redis():
     try:
         # Test value ekle
         test_key = "test:connection"
-        redis_client.set(test_key, "OK", ex=60)  # 60 saniyelik TTL
+        services.redis.set(test_key, "OK", ex=60)  # 60 saniyelik TTL
         
         # Değeri oku
-        value = redis_client.get(test_key)
-        
-        # Rate limit sayacını oku
-        rate_limits = redis_client.keys("rate_limit:*")
-        rate_limit_counts = {
-            key: redis_client.zcard(key)
-            for key in rate_limits
-        }
+        value = services.redis.get(test_key)
         
         return {
             "status": "Redis is working",
             "test_value": value,
-            "rate_limits": rate_limit_counts
+            "rate_limits": read_rate_limits(services.redis)
         }
     except Exception as e:
         return {
@@ -1496,179 +1840,174 @@ async def read_root(request: Request, lang_code: str):
         }
     )
 
-def get_shortcode_from_url(url: str) -> str:
-    """URL'den shortcode çıkar"""
-    # URL'yi temizle
-    url = url.split('?')[0].rstrip('/')
-    
-    # Debug log ekle
-    logger.debug(f"Processing URL: {url}")
-    
-    # Direkt medya URL'si kontrolü
-    if 'cdninstagram.com' in url or 'fbcdn.net' in url:
+# Paylaşım linki -> yönlendirildiği URL (her istekte Instagram'a gitmemek için)
+_share_links = TTLCache(maxsize=1024, ttl=3600)
+
+async def resolve_instagram_url(url: str) -> Optional[InstagramURL]:
+    """URL'yi sınıflandır; /share/ linkleri yönlendirme takip edilerek gerçek post'a çevrilir"""
+    parsed = parse_instagram_url(url)
+    if parsed is None or parsed.kind != KIND_SHARE:
+        return parsed
+    target = _share_links.get(parsed.url)
+    if target is None:
+        try:
+            async with services.http_session.get(parsed.url, allow_redirects=True) as response:
+                target = str(response.url)
+        except aiohttp.ClientError as e:
+            logger.warning(f"Share link could not be resolved: {str(e)}")
+            return None
+        _share_links[parsed.url] = target
+    resolved = parse_instagram_url(target)
+    return resolved if resolved is not None and resolved.kind != KIND_SHARE else None
+
+async def resolve_shortcode(url: str) -> Optional[str]:
+    """Post/reel/tv shortcode'u ya da story_{kullanıcı}_{id}; desteklenmeyen URL için None"""
+    parsed = await resolve_instagram_url(url)
+    if parsed is None or parsed.kind not in MEDIA_KINDS + (KIND_STORY,):
         return None
-    
-    # Story URL'si için özel kontrol
-    story_match = re.search(r'instagram\.com/stories/([^/]+)/(\d+)', url)
-    if story_match:
-        username = story_match.group(1)
-        story_id = story_match.group(2)
-        logger.debug(f"Story match found - username: {username}, id: {story_id}")
-        return f"story_{username}_{story_id}"
-    
-    # Diğer URL tipleri için kontrol
-    patterns = {
-        'post': r'/p/([^/]+)',
-        'reel': r'/reel/([^/]+)',
-        'igtv': r'/tv/([^/]+)',
-    }
-    
-    for media_type, pattern in patterns.items():
-        if match := re.search(pattern, url):
-            logger.debug(f"Matched pattern: {media_type} - {pattern}")
-            return match.group(1)
-                
-    logger.warning(f"No pattern matched for URL: {url}")
-    return None
+    return parsed.cache_key
+
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+def is_cdn_failure(status: int) -> bool:
+    """CDN devre kesicisi için başarısız yanıt: 5xx ve 429 (403/404 tek bir URL'nin sorunu)"""
+    return status >= 500 or status == 429
+
+def is_cdn_error(error: BaseException) -> bool:
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError, DeadlineExceeded))
+
+async def cdn_get(url: str, **kwargs) -> aiohttp.ClientResponse:
+    """CDN isteği devre kesiciden geçer; süre yanıt başlıklarına kadar ölçülür, gövde
+    (uzun videolar) yavaş çağrı sayılmaz. Devre açıksa CircuitOpen. Sadece bağlanılan
+    host doğrulanmış bir Instagram CDN host'uysa devre kullanılır; keyfi adresler (ör.
+    proxy-image'a verilen URL ya da CDN dışına yönlendirme) devreyi etkilemez."""
+    if not is_cdn_url(url):
+        return await services.http_session.get(url, **kwargs)
+    async with services.circuit_breakers['cdn'].guard(is_cdn_error) as call:
+        response = await services.http_session.get(url, **kwargs)
+        call.failed = is_cdn_failure(response.status) and is_cdn_url(str(response.url))
+    return response
 
-def convert_to_mp3(input_file: str) -> str:
-    """Video dosyasını MP3'e dönüştür"""
-    output_file = f"{input_file}.mp3"
+async def _fetch_to_file(url: str, path: str):
+    """Upstream medyayı belleğe almadan parça parça dosyaya yaz"""
+    timeout = aiohttp.ClientTimeout(total=current_deadline().timeout())
+    with stage_timer(STAGE_UPSTREAM):
+        async with await cdn_get(url, timeout=timeout) as response:
+            if response.status != 200:
+                raise HTTPException(status_code=400, detail='Failed to download media')
+            with open(path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(MEDIA_CHUNK_SIZE):
+                    f.write(chunk)
+
+async def _relay_body(response):
     try:
-        subprocess.run([
-            'ffmpeg', '-i', input_file,
-            '-vn', '-acodec', 'libmp3lame',
-            '-ab', '192k', '-ar', '44100',
-            output_file
-        ], check=True)
-        return output_file
-    except subprocess.CalledProcessError as e:
-        logger.error(f"MP3 conversion error: {str(e)}")
-        raise Exception("MP3 dönüşümü başarısız oldu")
-
-def convert_to_mp4(input_file: str) -> str:
-    """Video dosyasını MP4'e dönüştür"""
-    output_file = f"{input_file}.mp4"
-    try:
-        subprocess.run([
-            'ffmpeg', '-i', input_file,
-            '-c:v', 'libx264', '-preset', 'medium',
-            '-c:a', 'aac', '-b:a', '128k',
-            output_file
-        ], check=True)
-        return output_file
-    except subprocess.CalledProcessError as e:
-        logger.error(f"MP4 conversion error: {str(e)}")
-        raise Exception("MP4 dönüşümü başarısız oldu")
+        async for chunk in response.content.iter_chunked(MEDIA_CHUNK_SIZE):
+            yield chunk
+    finally:
+        response.release()
 
 @app.get('/api/download-media')
 async def download_media(request: Request):
+    return await run_request(request, _download_media(request), DOWNLOAD_DEADLINE, route='/api/download-media')
+
+async def _download_media(request: Request):
     try:
         media_url = request.query_params.get('url')
         format_type = request.query_params.get('format', 'original')
+        # Ses için varsayılan: AAC iz m4a'ya kopyalanır, MP3 sadece codec=mp3 ile
+        audio_codec = request.query_params.get('codec', 'auto')
         
         if not media_url:
             raise HTTPException(status_code=400, detail='Media URL is required')
+        if audio_codec not in AUDIO_CODECS:
+            raise HTTPException(status_code=400, detail=f"codec must be one of: {', '.join(AUDIO_CODECS)}")
 
         # Instagram URL kontrolü
-        if 'instagram.com' in media_url:
-            # Instagram API'sini kullan
-            client_id = request.client.host
-            result = await download_media_from_instagram(media_url, client_id)
-            
-            if not result.get('success'):
-                raise HTTPException(status_code=400, detail=result.get('error', 'Failed to process Instagram URL'))
+        # CDN linkleri (scontent.cdninstagram.com) doğrudan aktarılır
+        parsed_url = parse_instagram_url(media_url)
+        if parsed_url is not None and parsed_url.kind != KIND_CDN:
+            variant = f'sound-{audio_codec}' if format_type == 'sound' else 'original'
+            cache_key = f"{await resolve_shortcode(media_url) or media_url}:{variant}"
             
-            # Post türünü kontrol et
-            media_type = result.get('type')
-            if not media_type:
-                # Eğer type belirtilmemişse, URL'den tahmin et
-                media_type = 'video' if '/reel/' in media_url or '/tv/' in media_url else 'image'
-            
-            # Resim ise ve ses dönüşümü isteniyorsa hata ver
-            if media_type == 'image' and format_type == 'sound':
-                raise HTTPException(status_code=400, detail='Cannot convert image to sound. This post contains an image.')
-            
-            media_url = result['media_urls'][0]['url']
-            
-            # Resim dosyası ise direkt indir
-            if media_type == 'image':
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(media_url) as response:
-                        if response.status != 200:
-                            raise HTTPException(status_code=400, detail='Failed to download media')
-                        
-                        content = await response.read()
-                        return StreamingResponse(
-                            io.BytesIO(content),
-                            media_type='image/jpeg',
-                            headers={
-                                'Content-Disposition': f'attachment; filename="instagram_image_{int(time.time())}.jpg"',
-                                'Content-Type': 'image/jpeg'
-                            }
-                        )
-            
-            # Video dosyası ise format kontrolü yap
-            elif media_type == 'video':
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(media_url) as response:
-                        if response.status != 200:
-                            raise HTTPException(status_code=400, detail='Failed to download media')
-                        
-                        temp_dir = tempfile.mkdtemp()
-                        try:
-                            temp_file = os.path.join(temp_dir, f'temp.mp4')
-                            with open(temp_file, 'wb') as f:
-                                f.write(await response.read())
-                            
-                            if format_type == 'sound':
-                                final_file = convert_to_mp3(temp_file)
-                                content_type = 'audio/mpeg'
-                                extension = 'mp3'
-                            else:
-                                final_file = temp_file
-                                content_type = 'video/mp4'
-                                extension = 'mp4'
-                            
-                            with open(final_file, 'rb') as f:
-                                content = f.read()
-                            
-                            return StreamingResponse(
-                                io.BytesIO(content),
-                                media_type=content_type,
-                                headers={
-                                    'Content-Disposition': f'attachment; filename="instagram_media_{int(time.time())}.{extension}"',
-                                    'Content-Type': content_type
-                                }
-                            )
-                        finally:
-                            shutil.rmtree(temp_dir, ignore_errors=True)
-
-        # Direkt medya URL'si
-        async with aiohttp.ClientSession() as session:
-            async with session.get(media_url) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=400, detail='Failed to download media')
+            # Diskte varsa (ör. yarıda kalan indirmenin devamı) Instagram'a hiç gitme
+            cached = services.media_cache.get(cache_key)
+            if cached is None:
+                # Instagram API'sini kullan
+                client_id = request.client.host
+                result = await download_media_from_instagram(media_url, client_id)
                 
-                content_type = response.headers.get('content-type', '')
-                is_video = 'video' in content_type
+                if not result.get('success'):
+                    raise HTTPException(status_code=400, detail=result.get('error', 'Failed to process Instagram URL'))
                 
-                if not is_video and format_type == 'sound':
-                    raise HTTPException(status_code=400, detail='Cannot convert image to sound')
+                # Post türünü kontrol et
+                media_type = result.get('type')
+                if not media_type:
+                    # Eğer type belirtilmemişse, URL'den tahmin et
+                    media_type = 'video' if '/reel/' in media_url or '/tv/' in media_url else 'image'
                 
-                extension = 'mp4' if is_video else 'jpg'
-                filename = f'instagram_media_{int(time.time())}.{extension}'
+                # Resim ise ve ses dönüşümü isteniyorsa hata ver
+                if media_type == 'image' and format_type == 'sound':
+                    raise HTTPException(status_code=400, detail='Cannot convert image to sound. This post contains an image.')
                 
-                content = await response.read()
-                return StreamingResponse(
-                    io.BytesIO(content),
-                    media_type=content_type,
-                    headers={
-                        'Content-Disposition': f'attachment; filename="{filename}"',
-                        'Content-Type': content_type
-                    }
-                )
+                media_url = result['media_urls'][0]['url']
+                
+                work_dir = services.media_cache.tempdir()
+                try:
+                    temp_file = os.path.join(work_dir, 'temp.mp4' if media_type == 'video' else 'temp.jpg')
+                    await _fetch_to_file(media_url, temp_file)
+                    
+                    if media_type == 'image':
+                        final_file, extension = temp_file, 'jpg'
+                    elif format_type == 'sound':
+                        # ffmpeg alt process'i bloklar; event loop diğer istekleri sunmaya devam etsin
+                        final_file, extension = await asyncio.to_thread(extract_audio, temp_file, audio_codec)
+                    else:
+                        final_file, extension = temp_file, 'mp4'
+                    
+                    cached = await asyncio.to_thread(services.media_cache.put, cache_key, extension, final_file), extension
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            
+            path, extension = cached
+            prefix = 'instagram_image' if extension == 'jpg' else 'instagram_media'
+            return file_response(request, path, MEDIA_TYPES[extension], {
+                'Content-Disposition': f'attachment; filename="{prefix}_{int(time.time())}.{extension}"'
+            })
+
+        # Direkt medya URL'si: istemcinin Range / If-Range başlıkları upstream'e iletilir
+        upstream_headers = {
+            name: request.headers[name] for name in ('range', 'if-range') if name in request.headers
+        }
+        # Sıkıştırılmış gövde açılırsa upstream'in Content-Length / Content-Range değerleri tutmaz
+        upstream_headers['Accept-Encoding'] = 'identity'
+        response = await cdn_get(media_url, headers=upstream_headers)
+        if response.status not in (200, 206, 416):
+            response.release()
+            raise HTTPException(status_code=400, detail='Failed to download media')
+        
+        content_type = response.headers.get('content-type', '')
+        is_video = 'video' in content_type
+        
+        if not is_video and format_type == 'sound':
+            response.release()
+            raise HTTPException(status_code=400, detail='Cannot convert image to sound')
+        
+        extension = 'mp4' if is_video else 'jpg'
+        filename = f'instagram_media_{int(time.time())}.{extension}'
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        for name in ('Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified'):
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        
+        return StreamingResponse(
+            _relay_body(response),
+            status_code=response.status,
+            media_type=content_type,
+            headers=headers
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1682,8 +2021,9 @@ async def get_user_stories(username: str):
     for attempt in range(max_retries):
         try:
             # Her denemede yeni bir cookie al
-            new_cookies = cookie_manager.get_next_cookie()
+            new_cookies = services.cookie_manager.get_next_cookie()
             if not new_cookies:
+                RATE_LIMIT_REJECTIONS.labels(source='cookies').inc()
                 raise HTTPException(status_code=429, detail="Tüm cookie'ler kullanımda veya dinleniyor. Lütfen birkaç dakika sonra tekrar deneyin.")
             
             # Instagram API'sine direkt istek at
@@ -1713,114 +2053,113 @@ async def get_user_stories(username: str):
                 'rur': new_cookies.get('rur')
             }
 
-            async with aiohttp.ClientSession() as session:
-                # Story'leri al
-                user_lookup_url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
+            # Story'leri al
+            user_lookup_url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
                 
-                async with session.get(user_lookup_url, headers=headers, cookies=cookies_dict) as response:
-                    response_text = await response.text()
+            async with services.http_session.get(user_lookup_url, headers=headers, cookies=cookies_dict) as response:
+                response_text = await response.text()
                     
-                    if "rate_limit" in response_text.lower():
-                        logger.warning(f"Rate limit detected for cookie")
-                        cookie_manager.mark_cookie_rate_limited(new_cookies)
-                        if attempt < max_retries - 1:
-                            continue
-                        last_error = "Rate limit aşıldı"
+                if "rate_limit" in response_text.lower():
+                    logger.warning(f"Rate limit detected for cookie")
+                    services.cookie_manager.mark_cookie_rate_limited(new_cookies)
+                    if attempt < max_retries - 1:
+                        continue
+                    last_error = "Rate limit aşıldı"
                     
-                    if response.status == 200:
-                        try:
-                            user_data = json.loads(response_text)
-                            if 'data' in user_data and 'user' in user_data['data']:
-                                user_id = user_data['data']['user']['id']
+                if response.status == 200:
+                    try:
+                        user_data = json.loads(response_text)
+                        if 'data' in user_data and 'user' in user_data['data']:
+                            user_id = user_data['data']['user']['id']
                                 
-                                stories_url = f"https://www.instagram.com/api/v1/feed/reels_media/?reel_ids={user_id}"
-                                async with session.get(stories_url, headers=headers, cookies=cookies_dict) as story_response:
-                                    story_text = await story_response.text()
+                            stories_url = f"https://www.instagram.com/api/v1/feed/reels_media/?reel_ids={user_id}"
+                            async with services.http_session.get(stories_url, headers=headers, cookies=cookies_dict) as story_response:
+                                story_text = await story_response.text()
                                     
-                                    if story_response.status == 200:
-                                        try:
-                                            story_data = json.loads(story_text)
+                                if story_response.status == 200:
+                                    try:
+                                        story_data = json.loads(story_text)
                                             
-                                            if 'reels' not in story_data or str(user_id) not in story_data['reels']:
-                                                if attempt < max_retries - 1:
-                                                    continue
-                                                return {
-                                                    "success": True,
-                                                    "username": username,
-                                                    "stories": [],
-                                                    "message": "Kullanıcının aktif story'si bulunmuyor"
-                                                }
+                                        if 'reels' not in story_data or str(user_id) not in story_data['reels']:
+                                            if attempt < max_retries - 1:
+                                                continue
+                                            return {
+                                                "success": True,
+                                                "username": username,
+                                                "stories": [],
+                                                "message": "Kullanıcının aktif story'si bulunmuyor"
+                                            }
                                             
-                                            story_list = []
-                                            items = story_data['reels'][str(user_id)].get('items', [])
+                                        story_list = []
+                                        items = story_data['reels'][str(user_id)].get('items', [])
                                             
-                                            if not items and attempt < max_retries - 1:
-                                                continue
+                                        if not items and attempt < max_retries - 1:
+                                            continue
                                             
-                                            for item in items:
-                                                story_info = {
-                                                    "id": item['id'],
-                                                    "type": "video" if item.get('video_versions') else "photo",
-                                                    "timestamp": datetime.fromtimestamp(item['taken_at']).isoformat(),
-                                                }
+                                        for item in items:
+                                            story_info = {
+                                                "id": item['id'],
+                                                "type": "video" if item.get('video_versions') else "photo",
+                                                "timestamp": datetime.fromtimestamp(item['taken_at']).isoformat(),
+                                            }
                                                 
-                                                if item.get('video_versions'):
-                                                    story_info["url"] = item['video_versions'][0]['url']
-                                                    story_info["thumbnail"] = item['image_versions2']['candidates'][0]['url']
-                                                else:
-                                                    candidates = item['image_versions2']['candidates']
-                                                    best_quality = max(candidates, key=lambda x: x['width'] * x['height'])
-                                                    story_info["url"] = best_quality['url']
-                                                    story_info["thumbnail"] = best_quality['url']
+                                            if item.get('video_versions'):
+                                                story_info["url"] = item['video_versions'][0]['url']
+                                                story_info["thumbnail"] = item['image_versions2']['candidates'][0]['url']
+                                            else:
+                                                candidates = item['image_versions2']['candidates']
+                                                best_quality = max(candidates, key=lambda x: x['width'] * x['height'])
+                                                story_info["url"] = best_quality['url']
+                                                story_info["thumbnail"] = best_quality['url']
                                                 
-                                                story_list.append(story_info)
+                                            story_list.append(story_info)
                                             
-                                            if story_list:
-                                                # Başarılı işlem
-                                                cookie_manager.mark_cookie_success(new_cookies)
-                                                return {
-                                                    "success": True,
-                                                    "username": username,
-                                                    "stories": story_list
-                                                }
-                                            elif attempt < max_retries - 1:
-                                                continue
-                                            else:
-                                                return {
-                                                    "success": True,
-                                                    "username": username,
-                                                    "stories": [],
-                                                    "message": "Kullanıcının aktif story'si bulunmuyor"
-                                                }
-                                        except json.JSONDecodeError:
-                                            if attempt < max_retries - 1:
-                                                continue
-                                            last_error = "Story verisi alınamadı"
-                                    else:
+                                        if story_list:
+                                            # Başarılı işlem
+                                            services.cookie_manager.mark_cookie_success(new_cookies)
+                                            return {
+                                                "success": True,
+                                                "username": username,
+                                                "stories": story_list
+                                            }
+                                        elif attempt < max_retries - 1:
+                                            continue
+                                        else:
+                                            return {
+                                                "success": True,
+                                                "username": username,
+                                                "stories": [],
+                                                "message": "Kullanıcının aktif story'si bulunmuyor"
+                                            }
+                                    except json.JSONDecodeError:
                                         if attempt < max_retries - 1:
                                             continue
-                                        last_error = f"Story'ler alınamadı: {story_text}"
-                        except json.JSONDecodeError:
-                            if attempt < max_retries - 1:
-                                continue
-                            last_error = "Kullanıcı bilgileri alınamadı"
-                    
-                    elif response.status == 400 and "checkpoint_required" in response_text:
-                        logger.error(f"Checkpoint required for cookie")
-                        cookie_manager.mark_cookie_challenge(new_cookies)
+                                        last_error = "Story verisi alınamadı"
+                                else:
+                                    if attempt < max_retries - 1:
+                                        continue
+                                    last_error = f"Story'ler alınamadı: {story_text}"
+                    except json.JSONDecodeError:
                         if attempt < max_retries - 1:
                             continue
-                        last_error = "Oturum doğrulama gerekiyor"
+                        last_error = "Kullanıcı bilgileri alınamadı"
                     
-                    elif response.status == 401:
-                        if attempt < max_retries - 1:
-                            continue
-                        last_error = "Oturum geçersiz"
+                elif response.status == 400 and "checkpoint_required" in response_text:
+                    logger.error(f"Checkpoint required for cookie")
+                    services.cookie_manager.mark_cookie_challenge(new_cookies)
+                    if attempt < max_retries - 1:
+                        continue
+                    last_error = "Oturum doğrulama gerekiyor"
                     
-                    else:
-                        if attempt < max_retries - 1:
-                            continue
-                        last_error = f"Kullanıcı bilgileri alınamadı: {response_text}"
+                elif response.status == 401:
+                    if attempt < max_retries - 1:
+                        continue
+                    last_error = "Oturum geçersiz"
+                    
+                else:
+                    if attempt < max_retries - 1:
+                        continue
+                    last_error = f"Kullanıcı bilgileri alınamadı: {response_text}"
 
         except Exception as e:
             logger.error(f"Error with cookie: {str(e)}")
@@ -1834,18 +2173,33 @@ async def get_user_stories(username: str):
         detail=f"Story'ler alınamadı. Lütfen birkaç dakika sonra tekrar deneyin. Son hata: {last_error}"
     )
 
-@app.get("/api/proxy-image")
-async def proxy_image(url: str):
-    """Resim proxy endpoint'i"""
+# Yer tutucu için resmi çekme / küçültme adımlarının her birine ayrılan süre (sn)
+PLACEHOLDER_TIMEOUT = 2
+# Yer tutucu üretilemezse (ör. imzalı thumbnail URL'sinin süresi dolmuş) bu süre tekrar denenmez
+PLACEHOLDER_RETRY_SECONDS = 300
+
+# Proxy'lenen resimlerin ortak header'ları
+IMAGE_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+    'Cross-Origin-Resource-Policy': 'cross-origin',
+    'Cross-Origin-Embedder-Policy': 'require-corp',
+    'Cross-Origin-Opener-Policy': 'same-origin',
+    'Timing-Allow-Origin': '*'
+}
+
+async def fetch_image(url: str) -> Optional[tuple]:
+    """Resmi Instagram CDN'den cookie'lerle çek; (içerik, content-type) ya da None"""
     max_retries = 3
-    last_error = None
 
     for attempt in range(max_retries):
         try:
             # Her denemede yeni bir cookie al
-            new_cookies = cookie_manager.get_next_cookie()
+            new_cookies = services.cookie_manager.get_next_cookie()
             if not new_cookies:
-                raise HTTPException(status_code=429, detail="Tüm cookie'ler kullanımda veya dinleniyor")
+                logger.warning(f"Image fetch attempt {attempt + 1}: no available cookies")
+                continue
             
             # Instagram için gerekli header'ları ayarla
             headers = {
@@ -1860,55 +2214,30 @@ async def proxy_image(url: str):
                 'Connection': 'keep-alive'
             }
             
-            async with aiohttp.ClientSession() as session:
-                try:
-                    async with session.get(url, headers=headers, allow_redirects=True, timeout=30) as response:
-                        if response.status == 200:
-                            cookie_manager.mark_cookie_success(new_cookies)
-                            image_data = await response.read()
-                            
-                            # Response header'larını ayarla
-                            response_headers = {
-                                'Content-Type': response.headers.get('content-type', 'image/jpeg'),
-                                'Cache-Control': 'public, max-age=31536000',
-                                'Access-Control-Allow-Origin': '*',
-                                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                                'Access-Control-Allow-Headers': '*',
-                                'Cross-Origin-Resource-Policy': 'cross-origin',
-                                'Cross-Origin-Embedder-Policy': 'require-corp',
-                                'Cross-Origin-Opener-Policy': 'same-origin',
-                                'Timing-Allow-Origin': '*'
-                            }
-                            
-                            return Response(
-                                content=image_data,
-                                headers=response_headers,
-                                media_type=response.headers.get('content-type', 'image/jpeg')
-                            )
-                        elif response.status == 403:
-                            cookie_manager.mark_cookie_challenge(new_cookies)
-                            if attempt < max_retries - 1:
-                                continue
-                            last_error = "Oturum geçersiz"
-                        else:
-                            if attempt < max_retries - 1:
-                                continue
-                            last_error = f"Failed to fetch image: {response.status}"
-                except asyncio.TimeoutError:
-                    if attempt < max_retries - 1:
-                        continue
-                    last_error = "Request timed out"
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        continue
-                    last_error = str(e)
-        
+            timeout = aiohttp.ClientTimeout(total=current_deadline().timeout(30))
+            async with await cdn_get(url, headers=headers, allow_redirects=True, timeout=timeout) as response:
+                if response.status == 200:
+                    services.cookie_manager.mark_cookie_success(new_cookies)
+                    with stage_timer(STAGE_UPSTREAM):
+                        image_data = await response.read()
+                    return image_data, response.headers.get('content-type', 'image/jpeg')
+                elif response.status == 403:
+                    services.cookie_manager.mark_cookie_challenge(new_cookies)
+                    logger.warning(f"Image fetch attempt {attempt + 1}: session invalid")
+                else:
+                    logger.warning(f"Image fetch attempt {attempt + 1}: status {response.status}")
+        except CircuitOpen:
+            # CDN yanıt vermiyor; diğer denemeler de beklemeden reddedilir
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Image fetch attempt {attempt + 1}: timed out")
         except Exception as e:
-            if attempt < max_retries - 1:
-                continue
-            last_error = str(e)
+            logger.warning(f"Image fetch attempt {attempt + 1}: {str(e)}")
     
-    # Eğer resim alınamazsa varsayılan bir resim döndür
+    return None
+
+def image_fallback(error: Optional[HTTPException] = None) -> Response:
+    """Resim alınamazsa gösterilen SVG; error verilirse onun durum kodu ve başlıklarıyla"""
     fallback_svg = '''
     <svg width="400" height="500" xmlns="http://www.w3.org/2000/svg">
         <rect width="100%" height="100%" fill="#f3f4f6"/>
@@ -1920,28 +2249,108 @@ async def proxy_image(url: str):
     
     return Response(
         content=fallback_svg,
+        status_code=error.status_code if error else 200,
         media_type='image/svg+xml',
-        headers={
-            'Cache-Control': 'no-cache',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, OPTIONS',
-            'Access-Control-Allow-Headers': '*',
-            'Cross-Origin-Resource-Policy': 'cross-origin',
-            'Cross-Origin-Embedder-Policy': 'require-corp',
-            'Cross-Origin-Opener-Policy': 'same-origin',
-            'Timing-Allow-Origin': '*'
-        }
+        headers={'Cache-Control': 'no-cache', **IMAGE_HEADERS, **((error and error.headers) or {})}
+    )
+
+@app.get("/api/proxy-image")
+async def proxy_image(url: str):
+    """Resim proxy endpoint'i"""
+    try:
+        image = await fetch_image(url)
+    except CircuitOpen as e:
+        return image_fallback(e)
+    if image is None:
+        return image_fallback()
+    
+    image_data, content_type = image
+    return Response(
+        content=image_data,
+        headers={'Cache-Control': 'public, max-age=31536000', **IMAGE_HEADERS},
+        media_type=content_type
+    )
+
+@app.get("/api/thumbnail")
+async def thumbnail_image(request: Request, url: str, w: Optional[int] = None):
+    """Önizleme resminin sabit genişliğe küçültülmüş AVIF / WebP / JPEG hali"""
+    thumbnails = services.thumbnails
+    if not thumbnails.enabled:
+        return await proxy_image(url)
+    
+    width = snap_width(w)
+    fmt = negotiate_format(request.headers.get('accept', ''))
+    path = thumbnails.get(url, width, fmt)
+    if path is None:
+        try:
+            image = await fetch_image(url)
+        except CircuitOpen as e:
+            return image_fallback(e)
+        if image is None:
+            return image_fallback()
+        try:
+            path = await thumbnails.render(url, image[0], width, fmt)
+        except Exception as e:
+            # Pillow'un açamadığı içerik: orijinali olduğu gibi gönder
+            logger.warning(f"Thumbnail render failed: {str(e)}")
+            return Response(
+                content=image[0],
+                headers={'Cache-Control': 'public, max-age=31536000', **IMAGE_HEADERS},
+                media_type=image[1]
+            )
+    
+    return FileResponse(
+        path,
+        media_type=THUMBNAIL_TYPES[fmt],
+        headers={'Cache-Control': 'public, max-age=31536000', 'Vary': 'Accept', **IMAGE_HEADERS}
     )
 
+async def build_placeholder(image_url: str) -> Optional[str]:
+    """Önizleme resminin data: URI yer tutucusu; alınamazsa None"""
+    if not services.thumbnails.enabled:
+        return None
+    try:
+        image = await asyncio.wait_for(fetch_image(image_url), PLACEHOLDER_TIMEOUT)
+        if image is None:
+            return None
+        return await asyncio.wait_for(services.thumbnails.placeholder(image[0]), PLACEHOLDER_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Placeholder failed: {str(e) or type(e).__name__}")
+        return None
+
+async def preview_response(shortcode: str, preview_info: dict, want_placeholder: bool, cached: bool = True) -> dict:
+    """Önbelleğe yaz (gerekirse yer tutucuyu ekleyerek) ve yanıtı döndür"""
+    changed = not cached
+    failed_at = preview_info.get('placeholder_failed_at') or 0
+    if (want_placeholder and not preview_info.get('placeholder')
+            and time.time() - failed_at >= PLACEHOLDER_RETRY_SECONDS):
+        placeholder = await build_placeholder(preview_info['thumbnail'])
+        if placeholder:
+            preview_info['placeholder'] = placeholder
+            preview_info.pop('placeholder_failed_at', None)
+        else:
+            # Sonraki önizlemeler her seferinde 2 x PLACEHOLDER_TIMEOUT beklemesin
+            preview_info['placeholder_failed_at'] = time.time()
+        changed = True
+    if changed:
+        await services.preview_cache.put(shortcode, preview_info, keep_ttl=cached)
+    preview_info.pop('placeholder_failed_at', None)
+    if not want_placeholder:
+        preview_info.pop('placeholder', None)
+    return preview_info
+
 @app.get("/api/preview")
 async def get_preview(request: Request):
     """Post veya reel önizlemesi al"""
+    return await run_request(request, _get_preview(request), route='/api/preview')
+
+async def _get_preview(request: Request):
     try:
         url = request.query_params.get('url')
         if not url:
             raise HTTPException(status_code=400, detail='URL is required')
 
-        shortcode = get_shortcode_from_url(url)
+        shortcode = await resolve_shortcode(url)
         if not shortcode:
             raise HTTPException(status_code=400, detail='Invalid Instagram URL')
 
@@ -1949,20 +2358,33 @@ async def get_preview(request: Request):
         if shortcode.startswith('story_'):
             raise HTTPException(status_code=400, detail='Stories are not supported for preview')
 
+        # placeholder=1: küçük bir base64 önizleme yanıta gömülür, ilk boyama tek istekle olur
+        want_placeholder = request.query_params.get('placeholder', '').lower() in ('1', 'true')
+        cached = await services.preview_cache.get(shortcode)
+        if cached is not None:
+            return await preview_response(shortcode, cached, want_placeholder)
+        await services.negative_cache.check(shortcode)
+        await services.circuit_breakers['metadata'].fail_fast()
+
         max_retries = 10  # Increased max retries
-        base_delay = 1  # Reduced base delay
+        deadline = current_deadline()
         last_error = None
+        last_kind = TRANSIENT
         used_cookies = set()
         rate_limited_cookies = set()
 
         for attempt in range(max_retries):
+            loader_instance = None
+            preview_info = None
+            aborted = False
             try:
                 # Get a new cookie that hasn't been used or rate limited in this request
-                new_cookies = cookie_manager.get_next_cookie()
+                new_cookies = services.cookie_manager.get_next_cookie()
                 
                 if not new_cookies:
-                    logger.warning(f"No available cookies, waiting {base_delay}s before retry")
-                    await asyncio.sleep(base_delay)
+                    delay = backoff_delay(attempt)
+                    logger.warning(f"No available cookies, waiting {delay:.2f}s before retry")
+                    await deadline.sleep(delay)
                     continue
 
                 cookie_id = new_cookies.get('ds_user_id')
@@ -1973,14 +2395,17 @@ async def get_preview(request: Request):
                 used_cookies.add(cookie_id)
                 
                 # Get loader and load cookie
-                loader_instance = await loader_pool.get_loader()
+                loader_instance = await services.loader_pool.get_loader()
                 loader = loader_instance['loader']
 
-                # Add small delay between attempts
+                # Denemeler arasında jitter'lı, kalan bütçeyi aşmayan bekleme
                 if attempt > 0:
-                    await asyncio.sleep(base_delay)
+                    await deadline.sleep(backoff_delay(attempt - 1))
 
-                post = instaloader.Post.from_shortcode(loader.context, shortcode)
+                with stage_timer(STAGE_METADATA):
+                    post = await services.loader_pool.run(
+                        loader_instance, lambda: instaloader.Post.from_shortcode(loader.context, shortcode)
+                    )
                 
                 # Get thumbnail and video URLs safely
                 thumbnail_url = None
@@ -2018,32 +2443,56 @@ async def get_preview(request: Request):
                 }
 
                 # Mark cookie as successful
-                cookie_manager.mark_cookie_success(new_cookies)
-                return preview_info
+                services.cookie_manager.mark_cookie_success(new_cookies)
+                break
 
+            except (asyncio.CancelledError, DeadlineExceeded, CircuitOpen):
+                # İstemci gitti, bütçe doldu ya da devre açıldı; cookie'nin hatası değil
+                aborted = True
+                raise
             except Exception as e:
                 error_msg = str(e).lower()
                 if new_cookies:
                     if "rate_limit" in error_msg or "please wait" in error_msg:
                         logger.warning(f"Cookie {cookie_id} rate limited, marking and trying next")
-                        cookie_manager.mark_cookie_rate_limited(new_cookies)
+                        services.cookie_manager.mark_cookie_rate_limited(new_cookies)
                         rate_limited_cookies.add(cookie_id)
+                        last_kind = RATE_LIMITED
                         continue  # Skip delay and try next cookie immediately
                     elif "login_required" in error_msg or "checkpoint_required" in error_msg or "unauthorized" in error_msg:
                         logger.warning(f"Cookie {cookie_id} challenged, marking and trying next")
-                        cookie_manager.mark_cookie_challenge(new_cookies)
+                        services.cookie_manager.mark_cookie_challenge(new_cookies)
+                        last_kind = LOGIN_REQUIRED
                         continue  # Skip delay and try next cookie immediately
                 
+                # Silinmiş / gizli post: diğer cookie'lerle denemek aynı sonucu verir
+                kind = classify_error(e)
+                if kind in PERMANENT:
+                    logger.info(f"Preview {shortcode} failed permanently ({kind}): {str(e)}")
+                    await services.negative_cache.fail(shortcode, kind)
+                last_kind = kind
+                
                 if attempt < max_retries - 1:
                     logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
                     continue
                 last_error = str(e)
+            
+            finally:
+                # Loader'ı havuza geri ver, aksi halde pool_size kadar önizlemeden sonra havuz tükenir
+                if loader_instance:
+                    await services.loader_pool.release_loader(loader_instance, success=preview_info is not None or aborted)
+
+        if preview_info is not None:
+            return await preview_response(shortcode, preview_info, want_placeholder, cached=False)
 
-        # All retries failed
+        # All retries failed; sonraki istekler kısa süre aynı yanıtı önbellekten alır
         logger.error(f"All preview attempts failed. Last error: {last_error}")
-        raise HTTPException(
-            status_code=429,
-            detail="All available cookies are rate limited. Please try again later."
+        if last_kind != RATE_LIMITED:
+            await services.negative_cache.fail(shortcode, last_kind)
+        RATE_LIMIT_REJECTIONS.labels(source='instagram').inc()
+        await services.negative_cache.fail(
+            shortcode, RATE_LIMITED, 429,
+            "All available cookies are rate limited. Please try again later."
         )
 
     except HTTPException as he:
@@ -2073,17 +2522,20 @@ async def update_password_endpoint(
             raise HTTPException(status_code=400, detail="Both current and new passwords are required")
 
         # Mevcut şifreyi doğrula
-        if not verify_admin_password(admin, current_password):
+        if not await services.password_hasher.run(verify_admin_password, admin, current_password):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
 
         # Yeni şifreyi güncelle
-        if update_admin_password(admin.id, new_password):
+        if await services.password_hasher.run(update_admin_password, admin.id, new_password):
+            services.admin_principals.invalidate_admin(admin.id)
             return {"message": "Password updated successfully"}
         else:
             raise HTTPException(status_code=500, detail="Failed to update password")
             
     except HTTPException as he:
         raise he
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Password hashing is busy, try again shortly")
     except Exception as e:
         logger.error(f"Update password error: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while updating password")
@@ -0,0 +1,105 @@
+"""Admin kimlik doğrulamanın event loop'a maliyeti: bcrypt loop'ta / PasswordHasher'da ve principal önbelleği.
+
+    python benchmarks/bench_admin_auth.py
+    python benchmarks/bench_admin_auth.py --logins 16 --rounds 12
+
+Aynı anda --logins kadar şifre doğrulaması yapılırken 5 ms'de bir uyanan bir
+görevin en büyük gecikmesi ölçülür (diğer isteklerin göreceği bekleme). İkinci
+bölüm admin API çağrısı başına kimlik çözme süresini ölçer: her çağrıda SQLite
+sorgusu ile PrincipalCache isabeti. Geçici bir dizinde boş veritabanı kullanılır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bcrypt
+
+from admin_auth import PasswordHasher, PrincipalCache
+
+
+async def max_loop_lag(work) -> float:
+    lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - start - 0.005)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    done = True
+    await beat
+    return round(lag * 1000, 1), round(elapsed * 1000, 1)
+
+
+async def bench_bcrypt(logins: int, rounds: int) -> dict:
+    hashed = bcrypt.hashpw(b'admin123', bcrypt.gensalt(rounds))
+    hasher = PasswordHasher(max_pending=logins)
+
+    async def inline():
+        for _ in range(logins):
+            bcrypt.checkpw(b'wrong', hashed)
+
+    async def offloaded():
+        await asyncio.gather(*(hasher.run(bcrypt.checkpw, b'wrong', hashed) for _ in range(logins)))
+
+    inline_lag, inline_ms = await max_loop_lag(inline)
+    pool_lag, pool_ms = await max_loop_lag(offloaded)
+    hasher.shutdown()
+    return {
+        'inline': {'max_loop_lag_ms': inline_lag, 'total_ms': inline_ms},
+        'executor': {'max_loop_lag_ms': pool_lag, 'total_ms': pool_ms},
+    }
+
+
+def bench_principals(calls: int) -> dict:
+    work_dir = tempfile.mkdtemp(prefix='bench-admin-')
+    os.chdir(work_dir)
+    import models
+    models.init_db()
+    if not models.get_admin('admin'):
+        models.add_admin('admin', 'admin123')
+    cache = PrincipalCache()
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        models.get_admin('admin')
+    db_us = (time.perf_counter() - start) / calls * 1e6
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        admin = cache.get('jti')
+        if admin is None:
+            cache.put('jti', models.get_admin('admin'))
+    cached_us = (time.perf_counter() - start) / calls * 1e6
+    return {'db_lookup_us': round(db_us, 1), 'cached_us': round(cached_us, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+    results = {
+        'bcrypt': asyncio.run(bench_bcrypt(args.logins, args.rounds)),
+        'principal': bench_principals(args.calls),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
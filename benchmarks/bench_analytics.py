@@ -0,0 +1,89 @@
+"""Analytics yazma maliyeti: her indirmede Redis'e gitmek ile process içi tampon + toplu flush.
+
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --events 50000 --clients 5000 --db 15
+
+--events kadar indirme rastgele medya türü / format / dil / istemci ile üretilir.
+"direct" her indirme için HINCRBY + PFADD'i ayrı ayrı bekler (istek yolunda
+Redis round-trip'i); "buffered" DownloadAnalytics.record() ile tamponlar ve tek
+flush() yapar. Seçilen db önce ve sonra boşaltılır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import redis.asyncio as aioredis
+
+from analytics import DownloadAnalytics
+
+
+def make_events(count: int, clients: int) -> list:
+    rng = random.Random(7)
+    return [
+        (rng.choice(('video', 'image', 'audio')), rng.choice(('original', 'sound')),
+         rng.choice(('en', 'tr', 'de', 'es')), rng.choice(('2xx',) * 9 + ('4xx',)),
+         f'10.0.{rng.randrange(clients) // 256}.{rng.randrange(256)}', rng.randrange(10 ** 6))
+        for _ in range(count)
+    ]
+
+
+async def direct(client, events: list) -> float:
+    hour = int(time.time() // 3600 * 3600)
+    start = time.perf_counter()
+    for media, fmt, lang, status, ip, nbytes in events:
+        await client.hincrby(f'bench:h:{hour}', f'n|{media}|{fmt}|{lang}|{status}', 1)
+        await client.hincrby(f'bench:h:{hour}', f'b|{media}|{fmt}|{lang}|{status}', nbytes)
+        await client.pfadd(f'bench:uniq:h:{hour}', ip)
+    return time.perf_counter() - start
+
+
+async def buffered(client, events: list) -> tuple:
+    analytics = DownloadAnalytics(client, prefix='bench')
+    start = time.perf_counter()
+    for media, fmt, lang, status, ip, nbytes in events:
+        analytics.record(media, fmt, lang, status, ip, nbytes)
+    recorded = time.perf_counter() - start
+    start = time.perf_counter()
+    await analytics.flush()
+    return recorded, time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    client = aioredis.Redis(host=args.host, port=args.port, db=args.db)
+    events = make_events(args.events, args.clients)
+    try:
+        await client.flushdb()
+        direct_seconds = await direct(client, events)
+        await client.flushdb()
+        record_seconds, flush_seconds = await buffered(client, events)
+        return {
+            'events': args.events,
+            'direct_us_per_event': round(direct_seconds / args.events * 1e6, 2),
+            'buffered_record_us_per_event': round(record_seconds / args.events * 1e6, 2),
+            'buffered_flush_ms': round(flush_seconds * 1000, 1),
+        }
+    finally:
+        await client.flushdb()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--host', default=os.getenv('REDIS_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('REDIS_PORT', 6379)))
+    parser.add_argument('--db', type=int, default=15)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Ses çıkarmanın CPU maliyeti: MP3 yeniden kodlama ile m4a stream copy, dakika ses başına CPU saniyesi.
+
+    python benchmarks/bench_audio.py
+    python benchmarks/bench_audio.py --duration 120 --runs 5
+
+ffmpeg ile H.264/AAC bir MP4 (reel'lerin tipik hali) üretilir, ardından
+convert_to_mp3 ve convert_to_m4a(copy=True) ayrı ayrı çalıştırılır. CPU süresi
+ffmpeg alt process'lerinin user + sys süresidir (RUSAGE_CHILDREN), yani web
+process'inin kendisi ölçüme girmez. ffmpeg ve ffprobe PATH'te olmalıdır.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from transcode import convert_to_m4a, convert_to_mp3
+
+
+def make_source(directory: str, duration: int) -> str:
+    path = os.path.join(directory, 'reel.mp4')
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=360x640:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '128k', '-shortest', path
+    ], check=True)
+    return path
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(func, source: str, duration: int, runs: int) -> dict:
+    cpu_samples, wall_samples = [], []
+    size = 0
+    for _ in range(runs):
+        cpu_start, wall_start = children_cpu(), time.perf_counter()
+        output = func(source)
+        wall_samples.append(time.perf_counter() - wall_start)
+        cpu_samples.append(children_cpu() - cpu_start)
+        size = os.path.getsize(output)
+        os.remove(output)
+    minutes = duration / 60
+    return {
+        'cpu_seconds_per_audio_minute': round(statistics.median(cpu_samples) / minutes, 3),
+        'wall_ms': round(statistics.median(wall_samples) * 1000, 1),
+        'output_bytes': size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=int, default=60, help='klip süresi (saniye)')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        sys.exit('ffmpeg and ffprobe are required')
+
+    work_dir = tempfile.mkdtemp(prefix='bench-audio-')
+    try:
+        source = make_source(work_dir, args.duration)
+        results = {
+            'mp3': measure(convert_to_mp3, source, args.duration, args.runs),
+            'm4a_copy': measure(convert_to_m4a, source, args.duration, args.runs),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Devre kesici: Instagram yanıt vermezken istek süresi ve upstream'e giden çağrı sayısı.
+
+    python benchmarks/bench_circuit_breaker.py
+    python benchmarks/bench_circuit_breaker.py --requests 500 --call-seconds 1 --db 15
+
+"outage" bölümünde upstream her çağrıda --call-seconds bekleyip zaman aşımı verir;
+--requests istek --concurrency paralellikle gönderilir. Breaker olmadan her istek
+upstream'i bekler; breaker ile eşik aşıldıktan sonra istekler 503 ile hemen döner.
+"recovery" upstream düzeldikten sonra devrenin kapanma süresini (--open-seconds
+beklemesi + deneme çağrısı), "overhead" kapalı devrede çağrı başına Redis maliyetini
+ölçer. Seçilen db önce ve sonra boşaltılır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import redis.asyncio as aioredis
+
+from circuit_breaker import CLOSED, CircuitBreaker, CircuitOpen
+
+
+class Upstream:
+    def __init__(self, call_seconds: float):
+        self.call_seconds = call_seconds
+        self.healthy = False
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        if self.healthy:
+            return 'ok'
+        await asyncio.sleep(self.call_seconds)
+        raise asyncio.TimeoutError()
+
+
+async def request(upstream: Upstream, breaker=None) -> tuple:
+    start = time.perf_counter()
+    status = 200
+    try:
+        if breaker is None:
+            await upstream.call()
+        else:
+            async with breaker.guard():
+                await upstream.call()
+    except CircuitOpen:
+        status = 503
+    except asyncio.TimeoutError:
+        status = 504
+    return status, time.perf_counter() - start
+
+
+async def send(upstream: Upstream, breaker, count: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await request(upstream, breaker)
+
+    return await asyncio.gather(*(limited() for _ in range(count)))
+
+
+def summarize(results: list, upstream: Upstream, elapsed: float) -> dict:
+    latencies = sorted(latency for _, latency in results)
+    return {
+        'upstream_calls': upstream.calls,
+        'rejected_503': sum(1 for status, _ in results if status == 503),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        'wall_s': round(elapsed, 2),
+    }
+
+
+def make_breaker(client, args) -> CircuitBreaker:
+    breaker = CircuitBreaker(client, 'metadata')
+    breaker.config.update(open_seconds=args.open_seconds, min_calls=args.min_calls)
+    return breaker
+
+
+async def bench_outage(client, args) -> dict:
+    results = {}
+    for name in ('no_breaker', 'breaker'):
+        await client.flushdb()
+        upstream = Upstream(args.call_seconds)
+        breaker = make_breaker(client, args) if name == 'breaker' else None
+        start = time.perf_counter()
+        responses = await send(upstream, breaker, args.requests, args.concurrency)
+        results[name] = summarize(responses, upstream, time.perf_counter() - start)
+    return results
+
+
+async def bench_recovery(client, args) -> dict:
+    await client.flushdb()
+    upstream = Upstream(args.call_seconds)
+    breaker = make_breaker(client, args)
+    await send(upstream, breaker, args.min_calls * 2, args.concurrency)
+    upstream.healthy = True
+    recovered_at = time.perf_counter()
+    while True:
+        await request(upstream, breaker)
+        state, _ = await breaker._read_state()
+        if state == CLOSED:
+            break
+        await asyncio.sleep(0.05)
+    return {'open_seconds': args.open_seconds, 'closed_after_s': round(time.perf_counter() - recovered_at, 2)}
+
+
+async def bench_overhead(client, args) -> dict:
+    await client.flushdb()
+    upstream = Upstream(args.call_seconds)
+    upstream.healthy = True
+    breaker = make_breaker(client, args)
+    start = time.perf_counter()
+    for _ in range(args.overhead_calls):
+        await request(upstream, breaker)
+    guarded = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.overhead_calls):
+        await request(upstream)
+    plain = time.perf_counter() - start
+    return {'us_per_call': round((guarded - plain) / args.overhead_calls * 1e6, 1)}
+
+
+async def run(args) -> dict:
+    client = aioredis.Redis(host=args.host, port=args.port, db=args.db)
+    try:
+        return {
+            'outage': await bench_outage(client, args),
+            'recovery': await bench_recovery(client, args),
+            'overhead': await bench_overhead(client, args),
+        }
+    finally:
+        await client.flushdb()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--call-seconds', type=float, default=0.5, help='Başarısız upstream çağrısının süresi')
+    parser.add_argument('--min-calls', type=int, default=20)
+    parser.add_argument('--open-seconds', type=int, default=2)
+    parser.add_argument('--overhead-calls', type=int, default=2000)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--db', type=int, default=15)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Sıkıştırma middleware'inin istek başına CPU maliyeti: eski GZipMiddleware ve CompressionMiddleware.
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --requests 50 --media-size 2097152
+
+Her senaryo ASGI seviyesinde (ağ olmadan) Accept-Encoding: br, gzip ile çağrılır;
+ölçülen değer process CPU süresidir. Medya gövdeleri rastgele byte'tır, yani
+sıkıştırılamaz; bu, JPEG/MP4/MP3 yanıtlarının gerçek davranışına yakındır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from starlette.applications import Starlette
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from compression import CompressionMiddleware
+
+CHUNK_SIZE = 64 * 1024
+
+
+def build_app(media_size: int) -> Starlette:
+    image = b'\xff\xd8\xff\xe0' + os.urandom(media_size)
+    video = os.urandom(media_size)
+    payload = {'items': [{'id': i, 'url': f'https://cdn.example.com/{i}.jpg', 'likes': i * 7} for i in range(500)]}
+    page = '<html><body>' + ''.join(f'<div class="row">item {i}</div>' for i in range(3000)) + '</body></html>'
+
+    async def jpeg(request):
+        return Response(image, media_type='image/jpeg')
+
+    async def mp4_stream(request):
+        async def chunks():
+            for offset in range(0, len(video), CHUNK_SIZE):
+                yield video[offset:offset + CHUNK_SIZE]
+        return StreamingResponse(chunks(), media_type='video/mp4')
+
+    async def json_api(request):
+        return JSONResponse(payload)
+
+    async def html(request):
+        return HTMLResponse(page)
+
+    return Starlette(routes=[
+        Route('/jpeg', jpeg),
+        Route('/mp4', mp4_stream),
+        Route('/json', json_api),
+        Route('/html', html),
+    ])
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'scheme': 'http', 'http_version': '1.1',
+        'headers': [(b'host', b'localhost'), (b'accept-encoding', b'br, gzip')],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    sent = 0
+
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # StreamingResponse bağlantı kopmasını dinler; yanıt bitince iptal edilir
+            await asyncio.Event().wait()
+        requested = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal sent
+        if message['type'] == 'http.response.body':
+            sent += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def measure(app, path: str, requests: int) -> dict:
+    await call(app, path)  # ısınma
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    sent = 0
+    for _ in range(requests):
+        sent = await call(app, path)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {
+        'cpu_ms_per_request': round(cpu / requests * 1000, 3),
+        'wall_ms_per_request': round(wall / requests * 1000, 3),
+        'bytes_sent': sent,
+    }
+
+
+async def run(args) -> dict:
+    base = build_app(args.media_size)
+    variants = {
+        'none': base,
+        'gzip_middleware': GZipMiddleware(base, minimum_size=1000),
+        'compression_middleware': CompressionMiddleware(base, minimum_size=1000),
+    }
+    results = {}
+    for path in ('/jpeg', '/mp4', '/json', '/html'):
+        results[path] = {name: await measure(app, path, args.requests) for name, app in variants.items()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--media-size', type=int, default=1024 * 1024)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
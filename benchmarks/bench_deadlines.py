@@ -0,0 +1,134 @@
+"""Süre bütçesi ve bağlantı kopunca iptal: başarısız / terk edilen istek başına worker süresi.
+
+    python benchmarks/bench_deadlines.py
+    python benchmarks/bench_deadlines.py --call-seconds 2 --disconnect-after 0.5
+
+İlk bölüm hep başarısız olan bir metadata çağrısı için retry beklemelerini simüle
+eder: eski retry_with_backoff (10 sn'den başlayıp ikiye katlanan, eşleşen hata
+mesajında iki kez uyuyan 5 deneme) ile REQUEST_DEADLINE içinde full-jitter backoff.
+İkinci bölüm gerçek bir uvicorn sunucusu açar: BaseHTTPMiddleware arkasındaki bir
+endpoint 10 x --call-seconds süren denemeler yapar, istemci --disconnect-after
+saniye sonra bağlantıyı kapatır. Düz handler ile run_request sarmalı karşılaştırılır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+from deadline import REQUEST_DEADLINE, backoff_delay, run_request
+
+
+def legacy_schedule(call_seconds: float, attempts: int = 5, initial_delay: float = 10) -> float:
+    """Eski retry_with_backoff: her başarısız denemeden sonra iki kez 10 * 2^n + U(1, 5) sn"""
+    total = call_seconds * attempts
+    for attempt in range(attempts - 1):
+        for _ in range(2):
+            total += initial_delay * (2 ** attempt) + random.uniform(1, 5)
+    return total
+
+
+def deadline_schedule(call_seconds: float, budget: float, attempts: int = 5) -> float:
+    elapsed = 0.0
+    for attempt in range(attempts):
+        elapsed += call_seconds
+        if elapsed >= budget or attempt == attempts - 1:
+            break
+        delay = backoff_delay(attempt)
+        if delay >= budget - elapsed:
+            break
+        elapsed += delay
+    return min(elapsed, budget)
+
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        'mean_s': round(statistics.mean(samples), 2),
+        'p50_s': round(samples[len(samples) // 2], 2),
+        'p99_s': round(samples[int(len(samples) * 0.99)], 2),
+    }
+
+
+def bench_retries(call_seconds: float, budget: float, runs: int) -> dict:
+    random.seed(1)
+    legacy = [legacy_schedule(call_seconds) for _ in range(runs)]
+    bounded = [deadline_schedule(call_seconds, budget) for _ in range(runs)]
+    return {'legacy': summarize(legacy), 'deadline': summarize(bounded), 'budget_s': budget}
+
+
+async def bench_disconnect(call_seconds: float, disconnect_after: float, port: int) -> dict:
+    app = FastAPI()
+    finished = {}
+
+    @app.middleware('http')
+    async def passthrough(request: Request, call_next):
+        return await call_next(request)
+
+    async def work(name: str):
+        start = time.perf_counter()
+        try:
+            for _ in range(10):
+                await asyncio.sleep(call_seconds)
+        finally:
+            finished[name] = time.perf_counter() - start
+        return {'ok': True}
+
+    @app.get('/plain')
+    async def plain():
+        return await work('plain')
+
+    @app.get('/guarded')
+    async def guarded(request: Request):
+        return await run_request(request, work('guarded'), budget=3600, route='/guarded')
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='error'))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = {}
+    for name in ('plain', 'guarded'):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET /{name} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode())
+        await writer.drain()
+        await asyncio.sleep(disconnect_after)
+        writer.close()
+        while name not in finished:
+            await asyncio.sleep(0.01)
+        results[name] = {
+            'worker_seconds': round(finished[name], 2),
+            'after_disconnect_s': round(finished[name] - disconnect_after, 2),
+        }
+
+    server.should_exit = True
+    await serve
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--call-seconds', type=float, default=1.0, help='Başarısız bir denemenin süresi')
+    parser.add_argument('--budget', type=float, default=REQUEST_DEADLINE)
+    parser.add_argument('--runs', type=int, default=10000)
+    parser.add_argument('--disconnect-after', type=float, default=0.5)
+    parser.add_argument('--port', type=int, default=8799)
+    args = parser.parse_args()
+    results = {
+        'failing_request': bench_retries(args.call_seconds, args.budget, args.runs),
+        'client_disconnect': asyncio.run(bench_disconnect(args.call_seconds, args.disconnect_after, args.port)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""cleanup_old_data maliyeti ve doğruluğu: eski SCAN + tek tek DEL ile registry (ZRANGE + UNLINK).
+
+    python benchmarks/bench_key_cleanup.py
+    python benchmarks/bench_key_cleanup.py --keys 50000 --keep 1000 --noise 200000 --db 15
+
+Seçilen db boşaltılır, --noise kadar ilgisiz anahtar ve --keys kadar cookie_stats:
+anahtarı artan oluşturulma zamanıyla yazılır. Her iki yöntem aynı veriyle en yeni
+--keep anahtarı bırakacak şekilde çalıştırılır; süre, silinecek bir şey kalmadığında
+ikinci çalıştırmanın süresi ve en yeni --keep anahtarın ne kadarının korunduğu raporlanır.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import redis
+
+from redis_manager import RedisManager, register_key
+
+FAMILY = 'cookie_stats:'
+
+
+def key_for(i: int) -> str:
+    # Gerçek cookie id'leri gibi: isim sırası oluşturulma sırasını vermez
+    return FAMILY + hashlib.sha1(str(i).encode()).hexdigest()[:16]
+
+
+def populate(client, keys: int, noise: int):
+    client.flushdb()
+    pipe = client.pipeline(transaction=False)
+    for i in range(noise):
+        pipe.set(f'other:{i}', 1)
+        if i % 5000 == 4999:
+            pipe.execute()
+    # Yazma sırası karıştırılır; gerçek Redis'te de SCAN sırası oluşturulma sırası değildir
+    order = list(range(keys))
+    random.Random(42).shuffle(order)
+    for n, i in enumerate(order):
+        key = key_for(i)
+        pipe.set(key, 1)
+        register_key(pipe, key, written_at=1_000_000 + i)
+        if n % 5000 == 4999:
+            pipe.execute()
+    pipe.execute()
+    client.set(f'registry:{FAMILY[:-1]}:backfilled', 1)
+
+
+def scan_cleanup(client, keep: int) -> int:
+    """Önceki RedisManager.cleanup_keys davranışı"""
+    keys = []
+    cursor = 0
+    while True:
+        cursor, partial = client.scan(cursor, match=f'{FAMILY}*', count=100)
+        keys.extend(partial)
+        if cursor == 0:
+            break
+    to_delete = keys[:-keep] if len(keys) > keep else []
+    for key in to_delete:
+        client.delete(key)
+    return len(to_delete)
+
+
+def surviving_oldest(client, keys: int, keep: int) -> float:
+    """Kalması gereken en yeni `keep` anahtarın ne kadarı hâlâ duruyor"""
+    expected = [key_for(i) for i in range(keys - keep, keys)]
+    pipe = client.pipeline(transaction=False)
+    for key in expected:
+        pipe.exists(key)
+    return round(sum(pipe.execute()) / keep, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--keep', type=int, default=1000)
+    parser.add_argument('--noise', type=int, default=50000)
+    parser.add_argument('--host', default=os.getenv('REDIS_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('REDIS_PORT', 6379)))
+    parser.add_argument('--db', type=int, default=15)
+    args = parser.parse_args()
+
+    client = redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+    manager = RedisManager()
+    manager._redis = client
+
+    results = {}
+    for name, cleanup in (
+        ('scan_del', lambda: scan_cleanup(client, args.keep)),
+        ('registry_unlink', lambda: manager.cleanup_keys(FAMILY, max_keys=args.keep)),
+    ):
+        populate(client, args.keys, args.noise)
+        start = time.perf_counter()
+        deleted = cleanup()
+        elapsed = time.perf_counter() - start
+        # Saatlik çalıştırmanın olağan hali: silinecek bir şey yokken maliyet
+        start = time.perf_counter()
+        cleanup()
+        idle = time.perf_counter() - start
+        results[name] = {
+            'seconds': round(elapsed, 3),
+            'idle_run_seconds': round(idle, 4),
+            'deleted': deleted,
+            'newest_kept_ratio': surviving_oldest(client, args.keys, args.keep),
+        }
+    client.flushdb()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
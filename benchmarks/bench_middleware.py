@@ -0,0 +1,81 @@
+"""combined_middleware'in istek başına maliyetini ölç.
+
+Kullanım:
+    python benchmarks/bench_middleware.py              # kuyruk tabanlı logging
+    LOG_ASYNC=0 python benchmarks/bench_middleware.py  # senkron handler'lar
+
+Middleware, boş bir Response döndüren sahte call_next ile doğrudan çağrılır;
+ölçülen süre sadece middleware + logging maliyetidir.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import app as app_module
+
+
+def make_request(path: str) -> Request:
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 8000),
+        'scheme': 'http',
+        'root_path': '',
+    }
+    return Request(scope)
+
+
+async def call_next(request):
+    return Response(b'ok', media_type='text/plain')
+
+
+async def run(requests: int, warmup: int) -> dict:
+    samples = []
+    for i in range(warmup + requests):
+        request = make_request('/api/bench')
+        start = time.perf_counter()
+        await app_module.combined_middleware(request, call_next)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed * 1_000_000)
+
+    samples.sort()
+    return {
+        'mode': 'sync' if app_module.log_listener is None else 'queue',
+        'requests': requests,
+        'mean_us': statistics.fmean(samples),
+        'p50_us': samples[len(samples) // 2],
+        'p99_us': samples[int(len(samples) * 0.99) - 1],
+        'max_us': samples[-1],
+        'dropped_records': app_module.log_queue_handler.dropped if app_module.log_queue_handler else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--warmup', type=int, default=1000)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests, args.warmup))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
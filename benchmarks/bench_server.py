@@ -0,0 +1,80 @@
+"""Uygulamayı sahte upstream'e yönlendirilmiş halde benchmark için başlat.
+
+instaloader'ın www.instagram.com / i.instagram.com isteklerini FAKE_UPSTREAM_URL'e
+yönlendirir ve uygulamayı geçici bir çalışma dizininde (kendi cookies/, logs/,
+database.db ile) çalıştırır; repodaki veriler değişmez.
+
+    FAKE_UPSTREAM_URL=http://127.0.0.1:9100 python benchmarks/bench_server.py --port 8100
+
+Redis çalışıyor olmalıdır (REDIS_HOST/REDIS_PORT).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import requests.adapters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTAGRAM_HOSTS = ('https://www.instagram.com', 'https://i.instagram.com')
+BENCH_COOKIE_COUNT = 5
+
+
+def redirect_instagram(upstream: str):
+    """requests üzerinden yapılan Instagram isteklerini sahte upstream'e çevir"""
+    original_send = requests.adapters.HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        for host in INSTAGRAM_HOSTS:
+            if request.url.startswith(host):
+                request.url = upstream + request.url[len(host):]
+                break
+        return original_send(self, request, *args, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = send
+
+
+def prepare_workdir() -> str:
+    """templates/static'i bağlayan ve sahte cookie'ler içeren geçici çalışma dizini"""
+    workdir = tempfile.mkdtemp(prefix='instatest-bench-')
+    for name in ('templates', 'static'):
+        source = os.path.join(ROOT, name)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(workdir, name))
+        else:
+            os.makedirs(os.path.join(workdir, name))
+    cookies_dir = os.path.join(workdir, 'cookies')
+    os.makedirs(cookies_dir)
+    for i in range(BENCH_COOKIE_COUNT):
+        with open(os.path.join(cookies_dir, f'bench{i}.json'), 'w') as f:
+            json.dump({
+                'sessionid': f'bench-session-{i}',
+                'csrftoken': 'benchcsrftoken',
+                'ds_user_id': f'9000{i}'
+            }, f)
+    return workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the app against the fake upstream')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--workdir', help='reuse an existing working directory')
+    args = parser.parse_args()
+
+    upstream = os.getenv('FAKE_UPSTREAM_URL', 'http://127.0.0.1:9100').rstrip('/')
+    redirect_instagram(upstream)
+
+    workdir = args.workdir or prepare_workdir()
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    import uvicorn
+    import app as app_module
+
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Uygulamanın açılış maliyetini ölç: `import app` süresi ve ilk 200 yanıtına kadar geçen süre.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --path /api/redis-test
+
+Her ölçüm yeni bir Python process'inde yapılır, böylece import cache'i sonuçları
+etkilemez. İlk 200 ölçümü bench_server.py ile geçici bir çalışma dizininde
+(boş veritabanı, lifespan içinde seed dahil) yapılır. Redis çalışıyor olmalıdır.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+
+IMPORT_SNIPPET = (
+    'import sys, time; sys.path.insert(0, {root!r}); '
+    'start = time.perf_counter(); import app; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def measure_import() -> float:
+    """Yeni bir interpreter'da sadece `import app` süresi (saniye)"""
+    output = subprocess.check_output(
+        [sys.executable, '-c', IMPORT_SNIPPET.format(root=ROOT)],
+        cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_ok(port: int, path: str, timeout: float) -> float:
+    """Process başlatılmasından ilk 200 yanıtına kadar geçen süre (saniye)"""
+    url = f'http://127.0.0.1:{port}{path}'
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'bench_server.py'), '--port', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError(f'server exited with code {proc.returncode}')
+            time.sleep(0.01)
+        raise RuntimeError(f'{url} did not return 200 in {timeout}s')
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def summarize(samples: list) -> dict:
+    return {
+        'runs': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 1),
+        'min_ms': round(min(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--path', default='/en', help='path polled for the first 200')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    import_samples = [measure_import() for _ in range(args.runs)]
+    first_ok_samples = [measure_first_ok(args.port, args.path, args.timeout) for _ in range(args.runs)]
+
+    print(json.dumps({
+        'import': summarize(import_samples),
+        'first_200': dict(summarize(first_ok_samples), path=args.path),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
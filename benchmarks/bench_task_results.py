@@ -0,0 +1,104 @@
+"""Celery sonuç backend'inin Redis bellek kullanımı: eski ayarlar (JSON, süresiz, inline byte) ile yenileri.
+
+    python benchmarks/bench_task_results.py
+    python benchmarks/bench_task_results.py --tasks 5000 --media-size 262144 --db 15
+
+Her senaryo boş bir Redis db'sine --tasks kadar sonuç yazar: yarısı process_download
+benzeri küçük dict, yarısı download_media benzeri medya byte'ı. Ardından
+celery-task-meta-* anahtarlarının toplam boyutu (MEMORY USAGE, yoksa STRLEN) ve
+TTL'siz anahtar sayısı raporlanır. Seçilen db her senaryodan önce boşaltılır.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import redis
+from celery import Celery
+
+import tasks
+
+
+def small_result(i: int) -> dict:
+    return {'success': True, 'file_path': f'downloads/C{i:08d}.mp4', 'media_type': 'mp4'}
+
+
+def build_app(url: str, compact: bool) -> Celery:
+    app = Celery('bench', backend=url, broker='memory://')
+    if compact:
+        app.conf.update(
+            result_serializer=tasks.celery.conf.result_serializer,
+            result_compression=tasks.celery.conf.result_compression,
+            result_accept_content=tasks.celery.conf.result_accept_content,
+            result_expires=tasks.celery.conf.result_expires,
+        )
+    else:
+        app.conf.update(result_serializer='json', result_expires=None)
+    return app
+
+
+def key_bytes(client, key) -> int:
+    try:
+        return client.memory_usage(key) or 0
+    except redis.ResponseError:
+        return client.strlen(key)
+
+
+def run(url: str, client, compact: bool, count: int, media: bytes) -> dict:
+    client.flushdb()
+    backend = build_app(url, compact).backend
+    for i in range(count):
+        task_id = str(uuid.uuid4())
+        if i % 2:
+            result = tasks._inline_or_spill(task_id, media) if compact else media
+        else:
+            result = small_result(i)
+        backend.store_result(task_id, result, 'SUCCESS')
+
+    total, persistent, keys = 0, 0, 0
+    for key in client.scan_iter('celery-task-meta-*', count=1000):
+        keys += 1
+        total += key_bytes(client, key)
+        if client.ttl(key) == -1:
+            persistent += 1
+    return {
+        'keys': keys,
+        'redis_bytes': total,
+        'bytes_per_task': round(total / max(keys, 1)),
+        'keys_without_ttl': persistent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--media-size', type=int, default=256 * 1024)
+    parser.add_argument('--host', default=os.getenv('REDIS_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('REDIS_PORT', 6379)))
+    parser.add_argument('--db', type=int, default=15)
+    args = parser.parse_args()
+
+    url = f'redis://{args.host}:{args.port}/{args.db}'
+    client = redis.Redis(host=args.host, port=args.port, db=args.db)
+    # Taşan sonuçlar geçici bir dizine yazılır
+    tasks.TASK_RESULTS_DIR = tempfile.mkdtemp(prefix='bench-results-')
+    media = os.urandom(args.media_size)
+    try:
+        results = {
+            'json_inline': run(url, client, False, args.tasks, media),
+            'msgpack_zlib_spill': run(url, client, True, args.tasks, media),
+        }
+    finally:
+        client.flushdb()
+        shutil.rmtree(tasks.TASK_RESULTS_DIR, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Önizleme resmi: tam boy JPEG ile /api/thumbnail çıktılarının byte ve çözme maliyeti.
+
+    python benchmarks/bench_thumbnails.py
+    python benchmarks/bench_thumbnails.py --source photo.jpg --repeat 20
+
+Kaynak verilmezse 1080x1350 fotoğraf benzeri bir JPEG üretilir (Instagram'ın tam
+boyu). Her genişlik/format için: yanıt boyutu, istemcinin resmi çözme süresi ve
+sunucunun render süresi; ayrıca /api/preview'a gömülen yer tutucunun boyutu. Son
+bölüm aynı anda --concurrent render yapılırken event loop'un en büyük gecikmesini
+ölçer: render loop'ta ve ThumbnailService havuzunda.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from thumbnails import (
+    PLACEHOLDER_QUALITY, PLACEHOLDER_WIDTH, ThumbnailService, available_formats, render_thumbnail
+)
+
+
+def synthetic_photo(width: int = 1080, height: int = 1350) -> bytes:
+    random.seed(1)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(300):
+        x, y = random.randrange(width), random.randrange(height)
+        r = random.randrange(10, 120)
+        color = tuple(random.randrange(256) for _ in range(3))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    image = Image.blend(image, noise, 0.15)
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=92)
+    return output.getvalue()
+
+
+def decode_ms(data: bytes, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+    return round((time.perf_counter() - start) / repeat * 1000, 2)
+
+
+def render_ms(data: bytes, width: int, fmt: str, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = render_thumbnail(data, width, fmt)
+    return output, round((time.perf_counter() - start) / repeat * 1000, 2)
+
+
+async def max_loop_lag(work) -> tuple:
+    lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - start - 0.005)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    done = True
+    await beat
+    return round(lag * 1000, 1), round(elapsed * 1000, 1)
+
+
+async def bench_event_loop(data: bytes, concurrent: int) -> dict:
+    service = ThumbnailService(directory=tempfile.mkdtemp(prefix='bench-thumb-'))
+    # Havuz process'lerini ölçümden önce başlat
+    await service.render('warmup', data, 160, 'jpeg')
+
+    async def inline():
+        for _ in range(concurrent):
+            render_thumbnail(data, 640, 'webp')
+
+    async def pooled():
+        await asyncio.gather(*(service.render(f'url-{i}', data, 640, 'webp') for i in range(concurrent)))
+
+    inline_lag, inline_ms = await max_loop_lag(inline)
+    pool_lag, pool_ms = await max_loop_lag(pooled)
+    service.shutdown()
+    return {
+        'inline': {'max_loop_lag_ms': inline_lag, 'total_ms': inline_ms},
+        'process_pool': {'max_loop_lag_ms': pool_lag, 'total_ms': pool_ms},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', help='Ölçülecek JPEG (yoksa sentetik)')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--concurrent', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.source:
+        with open(args.source, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_photo()
+
+    with Image.open(io.BytesIO(data)) as image:
+        size = image.size
+    results = {
+        'original': {'size': list(size), 'bytes': len(data), 'decode_ms': decode_ms(data, args.repeat)},
+        'thumbnails': {},
+    }
+    for width in (320, 640):
+        for fmt in available_formats():
+            output, server_ms = render_ms(data, width, fmt, args.repeat)
+            results['thumbnails'][f'{fmt}-{width}'] = {
+                'bytes': len(output),
+                'bytes_saved_pct': round((1 - len(output) / len(data)) * 100, 1),
+                'decode_ms': decode_ms(output, args.repeat),
+                'render_ms': server_ms,
+            }
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        placeholder = render_thumbnail(data, PLACEHOLDER_WIDTH, 'webp', PLACEHOLDER_QUALITY)
+    results['placeholder'] = {
+        'bytes': len(placeholder),
+        'base64_bytes': len(base64.b64encode(placeholder)),
+        'render_ms': round((time.perf_counter() - start) / args.repeat * 1000, 2),
+    }
+    results['event_loop'] = asyncio.run(bench_event_loop(data, args.concurrent))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
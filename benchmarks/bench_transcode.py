@@ -0,0 +1,87 @@
+"""convert_to_mp4 maliyeti: eski her zaman libx264 yolu ile probe + remux/transcode kararı.
+
+    python benchmarks/bench_transcode.py
+    python benchmarks/bench_transcode.py --duration 30 --runs 5
+
+ffmpeg ile sentetik klipler üretilir: H.264/AAC MP4 (reel'lerin tipik hali, remux),
+H.264/MP3 MKV (sadece ses yeniden kodlanır) ve MPEG-4 Part 2 AVI (tam transcode).
+Her senaryo için duvar saati süresinin medyanı ve seçilen yol yazdırılır.
+ffmpeg ve ffprobe PATH'te olmalıdır.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from transcode import convert_to_mp4, plan_mp4, probe
+
+SOURCES = {
+    'h264_aac.mp4': ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac'],
+    'h264_mp3.mkv': ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'libmp3lame'],
+    'mpeg4_mp3.avi': ['-c:v', 'mpeg4', '-c:a', 'libmp3lame'],
+}
+
+LEGACY_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-c:a', 'aac', '-b:a', '128k']
+
+
+def make_source(directory: str, name: str, duration: int) -> str:
+    path = os.path.join(directory, name)
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=720x1280:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        *SOURCES[name], '-shortest', path
+    ], check=True)
+    return path
+
+
+def legacy_convert(input_file: str) -> str:
+    output_file = f"{input_file}.legacy.mp4"
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', input_file, *LEGACY_ARGS, output_file], check=True)
+    return output_file
+
+
+def timed(func, input_file: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = func(input_file)
+        samples.append(time.perf_counter() - start)
+        os.remove(output)
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=int, default=15, help='klip süresi (saniye)')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        sys.exit('ffmpeg and ffprobe are required')
+
+    work_dir = tempfile.mkdtemp(prefix='bench-transcode-')
+    results = {}
+    try:
+        for name in SOURCES:
+            source = make_source(work_dir, name, args.duration)
+            results[name] = {
+                'mode': plan_mp4(probe(source)),
+                'legacy_ms': timed(legacy_convert, source, args.runs),
+                'convert_to_mp4_ms': timed(convert_to_mp4, source, args.runs),
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""URL ayrıştırma hızı: eski get_shortcode_from_url ile instagram_url.parse_instagram_url (URL/sn).
+
+    python benchmarks/bench_url_parser.py
+    python benchmarks/bench_url_parser.py --urls 200000
+
+Karışık bir URL listesi (post, reel, tv, story, CDN, query string'li ve geçersiz)
+üç yoldan geçirilir: eski fonksiyon (her çağrıda derlenmemiş re.search döngüsü ve
+debug log çağrıları), yeni parser'ın önbelleksiz hali ve lru_cache'li hali.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from instagram_url import parse_instagram_url
+
+logger = logging.getLogger('bench-url')
+logger.setLevel(logging.ERROR)
+
+
+def legacy_get_shortcode_from_url(url: str) -> str:
+    """app.py'deki önceki uygulama"""
+    url = url.split('?')[0].rstrip('/')
+    logger.debug(f"Processing URL: {url}")
+    if 'cdninstagram.com' in url or 'fbcdn.net' in url:
+        return None
+    story_match = re.search(r'instagram\.com/stories/([^/]+)/(\d+)', url)
+    if story_match:
+        username = story_match.group(1)
+        story_id = story_match.group(2)
+        logger.debug(f"Story match found - username: {username}, id: {story_id}")
+        return f"story_{username}_{story_id}"
+    patterns = {
+        'post': r'/p/([^/]+)',
+        'reel': r'/reel/([^/]+)',
+        'igtv': r'/tv/([^/]+)',
+    }
+    for media_type, pattern in patterns.items():
+        if match := re.search(pattern, url):
+            logger.debug(f"Matched pattern: {media_type} - {pattern}")
+            return match.group(1)
+    logger.warning(f"No pattern matched for URL: {url}")
+    return None
+
+
+def make_urls(count: int, distinct: int) -> list:
+    rng = random.Random(3)
+    templates = [
+        'https://www.instagram.com/p/{code}/',
+        'https://www.instagram.com/reel/{code}/?igsh={code}',
+        'https://instagram.com/reels/{code}',
+        'https://www.instagram.com/tv/{code}/?utm_source=ig_web_copy_link',
+        'https://www.instagram.com/someone/p/{code}/',
+        'https://www.instagram.com/stories/some.user/31{num}/',
+        'https://scontent-ist1-1.cdninstagram.com/v/t51.2885-15/{num}_n.jpg?stp=dst&_nc_ht=x&oh={code}',
+        'https://www.instagram.com/explore/',
+    ]
+    pool = []
+    for _ in range(distinct):
+        code = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-') for _ in range(11))
+        pool.append(rng.choice(templates).format(code=code, num=rng.randrange(10 ** 9)))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def rate(func, urls: list) -> int:
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    return int(len(urls) / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=100000)
+    parser.add_argument('--distinct', type=int, default=2000, help='listede kaç farklı URL olacağı')
+    args = parser.parse_args()
+
+    urls = make_urls(args.urls, args.distinct)
+    parse_instagram_url.cache_clear()
+    results = {
+        'legacy_urls_per_sec': rate(legacy_get_shortcode_from_url, urls),
+        'parser_uncached_urls_per_sec': rate(parse_instagram_url.__wrapped__, urls),
+        'parser_cached_urls_per_sec': rate(parse_instagram_url, urls),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
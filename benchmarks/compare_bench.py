@@ -0,0 +1,138 @@
+"""İki run_bench.py sonucunu senaryo bazında karşılaştır, gerileme varsa hata ver.
+
+    python benchmarks/compare_bench.py benchmarks/results/base.json benchmarks/results/head.json
+    python benchmarks/compare_bench.py base.json head.json --p95-tolerance 0.10 --rss-tolerance 0.15
+    python benchmarks/compare_bench.py base.json head.json --only-if-changed app.py,tasks.py --base-ref origin/main
+
+Gecikme gerilemesi iki koşulla raporlanır: p95 toleranstan fazla artmış olmalı ve
+Mann-Whitney U testi (tek yönlü: yeni örnekler daha yavaş) anlamlı olmalı. Böylece
+gürültüden kaynaklanan tek seferlik sıçramalar gate'i kırmaz. Tepe RSS, tolerans
+üstünde artarsa gerileme sayılır. Gerileme varsa çıkış kodu 1'dir.
+"""
+import argparse
+import json
+import math
+import subprocess
+import sys
+
+
+def mann_whitney_greater(baseline: list, candidate: list) -> tuple:
+    """candidate > baseline hipotezi için U istatistiği ve p-değeri (normal yaklaşım, tie düzeltmeli)"""
+    n1, n2 = len(candidate), len(baseline)
+    if n1 == 0 or n2 == 0:
+        return 0.0, 1.0
+
+    combined = sorted([(v, 0) for v in candidate] + [(v, 1) for v in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = average_rank
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return u, 1.0
+    # Süreklilik düzeltmesi
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    p_value = 0.5 * math.erfc(z / math.sqrt(2))
+    return u, p_value
+
+
+def relative_change(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return (after - before) / before
+
+
+def compare(baseline: dict, candidate: dict, p95_tolerance: float, rss_tolerance: float,
+            alpha: float) -> tuple:
+    rows, regressions = [], []
+    for name, base in baseline['scenarios'].items():
+        head = candidate['scenarios'].get(name)
+        if head is None:
+            rows.append((name, 'missing in candidate', '', '', '', ''))
+            continue
+
+        p95_change = relative_change(base['latency_ms']['p95'], head['latency_ms']['p95'])
+        rss_change = relative_change(base['peak_rss_mb'], head['peak_rss_mb'])
+        _, p_value = mann_whitney_greater(base.get('samples_ms', []), head.get('samples_ms', []))
+
+        verdict = 'ok'
+        if p95_change > p95_tolerance and p_value < alpha:
+            verdict = 'LATENCY REGRESSION'
+            regressions.append(f'{name}: p95 +{p95_change:.1%} (p={p_value:.4f})')
+        if rss_change > rss_tolerance:
+            verdict = 'MEMORY REGRESSION' if verdict == 'ok' else 'LATENCY+MEMORY REGRESSION'
+            regressions.append(f'{name}: peak RSS +{rss_change:.1%}')
+        if head.get('errors', 0) > base.get('errors', 0):
+            verdict += f" (errors {base.get('errors', 0)} -> {head['errors']})"
+
+        rows.append((
+            name,
+            f"{base['latency_ms']['p95']:.1f} -> {head['latency_ms']['p95']:.1f} ms ({p95_change:+.1%})",
+            f"{base['rps']:.1f} -> {head['rps']:.1f}",
+            f"{base['peak_rss_mb']:.1f} -> {head['peak_rss_mb']:.1f} MB ({rss_change:+.1%})",
+            f'{p_value:.4f}',
+            verdict,
+        ))
+    return rows, regressions
+
+
+def changed_files(base_ref: str) -> list:
+    output = subprocess.check_output(['git', 'diff', '--name-only', f'{base_ref}...HEAD'], text=True)
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--p95-tolerance', type=float, default=0.10, help='allowed relative p95 increase')
+    parser.add_argument('--rss-tolerance', type=float, default=0.15, help='allowed relative peak RSS increase')
+    parser.add_argument('--alpha', type=float, default=0.01, help='Mann-Whitney significance level')
+    parser.add_argument('--only-if-changed', help='comma separated paths; skip the gate if none changed')
+    parser.add_argument('--base-ref', default='origin/main', help='git ref used with --only-if-changed')
+    args = parser.parse_args()
+
+    if args.only_if_changed:
+        watched = {p.strip() for p in args.only_if_changed.split(',')}
+        if not watched & set(changed_files(args.base_ref)):
+            print(f'No changes to {", ".join(sorted(watched))} since {args.base_ref}, skipping performance gate')
+            return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.p95_tolerance, args.rss_tolerance, args.alpha)
+
+    header = ('scenario', 'p95', 'rps', 'peak rss', 'p-value', 'verdict')
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+    if regressions:
+        print('\nPerformance regressions:')
+        for regression in regressions:
+            print(f'  - {regression}')
+        return 1
+    print('\nNo performance regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
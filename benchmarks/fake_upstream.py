@@ -0,0 +1,138 @@
+"""Instagram ve CDN yerine geçen yerel sahte upstream.
+
+instaloader'ın kullandığı GraphQL endpoint'ini hazır post JSON'u ile, CDN'i de
+istenen boyutta medya blob'ları ile taklit eder. Gecikme, boyut ve hata oranı
+ayarlanabilir, böylece benchmark'lar internete çıkmadan tekrarlanabilir.
+
+    python benchmarks/fake_upstream.py --port 9100 --latency-ms 50 --error-rate 0.01
+
+Shortcode 'V' ile başlıyorsa video (reel), aksi halde resim postu döner.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from aiohttp import web
+
+
+class FakeUpstream:
+    def __init__(self, base_url: str, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, media_size: int = 512 * 1024, video_file: str = None):
+        self.base_url = base_url.rstrip('/')
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.media_size = media_size
+        # Ses dönüşümü senaryosu için ffmpeg'in okuyabileceği gerçek bir video gerekir
+        if video_file:
+            with open(video_file, 'rb') as f:
+                self.video_blob = f.read()
+        else:
+            self.video_blob = os.urandom(media_size)
+        self.image_blob = b'\xff\xd8\xff\xe0' + os.urandom(max(media_size // 4, 16))
+        self.counters = {'metadata': 0, 'media': 0, 'errors': 0}
+
+    async def _delay(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _should_fail(self) -> bool:
+        if self.error_rate and random.random() < self.error_rate:
+            self.counters['errors'] += 1
+            return True
+        return False
+
+    def post_item(self, shortcode: str) -> dict:
+        """instaloader'ın Post._normalize_post_data ile işlediği media item yapısı"""
+        is_video = shortcode.startswith('V')
+        item = {
+            'code': shortcode,
+            'pk': str(abs(hash(shortcode)) % 10 ** 18),
+            'media_type': 2 if is_video else 1,
+            'taken_at': int(time.time()) - 3600,
+            'user': {'pk': '1000', 'username': 'bench_user', 'full_name': 'Bench User'},
+            'caption': {'text': f'Benchmark post {shortcode}'},
+            'like_count': 42,
+            'comment_count': 7,
+            'image_versions2': {
+                'candidates': [{'url': f'{self.base_url}/media/{shortcode}.jpg', 'width': 1080, 'height': 1350}]
+            },
+        }
+        if is_video:
+            item['video_versions'] = [{'url': f'{self.base_url}/media/{shortcode}.mp4', 'width': 720, 'height': 1280}]
+            item['video_duration'] = 15.0
+            item['view_count'] = 1000
+        return item
+
+    async def home(self, request):
+        response = web.Response(text='ok')
+        response.set_cookie('csrftoken', 'benchcsrftoken')
+        return response
+
+    async def graphql(self, request):
+        self.counters['metadata'] += 1
+        await self._delay()
+        if self._should_fail():
+            return web.json_response({'status': 'fail', 'message': 'Please wait a few minutes'}, status=429)
+
+        params = dict(request.query)
+        if request.method == 'POST':
+            params.update(await request.post())
+        variables = json.loads(params.get('variables', '{}'))
+        shortcode = variables.get('shortcode', 'BENCH')
+        if shortcode.startswith('X'):
+            return web.json_response({'status': 'ok', 'data': {'xdt_api__v1__media__shortcode__web_info': {'items': []}}})
+        return web.json_response({
+            'status': 'ok',
+            'data': {'xdt_api__v1__media__shortcode__web_info': {'items': [self.post_item(shortcode)]}}
+        })
+
+    async def media(self, request):
+        self.counters['media'] += 1
+        await self._delay()
+        if self._should_fail():
+            return web.Response(status=503)
+        name = request.match_info['name']
+        if name.endswith('.mp4'):
+            return web.Response(body=self.video_blob, content_type='video/mp4')
+        return web.Response(body=self.image_blob, content_type='image/jpeg')
+
+    async def stats(self, request):
+        return web.json_response(self.counters)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/', self.home)
+        app.router.add_route('*', '/graphql/query', self.graphql)
+        app.router.add_route('*', '/graphql/query/', self.graphql)
+        app.router.add_get('/media/{name}', self.media)
+        app.router.add_get('/__stats', self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Instagram/CDN stand-in for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--media-size', type=int, default=512 * 1024)
+    parser.add_argument('--video-file', help='real MP4 served for video posts (needed for format=sound)')
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(
+        f'http://{args.host}:{args.port}',
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, media_size=args.media_size,
+        video_file=args.video_file
+    )
+    web.run_app(upstream.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Offline yük testi: sahte upstream + uygulama başlatılır, senaryolar koşulur.
+
+    python benchmarks/run_bench.py --requests 200 --concurrency 10 --output benchmarks/results/base.json
+    python benchmarks/run_bench.py --scenarios preview,proxy_image --latency-ms 80
+
+Her senaryo için RPS, p50/p95/p99 gecikme, hata sayısı ve sunucu process'inin
+(ffmpeg gibi alt process'ler dahil) tepe RSS değeri ölçülür. Sonuçlar ham gecikme
+örnekleriyle birlikte JSON olarak yazılır; iki çalıştırma compare_bench.py ile
+karşılaştırılabilir. Redis çalışıyor olmalıdır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import aiohttp
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+
+
+def _ig(path: str) -> str:
+    return quote(f'https://www.instagram.com/{path}', safe='')
+
+
+def build_scenarios(upstream: str) -> dict:
+    """Senaryo adı -> (method, path listesi, JSON gövdesi)"""
+    return {
+        'download': ('POST', ['/api/download'], {'url': 'https://www.instagram.com/p/IMGBENCH01/'}),
+        'download_media_original': ('GET', [f'/api/download-media?url={_ig("reel/VIDBENCH01/")}&format=original'], None),
+        'download_media_sound': ('GET', [f'/api/download-media?url={_ig("reel/VIDBENCH01/")}&format=sound'], None),
+        'preview': ('GET', [f'/api/preview?url={_ig("p/IMGBENCH01/")}'], None),
+        'proxy_image': ('GET', [f'/api/proxy-image?url={quote(upstream + "/media/thumb.jpg", safe="")}'], None),
+        'localized_pages': ('GET', ['/en', '/tr', '/en/about', '/tr/privacy'], None),
+    }
+
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def process_tree_rss(process: psutil.Process) -> int:
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+async def sample_rss(process: psutil.Process, peak: dict, stop: asyncio.Event):
+    while not stop.is_set():
+        peak['rss'] = max(peak['rss'], process_tree_rss(process))
+        await asyncio.sleep(0.05)
+
+
+async def run_scenario(base_url: str, scenario: tuple, total: int, concurrency: int,
+                       server: psutil.Process) -> dict:
+    method, paths, body = scenario
+    samples, errors, statuses = [], 0, {}
+    counter = iter(range(total))
+    peak = {'rss': process_tree_rss(server)}
+    stop = asyncio.Event()
+
+    async def worker(session):
+        nonlocal errors
+        for i in counter:
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, json=body) as response:
+                    await response.read()
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                    if response.status >= 400:
+                        errors += 1
+            except Exception:
+                errors += 1
+                statuses['exception'] = statuses.get('exception', 0) + 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    sampler = asyncio.create_task(sample_rss(server, peak, stop))
+    timeout = aiohttp.ClientTimeout(total=300)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    ordered = sorted(samples)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'rps': round(len(samples) / duration, 2) if duration else 0,
+        'latency_ms': {
+            'mean': round(statistics.fmean(ordered), 3) if ordered else 0,
+            'p50': round(percentile(ordered, 50), 3),
+            'p95': round(percentile(ordered, 95), 3),
+            'p99': round(percentile(ordered, 99), 3),
+            'max': round(ordered[-1], 3) if ordered else 0,
+        },
+        'peak_rss_mb': round(peak['rss'] / (1024 * 1024), 2),
+        'samples_ms': [round(s, 3) for s in samples],
+    }
+
+
+async def wait_for(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up in {timeout}s')
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+async def main_async(args) -> dict:
+    upstream_url = f'http://127.0.0.1:{args.upstream_port}'
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    upstream_cmd = [
+        sys.executable, os.path.join(BENCH_DIR, 'fake_upstream.py'),
+        '--port', str(args.upstream_port),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--media-size', str(args.media_size),
+    ]
+    if args.video_file:
+        upstream_cmd += ['--video-file', args.video_file]
+    server_cmd = [sys.executable, os.path.join(BENCH_DIR, 'bench_server.py'), '--port', str(args.port)]
+    env = dict(os.environ, FAKE_UPSTREAM_URL=upstream_url)
+
+    upstream_proc = subprocess.Popen(upstream_cmd, env=env)
+    server_proc = subprocess.Popen(server_cmd, env=env)
+    try:
+        await wait_for(upstream_url + '/__stats')
+        await wait_for(base_url + '/en')
+        server = psutil.Process(server_proc.pid)
+
+        scenarios = build_scenarios(upstream_url)
+        selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+        results = {}
+        for name in selected:
+            if name not in scenarios:
+                raise SystemExit(f'Unknown scenario: {name}. Available: {", ".join(scenarios)}')
+            print(f'-> {name}', file=sys.stderr)
+            # Isınma: bağlantılar, template cache'i, ilk import'lar
+            await run_scenario(base_url, scenarios[name], args.warmup, 1, server)
+            results[name] = await run_scenario(base_url, scenarios[name], args.requests, args.concurrency, server)
+            summary = results[name]
+            print(f'   {summary["rps"]} rps, p50 {summary["latency_ms"]["p50"]} ms, '
+                  f'p95 {summary["latency_ms"]["p95"]} ms, p99 {summary["latency_ms"]["p99"]} ms, '
+                  f'errors {summary["errors"]}, peak rss {summary["peak_rss_mb"]} MB', file=sys.stderr)
+        return {
+            'meta': {
+                'created_at': datetime.utcnow().isoformat(),
+                'git_commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'config': {
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'warmup': args.warmup,
+                    'latency_ms': args.latency_ms,
+                    'jitter_ms': args.jitter_ms,
+                    'error_rate': args.error_rate,
+                    'media_size': args.media_size,
+                },
+            },
+            'scenarios': results,
+        }
+    finally:
+        for proc in (server_proc, upstream_proc):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test against a fake Instagram upstream')
+    parser.add_argument('--scenarios', help='comma separated scenario names (default: all)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--upstream-port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--media-size', type=int, default=512 * 1024)
+    parser.add_argument('--video-file', help='real MP4 for the sound conversion scenario')
+    parser.add_argument('--output', help='result JSON path (default: benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', datetime.utcnow().strftime('%Y%m%dT%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from fastapi import HTTPException
+
+from metrics import CIRCUIT_STATE, CIRCUIT_REJECTIONS, CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger('instatest')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Ortak eşikler; breaker'a özgü değerler BREAKERS'ta
+DEFAULTS = {
+    'window_seconds': 60,          # Hata / yavaşlık oranının hesaplandığı pencere
+    'bucket_seconds': 10,          # Pencere bu büyüklükte Redis hash'lerine bölünür
+    'min_calls': int(os.getenv('CIRCUIT_MIN_CALLS', 20)),  # Daha az çağrıda karar verilmez
+    'failure_rate': 0.5,
+    'slow_call_rate': 0.8,
+    'slow_call_seconds': 5.0,
+    'open_seconds': int(os.getenv('CIRCUIT_OPEN_SECONDS', 30)),  # Açık kalma süresi
+    'half_open_calls': 3,          # Yarı açıkken geçmesine izin verilen deneme çağrısı
+}
+
+# Upstream işlemi -> eşik farkları
+BREAKERS = {
+    # instaloader ile post metadata'sı (preview, download)
+    'metadata': {'label': 'Instagram', 'slow_call_seconds': 5.0},
+    # CDN'den resim / video (proxy-image, thumbnail, download-media); süre ilk byte'a kadar
+    'cdn': {'label': 'Instagram CDN', 'slow_call_seconds': 10.0},
+}
+
+# Redis'teki durumun process içinde önbellekte tutulduğu süre (çağrı başına GET olmasın)
+STATE_CACHE_SECONDS = 1.0
+
+
+class CircuitOpen(HTTPException):
+    def __init__(self, label: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"{label} is not responding right now. Please try again in {retry_after} seconds.",
+            headers={'Retry-After': str(retry_after)}
+        )
+
+
+def _config(name: str) -> dict:
+    return {**DEFAULTS, **BREAKERS[name]}
+
+
+def _state_key(name: str) -> str:
+    return f"circuit:{name}:state"
+
+
+def _stats_keys(name: str, now: float, config: dict) -> list:
+    step = config['bucket_seconds']
+    current = int(now // step * step)
+    return [f"circuit:{name}:stats:{current - i * step}" for i in range(config['window_seconds'] // step)]
+
+
+def _summarize(buckets: list) -> dict:
+    totals = {'calls': 0, 'failures': 0, 'slow': 0}
+    for bucket in buckets:
+        for field, value in (bucket or {}).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field in totals:
+                totals[field] += int(value)
+    return totals
+
+
+def _decode(mapping: dict) -> dict:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in (mapping or {}).items()
+    }
+
+
+# Deneme hakkı ve open -> half_open geçişi tek atomik adımda: ayrı INCR + HSET/DEL
+# arasında başka bir worker'ın geçişi deneme sayacını sıfırlayamaz.
+# Dönüş: {0} kapalı, {-1, retry_after} reddet, {1, geçiş yapıldı mı} deneme çağrısı
+_TRIAL_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {0, 0}
+end
+local now = tonumber(ARGV[1])
+local open_seconds = tonumber(ARGV[2])
+local transitioned = 0
+if state == 'open' then
+    local elapsed = now - tonumber(redis.call('HGET', KEYS[1], 'changed_at') or '0')
+    if elapsed < open_seconds then
+        return {-1, tostring(open_seconds - elapsed)}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'half_open', 'changed_at', ARGV[1], 'reason', 'open timeout elapsed')
+    transitioned = 1
+end
+local trials = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], open_seconds)
+if trials > tonumber(ARGV[3]) then
+    return {-1, tostring(open_seconds)}
+end
+return {1, transitioned}
+"""
+
+
+def _trials_key(name: str) -> str:
+    return f"circuit:{name}:trials"
+
+
+class _Call:
+    __slots__ = ('failed',)
+
+    def __init__(self):
+        self.failed = False
+
+
+class CircuitBreaker:
+    """Bir upstream işlemi için Redis'te paylaşılan devre kesici.
+
+    closed: çağrılar geçer; pencerede en az min_calls çağrı varken hata ya da yavaş
+    çağrı oranı eşiği aşarsa open olur. open: çağrılar upstream'e gitmeden 503 alır;
+    open_seconds sonra half_open olur ve half_open_calls kadar deneme çağrısı geçer.
+    Deneme başarılıysa closed, başarısızsa tekrar open. Durum tüm worker'larda ortaktır.
+    """
+
+    def __init__(self, redis_client, name: str):
+        self.redis = redis_client
+        self.name = name
+        self.config = _config(name)
+        self._state = (CLOSED, 0.0)
+        self._state_read_at = 0.0
+        self._trial_script = redis_client.register_script(_TRIAL_SCRIPT)
+
+    async def _read_state(self) -> tuple:
+        now = time.monotonic()
+        if now - self._state_read_at >= STATE_CACHE_SECONDS:
+            state = _decode(await self.redis.hgetall(_state_key(self.name)))
+            self._state = (state.get('state', CLOSED), float(state.get('changed_at', 0)))
+            self._state_read_at = now
+            CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[self._state[0]])
+        return self._state
+
+    async def _transition(self, state: str, reason: str):
+        """closed / open geçişi; yeni bir deneme turu için deneme sayacı sıfırlanır.
+        half_open'a geçiş sadece _TRIAL_SCRIPT içinde yapılır."""
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(_state_key(self.name), mapping={'state': state, 'changed_at': now, 'reason': reason})
+        pipe.delete(_trials_key(self.name))
+        if state == CLOSED:
+            # Açılmadan önceki hatalar devreyi hemen tekrar açmasın
+            pipe.delete(*_stats_keys(self.name, now, self.config))
+        await pipe.execute()
+        self._entered(state, now, reason)
+
+    def _entered(self, state: str, now: float, reason: str):
+        self._state = (state, now)
+        self._state_read_at = time.monotonic()
+        CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(name=self.name, state=state).inc()
+        log = logger.warning if state == OPEN else logger.info
+        log(f"Circuit {self.name} -> {state} ({reason})")
+
+    async def check(self) -> bool:
+        """Çağrı geçebiliyorsa True (half_open'da deneme çağrısı), açıksa CircuitOpen.
+        Redis'e ulaşılamazsa devre kapalı sayılır."""
+        try:
+            state, changed_at = await self._read_state()
+            if state == CLOSED:
+                return False
+            elapsed = time.time() - changed_at
+            if state == OPEN and elapsed < self.config['open_seconds']:
+                self._reject(self.config['open_seconds'] - elapsed)
+            # Süre doldu ya da yarı açık: sınırlı sayıda deneme çağrısı geçer.
+            # Durum Redis'ten tekrar okunur; yerel önbellek başka worker'ın geçişini kaçırmış olabilir.
+            now = time.time()
+            verdict, detail = await self._trial_script(
+                keys=[_state_key(self.name), _trials_key(self.name)],
+                args=[now, self.config['open_seconds'], self.config['half_open_calls']]
+            )
+            if verdict == 0:
+                # Başka bir worker devreyi kapatmış
+                self._state, self._state_read_at = (CLOSED, 0.0), time.monotonic()
+                return False
+            if verdict == -1:
+                self._reject(float(detail))
+            if int(detail):
+                self._entered(HALF_OPEN, now, 'open timeout elapsed')
+            return True
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            logger.warning(f"Circuit {self.name} state unavailable: {str(e)}")
+            return False
+
+    async def fail_fast(self):
+        """Devre açıksa (deneme zamanı gelmemişse) hemen CircuitOpen; deneme hakkı harcamaz.
+        Loader / cookie almadan önce çağrılır."""
+        try:
+            state, changed_at = await self._read_state()
+        except Exception:
+            return
+        elapsed = time.time() - changed_at
+        if state == OPEN and elapsed < self.config['open_seconds']:
+            self._reject(self.config['open_seconds'] - elapsed)
+
+    def _reject(self, retry_after: float):
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        raise CircuitOpen(self.config['label'], max(1, int(retry_after + 0.999)))
+
+    async def record(self, failed: bool, duration: float, trial: bool = False):
+        """Çağrı sonucunu pencereye yaz; eşik aşıldıysa devreyi aç"""
+        slow = duration >= self.config['slow_call_seconds']
+        try:
+            if trial:
+                if failed or slow:
+                    await self._transition(OPEN, 'trial call failed' if failed else 'trial call slow')
+                else:
+                    await self._transition(CLOSED, 'trial call succeeded')
+                return
+
+            now = time.time()
+            keys = _stats_keys(self.name, now, self.config)
+            bucket_ttl = self.config['window_seconds'] + self.config['bucket_seconds']
+            if not (failed or slow):
+                # Başarılı çağrı tek komut; TTL bucket'ın ilk çağrısında konur
+                if await self.redis.hincrby(keys[0], 'calls', 1) == 1:
+                    await self.redis.expire(keys[0], bucket_ttl)
+                return
+
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(keys[0], 'calls', 1)
+            if failed:
+                pipe.hincrby(keys[0], 'failures', 1)
+            if slow:
+                pipe.hincrby(keys[0], 'slow', 1)
+            pipe.expire(keys[0], bucket_ttl)
+            # Pencere sadece kötü bir çağrıdan sonra okunur
+            for key in keys:
+                pipe.hgetall(key)
+            replies = await pipe.execute()
+
+            stats = _summarize(replies[-len(keys):])
+            if stats['calls'] < self.config['min_calls'] or self._state[0] == OPEN:
+                return
+            failure_rate = stats['failures'] / stats['calls']
+            slow_rate = stats['slow'] / stats['calls']
+            if failure_rate >= self.config['failure_rate']:
+                await self._transition(OPEN, f"failure rate {failure_rate:.0%} over {stats['calls']} calls")
+            elif slow_rate >= self.config['slow_call_rate']:
+                await self._transition(OPEN, f"slow call rate {slow_rate:.0%} over {stats['calls']} calls")
+        except Exception as e:
+            logger.warning(f"Circuit {self.name} record failed: {str(e)}")
+
+    @asynccontextmanager
+    async def guard(self, is_failure: Callable[[BaseException], bool] = lambda e: True):
+        """Bloğu devre üzerinden çalıştır; istisna is_failure ile sınıflandırılır.
+        İstisnasız biten çağrı, blok içinde call.failed = True ile başarısız sayılabilir
+        (ör. upstream 5xx döndüğünde)."""
+        trial = await self.check()
+        call = _Call()
+        start = time.monotonic()
+        try:
+            yield call
+        except asyncio.CancelledError:
+            # İstemci gitti; upstream hakkında bilgi yok
+            raise
+        except BaseException as e:
+            await self.record(is_failure(e), time.monotonic() - start, trial)
+            raise
+        await self.record(call.failed, time.monotonic() - start, trial)
+
+
+def read_status(redis_client, names=None) -> dict:
+    """/system-status için breaker durumları (sync Redis client ile)"""
+    now = time.time()
+    names = names or list(BREAKERS)
+    pipe = redis_client.pipeline(transaction=False)
+    for name in names:
+        config = _config(name)
+        pipe.hgetall(_state_key(name))
+        for key in _stats_keys(name, now, config):
+            pipe.hgetall(key)
+    replies = pipe.execute()
+
+    status = {}
+    index = 0
+    for name in names:
+        config = _config(name)
+        count = len(_stats_keys(name, now, config))
+        state = _decode(replies[index])
+        stats = _summarize(replies[index + 1:index + 1 + count])
+        index += 1 + count
+        changed_at = float(state.get('changed_at', 0)) or None
+        current = state.get('state', CLOSED)
+        retry_in = None
+        if current == OPEN and changed_at:
+            retry_in = max(0, int(config['open_seconds'] - (now - changed_at)))
+        status[name] = {
+            'label': config['label'],
+            'state': current,
+            'reason': state.get('reason'),
+            'changed_at': changed_at,
+            'retry_in': retry_in,
+            'window_seconds': config['window_seconds'],
+            'calls': stats['calls'],
+            'failure_rate': round(stats['failures'] / stats['calls'], 3) if stats['calls'] else 0.0,
+            'slow_call_rate': round(stats['slow'] / stats['calls'], 3) if stats['calls'] else 0.0,
+        }
+    return status
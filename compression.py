@@ -0,0 +1,188 @@
+import mimetypes
+import stat
+import zlib
+from typing import Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli kurulu değilse sadece gzip kullanılır
+    brotli = None
+
+# Sadece metin tabanlı içerik sıkıştırılır; JPEG/MP4/MP3/zip zaten sıkıştırılmıştır
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/xhtml+xml',
+    'application/manifest+json',
+    'image/svg+xml',
+)
+
+# Build sırasında precompress_static.py'nin ürettiği dosya uzantıları
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings() -> tuple:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: str, available: tuple = None) -> Optional[str]:
+    """Accept-Encoding'e göre en yüksek q değerli desteklenen kodlama (eşitlikte br)"""
+    available = available or available_encodings()
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(';')[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._process = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Stream edilen yanıtlarda her parça flush edilir ki istemci beklemesin
+        return self._process(data) + (self._finish() if final else self._flush())
+
+
+class CompressionMiddleware:
+    """İçerik türüne bakan sıkıştırma: HTML/JSON/CSS/JS için brotli veya gzip,
+    medya, arşiv ve byte aralığı sunan yanıtlar olduğu gibi geçer"""
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.passthrough = False
+        self.encoder = None
+
+    def _should_compress(self, message) -> bool:
+        headers = Headers(raw=message['headers'])
+        return (
+            message['status'] not in (204, 206, 304)
+            and 'content-encoding' not in headers
+            and 'content-range' not in headers
+            and 'accept-ranges' not in headers
+            and is_compressible(headers.get('content-type', ''))
+        )
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            if self._should_compress(message):
+                # Başlıklar ilk gövde parçası görülene kadar bekletilir
+                self.start_message = message
+            else:
+                self.passthrough = True
+                await self._send(message)
+            return
+
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.encoder = _Encoder(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            compressed = self.encoder.compress(body, final=not more_body)
+            if more_body:
+                del headers['Content-Length']
+            else:
+                headers['Content-Length'] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+            return
+
+        await self._send({
+            'type': 'http.response.body',
+            'body': self.encoder.compress(body, final=not more_body),
+            'more_body': more_body,
+        })
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Yanında .br / .gz kopyası olan statik dosyaları istemcinin desteklediği kodlamayla sunar"""
+
+    async def get_response(self, path: str, scope):
+        if scope['method'] in ('GET', 'HEAD'):
+            accept_encoding = Headers(scope=scope).get('accept-encoding', '')
+            # Hazır dosya sunulduğu için brotli kütüphanesi gerekmez
+            for encoding in ('br', 'gzip'):
+                if negotiate(accept_encoding, (encoding,)) != encoding:
+                    continue
+                full_path, stat_result = self.lookup_path(path + PRECOMPRESSED_SUFFIXES[encoding])
+                if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                    continue
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Vary'] = 'Accept-Encoding'
+                # Content-Type sıkıştırılmış kopyanın değil orijinal dosyanın türü olmalı
+                media_type = mimetypes.guess_type(path)[0] or 'text/plain'
+                if media_type.startswith('text/'):
+                    media_type += '; charset=utf-8'
+                response.headers['Content-Type'] = media_type
+                return response
+        return await super().get_response(path, scope)
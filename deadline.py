@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+from metrics import REQUESTS_ABANDONED
+
+logger = logging.getLogger('instatest')
+
+# İstek başına toplam süre bütçesi (sn): retry beklemeleri, loader alma ve upstream
+# çağrıları bu bütçeden düşer
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 30))
+# Medya indirip dönüştüren istekler için daha geniş bütçe
+DOWNLOAD_DEADLINE = float(os.getenv('DOWNLOAD_DEADLINE', 120))
+
+# Retry beklemesi: [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^deneme)] aralığında rastgele
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 4.0
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail='Request deadline exceeded')
+
+
+class Deadline:
+    """İsteğin bitmesi gereken an; süre isteyen her adım kalan bütçeyle sınırlanır"""
+
+    def __init__(self, budget: float = REQUEST_DEADLINE):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Kalan süre (cap verilmişse en fazla cap); süre dolduysa DeadlineExceeded"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        return min(remaining, cap) if cap is not None else remaining
+
+    async def wait(self, awaitable, cap: Optional[float] = None):
+        try:
+            timeout = self.timeout(cap)
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            if self.remaining() <= 0:
+                raise DeadlineExceeded()
+            raise
+
+    async def sleep(self, delay: float):
+        """Bekle; bekleme sonrasında deneme yapacak süre kalmayacaksa hemen vazgeç"""
+        if delay >= self.remaining():
+            raise DeadlineExceeded()
+        await asyncio.sleep(delay)
+
+
+def current_deadline() -> Deadline:
+    """Aktif isteğin bütçesi; istek dışında (ör. testler, script'ler) yeni bir varsayılan bütçe"""
+    return _current.get() or Deadline()
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full jitter: aynı anda başarısız olan istekler aynı anda tekrar denemesin"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def run_blocking(func, *args, cap: Optional[float] = None, on_submit=None):
+    """Bloklayan çağrıyı thread'de çalıştır; bütçe biterse ya da istek iptal edilirse
+    beklemeyi bırak. Thread kendi zaman aşımına kadar sürer, sonucu yok sayılır;
+    on_submit thread'in future'ını alır (ör. kaynağı thread bitince serbest bırakmak için)."""
+    # Süre zaten dolduysa thread'e iş verme (sonucu beklenmeyecek bir upstream çağrısı olur)
+    current_deadline().timeout(cap)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(None, lambda: context.run(func, *args))
+    # Beklemeyi bırakırsak thread'in hatası "never retrieved" uyarısı vermesin
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    if on_submit is not None:
+        on_submit(future)
+    return await current_deadline().wait(asyncio.shield(future), cap)
+
+
+async def _wait_disconnect(request):
+    """İstemci bağlantıyı kapatana kadar bekle. Gövdesi okunmuş isteklerde receive()
+    sadece http.disconnect ile döner; request.is_disconnected() BaseHTTPMiddleware
+    arkasında kopmayı göremediği için kullanılmaz."""
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def run_request(request, coro, budget: float = REQUEST_DEADLINE, route: str = ''):
+    """coro'yu istek bütçesiyle çalıştır; istemci bağlantıyı kapatırsa ya da bütçe
+    dolarsa iş hemen iptal edilir (finally blokları loader'ları geri verir)"""
+    token = _current.set(Deadline(budget))
+    try:
+        # Task oluşturulurken context kopyalanır; deadline alt çağrılara böyle taşınır
+        work = asyncio.ensure_future(coro)
+    finally:
+        _current.reset(token)
+    watcher = asyncio.ensure_future(_wait_disconnect(request))
+    started = time.monotonic()
+    try:
+        done, _ = await asyncio.wait({work, watcher}, timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+        if watcher in done and work not in done and watcher.exception() is not None:
+            # Bağlantı durumu okunamadı; sadece bütçe uygulanır
+            logger.warning(f"Disconnect watcher failed: {str(watcher.exception())}")
+            done, _ = await asyncio.wait({work}, timeout=max(0.0, budget - (time.monotonic() - started)))
+        if work in done:
+            return work.result()
+        reason = 'disconnect' if watcher in done else 'deadline'
+        REQUESTS_ABANDONED.labels(route=route, reason=reason).inc()
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        if reason == 'deadline':
+            raise DeadlineExceeded()
+        logger.info(f"Client disconnected from {route} after {time.monotonic() - started:.1f}s, work cancelled")
+        # İstemci gitti; yanıt kimseye ulaşmaz (nginx'in 499'u)
+        return Response(status_code=499)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            # run_request'in kendisi iptal edildi (ör. sunucu kapanıyor)
+            work.cancel()
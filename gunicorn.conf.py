@@ -0,0 +1,20 @@
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Prometheus multiprocess modu için her başlangıçta PROMETHEUS_MULTIPROC_DIR
+# temiz olmalı, aksi halde eski worker'ların değerleri toplama karışır
+def on_starting(server):
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for name in os.listdir(multiproc_dir):
+            os.remove(os.path.join(multiproc_dir, name))
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -9,12 +9,12 @@ import time
 import random
 from datetime import datetime
 import logging
-import redis
 import asyncio
 from dotenv import load_dotenv
 import sys
 import traceback
 from pathlib import Path
+from redis_pool import get_redis
 import base64
 import requests
 from selenium.webdriver.chrome.options import Options
@@ -70,13 +70,7 @@ class InstagramCookieHarvester:
     def setup_redis(self):
         """Redis bağlantısı kur"""
         try:
-            self.redis = redis.Redis(
-                host=os.getenv('REDIS_HOST', 'localhost'),
-                port=int(os.getenv('REDIS_PORT', 6379)),
-                db=int(os.getenv('REDIS_DB', 0)),
-                password=os.getenv('REDIS_PASSWORD'),
-                decode_responses=True
-            )
+            self.redis = get_redis()
             logging.info("Redis connection established")
         except Exception as e:
             logging.error(f"Redis connection failed: {str(e)}")
@@ -0,0 +1,153 @@
+import os
+import re
+import uuid
+from email.utils import formatdate
+from typing import Optional
+
+import anyio
+from fastapi.responses import Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+# Çok sayıda küçük aralıkla yapılan istekler tam yanıt ile karşılanır
+MAX_RANGES = 16
+
+_RANGE_SPEC = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[list]:
+    """`Range: bytes=...` başlığını (start, end) listesine çevir; geçersizse None (tam yanıt)"""
+    if not header or not header.strip().lower().startswith('bytes='):
+        return None
+
+    ranges = []
+    for spec in header.strip()[6:].split(','):
+        match = _RANGE_SPEC.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first == '':
+            # bytes=-500: son 500 byte
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Çakışan / bitişik aralıkları birleştir
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range yoksa ya da kaynak değişmediyse True; değiştiyse aralık yok sayılır"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False  # Zayıf ETag'ler aralık isteklerinde kullanılamaz
+    if if_range.startswith('"'):
+        return if_range == etag
+    return if_range == last_modified
+
+
+async def _read_file(path: str, ranges: list):
+    async with await anyio.open_file(path, 'rb') as f:
+        for start, end in ranges:
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+
+async def _read_multipart(path: str, parts: list, closing: bytes):
+    for header, byte_range in parts:
+        yield header
+        async for chunk in _read_file(path, [byte_range]):
+            yield chunk
+    yield closing
+
+
+def file_response(request, path: str, media_type: str, headers: dict = None) -> Response:
+    """Diskteki dosyayı Range / If-Range desteğiyle döndür (tek ve çoklu aralık)"""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    base_headers = {
+        **(headers or {}),
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': last_modified,
+    }
+
+    ranges = None
+    if if_range_matches(request.headers.get('if-range'), etag, last_modified):
+        try:
+            ranges = parse_range(request.headers.get('range'), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**base_headers, 'Content-Range': f'bytes */{size}'})
+
+    if not ranges:
+        return StreamingResponse(
+            _read_file(path, [(0, size - 1)]) if size else iter(()),
+            media_type=media_type,
+            headers={**base_headers, 'Content-Length': str(size)}
+        )
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return StreamingResponse(
+            _read_file(path, ranges),
+            status_code=206,
+            media_type=media_type,
+            headers={
+                **base_headers,
+                'Content-Range': f'bytes {start}-{end}/{size}',
+                'Content-Length': str(end - start + 1),
+            }
+        )
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        (
+            (f'\r\n--{boundary}\r\nContent-Type: {media_type}\r\n'
+             f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode(),
+            (start, end)
+        )
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(len(header) + end - start + 1 for header, (start, end) in parts) + len(closing)
+    return StreamingResponse(
+        _read_multipart(path, parts, closing),
+        status_code=206,
+        media_type=f'multipart/byteranges; boundary={boundary}',
+        headers={**base_headers, 'Content-Length': str(length)}
+    )
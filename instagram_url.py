@@ -0,0 +1,101 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+# URL türleri
+KIND_POST = 'post'
+KIND_REEL = 'reel'
+KIND_TV = 'tv'
+KIND_STORY = 'story'
+KIND_SHARE = 'share'
+KIND_CDN = 'cdn'
+
+# Shortcode'u olan (Post.from_shortcode ile açılabilen) türler
+MEDIA_KINDS = (KIND_POST, KIND_REEL, KIND_TV)
+
+_PATH_KINDS = {'p': KIND_POST, 'reel': KIND_REEL, 'reels': KIND_REEL, 'tv': KIND_TV}
+
+# Tek geçişte sınıflandırma: CDN host'u ya da Instagram host'u + story, paylaşım linki,
+# (kullanıcı adı önekli) post/reel/tv yolu. Query string ve fragment yok sayılır.
+_URL = re.compile(r'''
+    ^(?:(?i:https?)://)?
+    (?:
+        (?P<cdn>(?i:[\w.-]+\.(?:cdninstagram\.com|fbcdn\.net)))(?=(?::\d+)?(?:[/?\#]|$))
+      | (?i:(?:www\.|m\.)?(?:instagram\.com|instagr\.am))(?::\d+)?
+        /(?:
+            stories/(?P<story_user>[\w.]+)/(?P<story_id>\d+)
+          | (?P<share>share/(?:(?:p|reels?|tv)/)?[\w-]+)
+          | (?:[\w.]+/)?(?P<kind>p|reels?|tv)/(?P<shortcode>[\w-]+)
+        )/?(?:[?\#].*)?$
+    )
+''', re.VERBOSE | re.ASCII)
+
+_CDN_HOST = re.compile(r'[\w.-]+\.(?:cdninstagram\.com|fbcdn\.net)', re.IGNORECASE | re.ASCII)
+
+
+def is_cdn_url(url: str) -> bool:
+    """Bağlanılacak host'u (urlsplit'in gördüğü) doğrula; kullanıcı bilgisi (user@host)
+    içeren URL'ler reddedilir, aksi halde a.cdninstagram.com:x@evil.example CDN sanılır"""
+    try:
+        parts = urlsplit(url)
+        parts.port  # Geçersiz port ValueError
+    except ValueError:
+        return False
+    if parts.scheme.lower() not in ('http', 'https') or '@' in parts.netloc or parts.hostname is None:
+        return False
+    return _CDN_HOST.fullmatch(parts.hostname) is not None
+
+
+class InstagramURL(NamedTuple):
+    kind: str
+    shortcode: Optional[str] = None
+    username: Optional[str] = None
+    story_id: Optional[str] = None
+    url: Optional[str] = None
+
+    @property
+    def cache_key(self) -> str:
+        """Aynı medyaya giden tüm URL varyantları için tek anahtar"""
+        if self.kind == KIND_STORY:
+            return f"story_{self.username}_{self.story_id}"
+        if self.kind in MEDIA_KINDS:
+            # /p/X, /reel/X ve /tv/X aynı medyayı gösterir
+            return self.shortcode
+        return self.url
+
+    @property
+    def canonical_url(self) -> str:
+        if self.kind in MEDIA_KINDS:
+            segment = 'p' if self.kind == KIND_POST else self.kind
+            return f"https://www.instagram.com/{segment}/{self.shortcode}/"
+        if self.kind == KIND_STORY:
+            return f"https://www.instagram.com/stories/{self.username}/{self.story_id}/"
+        return self.url
+
+
+@lru_cache(maxsize=4096)
+def parse_instagram_url(url: str) -> Optional[InstagramURL]:
+    """Instagram / CDN URL'sini sınıflandır; tanınmıyorsa None"""
+    url = url.strip()
+    match = _URL.match(url)
+    if not match:
+        return None
+    if match.group('cdn'):
+        # CDN imzası query string'de; URL olduğu gibi kalır
+        url = url if '://' in url else 'https://' + url
+        return InstagramURL(KIND_CDN, url=url) if is_cdn_url(url) else None
+    if match.group('story_id'):
+        return InstagramURL(KIND_STORY, username=match.group('story_user'), story_id=match.group('story_id'))
+    if match.group('share'):
+        # Paylaşım linkindeki kod shortcode değil; yönlendirme takip edilerek çözülmeli
+        return InstagramURL(KIND_SHARE, url=f"https://www.instagram.com/{match.group('share')}/")
+    return InstagramURL(_PATH_KINDS[match.group('kind')], shortcode=match.group('shortcode'))
+
+
+def get_shortcode_from_url(url: str) -> Optional[str]:
+    """Post/reel/tv için shortcode, story için story_{kullanıcı}_{id}; diğerleri None"""
+    parsed = parse_instagram_url(url)
+    if parsed is None or parsed.kind not in MEDIA_KINDS + (KIND_STORY,):
+        return None
+    return parsed.cache_key
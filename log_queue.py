@@ -0,0 +1,63 @@
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+
+class JsonMessage:
+    """Log mesajını ancak formatlanırken JSON'a çevir (listener thread'inde)"""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def __str__(self):
+        return json.dumps(self.fields, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Sınırlı kuyruğa yazan, kuyruk doluysa kaydı düşüren handler"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Varsayılan QueueHandler mesajı burada (çağıran thread'de) formatlar.
+        # Listener aynı process'te çalıştığı için kaydı olduğu gibi bırakıyoruz,
+        # formatlama ve JSON dönüşümü arka plandaki thread'de yapılır.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class LogQueueListener(logging.handlers.QueueListener):
+    """Kapanışta kuyruk dolu olsa bile bekleyen kayıtları yazan listener"""
+
+    def enqueue_sentinel(self):
+        # Kuyruk doluysa put_nowait hata verir, listener boşaltana kadar bekle
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def start_queue_logging(logger: logging.Logger, handlers: list, maxsize: int = 10000):
+    """Logger'ı kuyruk tabanlı hale getir ve listener thread'ini başlat"""
+    log_queue = queue.Queue(maxsize=maxsize)
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = LogQueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    logger.addHandler(queue_handler)
+    listener.start()
+    return queue_handler, listener
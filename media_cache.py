@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger('instatest')
+
+MEDIA_TYPES = {
+    'mp4': 'video/mp4',
+    'mp3': 'audio/mpeg',
+    'm4a': 'audio/mp4',
+    'jpg': 'image/jpeg',
+}
+
+
+class MediaCache:
+    """İndirilen / dönüştürülen medyayı diskte tutar; tekrar ve devam (Range) istekleri
+    Instagram'a yeniden gitmeden buradan karşılanır"""
+
+    def __init__(self, directory: str = None, ttl: int = None):
+        self.directory = directory or os.getenv('MEDIA_CACHE_DIR', 'media_cache')
+        self.ttl = ttl if ttl is not None else int(os.getenv('MEDIA_CACHE_TTL', 3600))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.{extension}')
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Süresi dolmamış (path, extension) çifti ya da None"""
+        for extension in MEDIA_TYPES:
+            path = self._path(key, extension)
+            try:
+                if time.time() - os.path.getmtime(path) < self.ttl:
+                    CACHE_LOOKUPS.labels(cache='media', result='hit').inc()
+                    return path, extension
+            except FileNotFoundError:
+                continue
+        CACHE_LOOKUPS.labels(cache='media', result='miss').inc()
+        return None
+
+    def tempdir(self) -> str:
+        """Aynı dosya sisteminde çalışma dizini; put() ile taşıma atomik olur"""
+        return tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+
+    def put(self, key: str, extension: str, source: str) -> str:
+        path = self._path(key, extension)
+        os.replace(source, path)
+        return path
+
+    def cleanup(self) -> int:
+        """Süresi dolmuş dosyaları ve yarım kalmış çalışma dizinlerini sil"""
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime < self.ttl:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"Media cache cleanup removed {removed} entries")
+        return removed
@@ -0,0 +1,190 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    REGISTRY, generate_latest, start_http_server
+)
+from prometheus_client import multiprocess
+
+from tracing import span
+
+# gunicorn altında her worker kendi değerlerini PROMETHEUS_MULTIPROC_DIR'e yazar,
+# /metrics isteği hangi worker'a düşerse düşsün tüm worker'ların toplamını döndürür
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP istek süresi (route şablonu bazında)',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+
+STAGE_LATENCY = Histogram(
+    'stage_duration_seconds',
+    'İstek aşamalarının süresi',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'Önbellek sorguları',
+    ['cache', 'result']
+)
+
+NEGATIVE_CACHE_HITS = Counter(
+    'negative_cache_hits_total',
+    "Önbellekteki hata ile Instagram'a gitmeden yanıtlanan istekler",
+    ['kind']
+)
+
+REQUESTS_ABANDONED = Counter(
+    'requests_abandoned_total',
+    'İstemci bağlantıyı kapattığı ya da süre bütçesi dolduğu için iptal edilen istekler',
+    ['route', 'reason']
+)
+
+CIRCUIT_STATE = Gauge(
+    'circuit_breaker_state',
+    'Upstream devre kesici durumu (0 closed, 1 half_open, 2 open)',
+    ['name'],
+    multiprocess_mode='livemax'
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    'circuit_breaker_transitions_total',
+    'Devre kesicinin geçtiği durumlar',
+    ['name', 'state']
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    'circuit_breaker_rejections_total',
+    "Devre açıkken upstream'e gitmeden 503 ile yanıtlanan çağrılar",
+    ['name']
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    'rate_limit_rejections_total',
+    'Rate limit nedeniyle reddedilen istekler',
+    ['source']
+)
+
+TASK_EVENTS = Counter(
+    'celery_task_events_total',
+    'Celery task durum geçişleri',
+    ['task', 'state']
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Log kuyruğu dolu olduğu için düşürülen kayıtlar'
+)
+
+LOADER_POOL_SIZE = Gauge(
+    'loader_pool_size',
+    'Instaloader havuzundaki instance sayısı',
+    multiprocess_mode='livesum'
+)
+
+LOADER_POOL_IN_USE = Gauge(
+    'loader_pool_in_use',
+    'Kullanımdaki Instaloader instance sayısı',
+    multiprocess_mode='livesum'
+)
+
+TRANSCODER_ACTIVE = Gauge(
+    'transcoder_active',
+    'Çalışan ffmpeg dönüşüm sayısı',
+    multiprocess_mode='livesum'
+)
+
+TRANSCODE_DECISIONS = Counter(
+    'transcode_decisions_total',
+    'MP4 dönüşümünde seçilen yol (copy / audio / transcode) ve sonucu',
+    ['mode', 'result']
+)
+
+TRANSCODE_DURATION = Histogram(
+    'transcode_duration_seconds',
+    'Dönüşüm yoluna göre ffprobe + ffmpeg süresi',
+    ['mode'],
+    buckets=LATENCY_BUCKETS
+)
+
+REDIS_POOL_IN_USE = Gauge(
+    'redis_pool_connections_in_use',
+    'Havuzdan alınmış (kullanımdaki) Redis bağlantıları',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+REDIS_POOL_MAX = Gauge(
+    'redis_pool_max_connections',
+    'Redis havuzunun bağlantı üst sınırı',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+REDIS_POOL_WAIT = Histogram(
+    'redis_pool_wait_seconds',
+    'Havuzdan bağlantı alırken geçen süre',
+    ['pool'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+
+# Aşama isimleri
+STAGE_METADATA = 'metadata_resolve'
+STAGE_LOADER_WAIT = 'loader_checkout_wait'
+STAGE_UPSTREAM = 'upstream_fetch'
+STAGE_TRANSCODE = 'transcode'
+STAGE_STREAMING = 'response_streaming'
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Bir aşamanın süresini STAGE_LATENCY histogramına yaz, tracing açıksa span olarak da kaydet"""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+async def timed_body(body_iterator, stage: str = STAGE_STREAMING):
+    """Response gövdesini aktarırken geçen süreyi ölç"""
+    start = time.perf_counter()
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def _registry():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """Prometheus exposition formatında metrikleri döndür"""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """Web uygulamasının /metrics'ine ulaşmayan process'ler (Celery worker'ları) için
+    ayrı bir HTTP sunucusunda /metrics"""
+    start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int):
+    """Ölen worker'ın canlı gauge değerlerini temizle (gunicorn child_exit hook'u)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,106 @@
+import json
+import logging
+from typing import Optional
+
+import instaloader
+from fastapi import HTTPException
+
+from metrics import CACHE_LOOKUPS, NEGATIVE_CACHE_HITS
+
+logger = logging.getLogger('instatest')
+
+# Hata sınıfları
+NOT_FOUND = 'not_found'
+PRIVATE = 'private'
+LOGIN_REQUIRED = 'login_required'
+RATE_LIMITED = 'rate_limited'
+TRANSIENT = 'transient'
+
+# Sınıfa göre önbellekte kalma süresi (sn): silinmiş post kolay geri gelmez, rate
+# limit / zaman aşımı ise birkaç saniyede geçebilir
+NEGATIVE_TTLS = {
+    NOT_FOUND: 300,
+    PRIVATE: 300,
+    LOGIN_REQUIRED: 60,
+    RATE_LIMITED: 15,
+    TRANSIENT: 15,
+}
+
+# Başka cookie ya da bekleme ile düzelmeyen hatalar; tekrar denenmez
+PERMANENT = (NOT_FOUND, PRIVATE)
+
+# Sınıfın varsayılan yanıtı
+RESPONSES = {
+    NOT_FOUND: (404, 'Post not found or has been deleted'),
+    PRIVATE: (403, 'This post is private'),
+    LOGIN_REQUIRED: (401, 'Login required to access this content'),
+    RATE_LIMITED: (429, 'Rate limited. Please try again later.'),
+    TRANSIENT: (503, 'Instagram is temporarily unavailable. Please try again later.'),
+}
+
+
+def classify_error(error: Exception) -> str:
+    """instaloader hatasını sınıflandır"""
+    exceptions = instaloader.exceptions
+    if isinstance(error, (exceptions.QueryReturnedNotFoundException, exceptions.ProfileNotExistsException)):
+        return NOT_FOUND
+    if isinstance(error, exceptions.PrivateProfileNotFollowedException):
+        return PRIVATE
+    if isinstance(error, exceptions.LoginRequiredException):
+        return LOGIN_REQUIRED
+    if isinstance(error, exceptions.TooManyRequestsException):
+        return RATE_LIMITED
+    message = str(error).lower()
+    if '429' in message or 'rate limit' in message or 'rate_limit' in message or 'please wait' in message:
+        return RATE_LIMITED
+    if 'login_required' in message or 'checkpoint_required' in message:
+        return LOGIN_REQUIRED
+    if 'not found' in message:
+        return NOT_FOUND
+    if 'private' in message:
+        return PRIVATE
+    # "Fetching Post metadata failed" silinmiş post için de, rate limit / login duvarı
+    # için de gelir; canlı bir post 5 dk 404 olmasın diye kısa süreli sayılır
+    return TRANSIENT
+
+
+class NegativeCache:
+    """Başarısız shortcode sorgularını sınıfa özgü sürelerle Redis'te tutar.
+
+    Aynı post için tekrar gelen istekler loader havuzuna girmeden önbellekteki
+    hatayla yanıtlanır.
+    """
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    async def get(self, shortcode: str) -> Optional[dict]:
+        try:
+            data = await self.redis.get(f"negative:{shortcode}")
+        except Exception as e:
+            logger.warning(f"Negative cache read failed: {str(e)}")
+            return None
+        CACHE_LOOKUPS.labels(cache='negative', result='hit' if data else 'miss').inc()
+        return json.loads(data) if data else None
+
+    async def put(self, shortcode: str, kind: str, status_code: int, detail: str):
+        entry = {'kind': kind, 'status_code': status_code, 'detail': detail}
+        try:
+            await self.redis.set(f"negative:{shortcode}", json.dumps(entry), ex=NEGATIVE_TTLS[kind])
+        except Exception as e:
+            logger.warning(f"Negative cache write failed: {str(e)}")
+
+    async def check(self, shortcode: str):
+        """Önbellekte hata varsa aynı HTTPException'ı fırlat"""
+        entry = await self.get(shortcode)
+        if entry is not None:
+            NEGATIVE_CACHE_HITS.labels(kind=entry['kind']).inc()
+            raise HTTPException(status_code=entry['status_code'], detail=entry['detail'])
+
+    async def fail(self, shortcode: str, kind: str, status_code: int = None, detail: str = None):
+        """Hatayı önbelleğe yaz ve HTTPException olarak fırlat"""
+        default_status, default_detail = RESPONSES[kind]
+        status_code = status_code or default_status
+        detail = detail or default_detail
+        await self.put(shortcode, kind, status_code, detail)
+        raise HTTPException(status_code=status_code, detail=detail)
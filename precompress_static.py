@@ -0,0 +1,60 @@
+"""static/ altındaki metin dosyalarının .br ve .gz kopyalarını üret (build sırasında çalışır).
+
+    python precompress_static.py            # static/
+    python precompress_static.py --dir static --min-size 512
+
+PrecompressedStaticFiles bu kopyaları istemcinin Accept-Encoding'ine göre sunar,
+böylece statik dosyalar her istekte yeniden sıkıştırılmaz. Kopya orijinalden
+büyük çıkarsa yazılmaz. brotli kurulu değilse sadece .gz üretilir.
+"""
+import argparse
+import gzip
+import os
+
+from compression import PRECOMPRESSED_SUFFIXES, brotli
+
+EXTENSIONS = ('.css', '.js', '.mjs', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.webmanifest')
+
+
+def precompress(path: str, data: bytes) -> list:
+    written = []
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    for encoding, compressed in variants.items():
+        target = path + PRECOMPRESSED_SUFFIXES[encoding]
+        if len(compressed) >= len(data):
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        with open(target, 'wb') as f:
+            f.write(compressed)
+        written.append((target, len(compressed)))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompress static assets')
+    parser.add_argument('--dir', default='static')
+    parser.add_argument('--min-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f'{args.dir} does not exist, nothing to do')
+        return
+
+    for root, _, files in os.walk(args.dir):
+        for name in files:
+            if not name.endswith(EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < args.min_size:
+                continue
+            for target, size in precompress(path, data):
+                print(f'{target}: {len(data)} -> {size} bytes')
+
+
+if __name__ == '__main__':
+    main()
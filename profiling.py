@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+import tracemalloc
+import uuid
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer, ConsoleRenderer
+except ImportError:  # pyinstrument kurulu değilse CPU profili devre dışı
+    Profiler = None
+
+logger = logging.getLogger('instatest')
+
+# X-Profile başlığı taşıyan isteklerin ne kadarı profillenecek (0 = kapalı)
+REQUEST_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.001'))
+PROFILES_DIR = os.getenv('PROFILES_DIR', 'logs/profiles')
+MAX_PROFILE_SECONDS = 120
+
+FORMATS = {
+    'html': 'text/html',
+    'speedscope': 'application/json',
+    'text': 'text/plain',
+}
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def render(profiler, output_format: str) -> str:
+    if output_format == 'speedscope':
+        return profiler.output(SpeedscopeRenderer())
+    if output_format == 'text':
+        return profiler.output(ConsoleRenderer(unicode=True, color=False, show_all=False))
+    return profiler.output(HTMLRenderer())
+
+
+class WorkerProfiler:
+    """Bu worker'ın event loop thread'ini örnekleyen, aynı anda tek çalışan profiler"""
+
+    def __init__(self):
+        self._profiler = None
+        self._started_at = None
+        self._memory_lock = asyncio.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Profiler is not None
+
+    @property
+    def running(self) -> bool:
+        return self._profiler is not None
+
+    def status(self) -> dict:
+        return {
+            'available': self.available,
+            'running': self.running,
+            'pid': os.getpid(),
+            'started_at': self._started_at,
+            'tracemalloc': tracemalloc.is_tracing(),
+        }
+
+    def start(self):
+        if self.running:
+            raise ProfilerBusy('A profile is already running in this worker')
+        # async_mode=disabled: o anda loop'ta çalışan tüm task'lar örneklenir, sadece çağıran değil
+        self._profiler = Profiler(interval=PROFILE_INTERVAL, async_mode='disabled')
+        self._profiler.start()
+        self._started_at = time.time()
+
+    def stop(self, output_format: str = 'html') -> str:
+        profiler, self._profiler, self._started_at = self._profiler, None, None
+        if profiler is None:
+            raise ProfilerBusy('No profile is running in this worker')
+        profiler.stop()
+        return render(profiler, output_format)
+
+    async def capture(self, seconds: float, output_format: str = 'html') -> str:
+        self.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            output = self.stop(output_format)
+        return output
+
+    async def capture_memory(self, seconds: float, limit: int = 25) -> dict:
+        """İki tracemalloc snapshot'ı arasındaki en büyük bellek artışları"""
+        if self._memory_lock.locked():
+            raise ProfilerBusy('A memory snapshot is already running in this worker')
+        async with self._memory_lock:
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(25)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ]
+        stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'traceback')
+        return {
+            'pid': os.getpid(),
+            'seconds': seconds,
+            'traced_current_bytes': current,
+            'traced_peak_bytes': peak,
+            'top': [
+                {
+                    'size_diff_bytes': stat.size_diff,
+                    'size_bytes': stat.size,
+                    'count_diff': stat.count_diff,
+                    'count': stat.count,
+                    'traceback': [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback],
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+
+def should_profile_request(headers) -> bool:
+    """X-Profile başlığı varsa PROFILE_SAMPLE_RATE oranında profille"""
+    if Profiler is None or REQUEST_SAMPLE_RATE <= 0:
+        return False
+    if headers.get('x-profile', '').lower() not in ('1', 'true', 'yes'):
+        return False
+    return random.random() < REQUEST_SAMPLE_RATE
+
+
+def start_request_profile():
+    # async_mode=enabled: sadece bu isteğin context'i örneklenir, await'ler ayrı gösterilir
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode='enabled')
+    profiler.start()
+    return profiler
+
+
+def save_request_profile(profiler, path: str) -> str:
+    """Durdurulmuş istek profilini PROFILES_DIR altına HTML olarak yaz, profil id'sini döndür"""
+    profile_id = uuid.uuid4().hex
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    with open(os.path.join(PROFILES_DIR, f'{profile_id}.html'), 'w') as f:
+        f.write(profiler.output(HTMLRenderer()))
+    logger.info(f"Request profile saved: {profile_id} ({path})")
+    return profile_id
+
+
+def request_profile_path(profile_id: str) -> str:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILES_DIR, f'{profile_id}.html')
+    return path if os.path.exists(path) else None
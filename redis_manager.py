@@ -1,14 +1,35 @@
 import redis
-from redis.connection import ConnectionPool
 from cachetools import TTLCache
-import os
 from typing import Optional, Any
 import json
 import logging
+import time
+from metrics import CACHE_LOOKUPS
+from redis_pool import get_redis
+
+# Bu ailelerdeki anahtarlar her yazılışta registry:<aile> sorted set'ine son yazılma
+# zamanıyla eklenir; temizlik SCAN yerine en eski yazılanları buradan okur
+REGISTRY_FAMILIES = ('task:', 'rate_limit:', 'cookie_stats:')
+UNLINK_BATCH_SIZE = 500
+
+
+def registry_key(key: str) -> Optional[str]:
+    """Anahtarın ait olduğu ailenin registry sorted set'i (aile kayıtlı değilse None)"""
+    for family in REGISTRY_FAMILIES:
+        if key.startswith(family):
+            return f"registry:{family[:-1]}"
+    return None
+
+
+def register_key(pipe, key: str, written_at: float = None, nx: bool = False):
+    """Anahtarı registry'ye son yazılma zamanıyla ekle; her yazış skoru yeniler.
+    nx=True sadece kayıtlı olmayan anahtarları ekler (geriye dönük doldurma)."""
+    registry = registry_key(key)
+    if registry:
+        pipe.zadd(registry, {key: written_at or time.time()}, nx=nx)
 
 class RedisManager:
     _instance = None
-    _pool = None
     _cache = TTLCache(maxsize=100, ttl=300)  # 5 dakikalık önbellek
 
     def __new__(cls):
@@ -18,23 +39,22 @@ class RedisManager:
         return cls._instance
 
     def _initialize(self):
-        """Redis bağlantı havuzunu başlat"""
-        if self._pool is None:
-            self._pool = ConnectionPool(
-                host=os.getenv('REDIS_HOST', 'localhost'),
-                port=int(os.getenv('REDIS_PORT', 6379)),
-                db=int(os.getenv('REDIS_DB', 0)),
-                password=os.getenv('REDIS_PASSWORD', None),
-                decode_responses=True,
-                max_connections=10
-            )
-        self._redis = redis.Redis(connection_pool=self._pool)
+        """Process'in paylaşılan Redis havuzunu kullan"""
+        self._redis = get_redis()
+
+    @property
+    def client(self) -> redis.Redis:
+        """Havuzu kullanan Redis client'ı"""
+        return self._redis
 
     def get(self, key: str, use_cache: bool = True) -> Optional[Any]:
         """Redis'ten veri getir, önbellekten kontrol et"""
         try:
             if use_cache and key in self._cache:
+                CACHE_LOOKUPS.labels(cache='redis_manager', result='hit').inc()
                 return self._cache[key]
+            if use_cache:
+                CACHE_LOOKUPS.labels(cache='redis_manager', result='miss').inc()
 
             value = self._redis.get(key)
             if value:
@@ -60,10 +80,13 @@ class RedisManager:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value)
             
+            pipe = self._redis.pipeline(transaction=False)
             if ttl:
-                success = self._redis.setex(key, ttl, value)
+                pipe.setex(key, ttl, value)
             else:
-                success = self._redis.set(key, value)
+                pipe.set(key, value)
+            register_key(pipe, key)
+            success = pipe.execute()[0]
             
             if success and key in self._cache:
                 self._cache[key] = value
@@ -114,19 +137,48 @@ class RedisManager:
             logging.error(f"Redis scan error: {str(e)}")
             return []
 
-    def cleanup_keys(self, pattern: str, max_keys: int = 1000):
-        """Belirli bir pattern'e uyan eski anahtarları temizle"""
+    def _backfill_registry(self, family: str, registry: str):
+        """Registry'den önce yazılmış anahtarları bir kereliğine en eski olarak kaydet"""
+        if not self._redis.set(f"{registry}:backfilled", 1, nx=True):
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        for key in self._redis.scan_iter(match=f"{family}*", count=1000):
+            # Kayıtlı (yeni yazılmış) anahtarların skoru ezilmesin
+            register_key(pipe, key, written_at=1, nx=True)
+        pipe.execute()
+
+    def cleanup_keys(self, family: str, max_keys: int = 1000, max_age: Optional[int] = None) -> int:
+        """Ailenin en eski anahtarlarını sil: max_age'den eskiler ve en yeni max_keys dışındakiler.
+
+        Registry'den ZRANGEBYSCORE / ZRANGE ile O(log n + k) okunur, UNLINK ile
+        parti parti silinir. Silinen anahtar sayısını döndürür.
+        """
+        registry = registry_key(family)
+        if registry is None:
+            logging.error(f"Redis cleanup error: {family} has no key registry")
+            return 0
         try:
-            keys = self.scan_keys(pattern)
-            if len(keys) > max_keys:
-                # En eski anahtarları sil
-                keys_to_delete = keys[:-max_keys]
-                for key in keys_to_delete:
-                    self.delete(key)
+            self._backfill_registry(family, registry)
+            expired = []
+            if max_age is not None:
+                expired = self._redis.zrangebyscore(registry, '-inf', time.time() - max_age)
+            # En yeni max_keys dışında kalanlar (skora göre artan sırada en eskiler)
+            overflow = self._redis.zrange(registry, 0, -(max_keys + 1)) if max_keys is not None else []
+            keys = list(dict.fromkeys(expired + overflow))
+
+            for start in range(0, len(keys), UNLINK_BATCH_SIZE):
+                batch = keys[start:start + UNLINK_BATCH_SIZE]
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.unlink(*batch)
+                pipe.zrem(registry, *batch)
+                pipe.execute()
+                for key in batch:
+                    self._cache.pop(key, None)
+            return len(keys)
         except Exception as e:
             logging.error(f"Redis cleanup error: {str(e)}")
+            return 0
 
     def close(self):
-        """Redis bağlantısını kapat"""
-        if self._pool:
-            self._pool.disconnect() 
\ No newline at end of file
+        """Havuzdaki bağlantıları kapat"""
+        self._redis.connection_pool.disconnect()
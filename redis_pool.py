@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import redis
+import redis.asyncio
+
+from metrics import REDIS_POOL_IN_USE, REDIS_POOL_MAX, REDIS_POOL_WAIT
+
+# Tüm bileşenler (web, Celery task'ları, harvester) bağlantıları buradan alır.
+# Process başına en fazla REDIS_MAX_CONNECTIONS senkron + aynı kadar async bağlantı açılır;
+# havuz doluysa yeni bağlantı açılmaz, REDIS_POOL_TIMEOUT saniye boşalması beklenir.
+# Ayarlar havuz ilk oluşturulurken okunur, böylece load_dotenv() import'tan sonra çağrılabilir.
+
+
+def _pool_kwargs() -> dict:
+    return {
+        'host': os.getenv('REDIS_HOST', 'localhost'),
+        'port': int(os.getenv('REDIS_PORT', 6379)),
+        'db': int(os.getenv('REDIS_DB', 0)),
+        'password': os.getenv('REDIS_PASSWORD', None),
+        'decode_responses': True,
+        'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', 5)),
+        'socket_connect_timeout': float(os.getenv('REDIS_CONNECT_TIMEOUT', 2)),
+        'socket_keepalive': True,
+        # Bu süreden uzun boşta kalan bağlantı kullanılmadan önce PING ile doğrulanır
+        'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+        'retry_on_timeout': True,
+        'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', 20)),
+        'timeout': float(os.getenv('REDIS_POOL_TIMEOUT', 5)),
+    }
+
+
+class InstrumentedBlockingPool(redis.BlockingConnectionPool):
+    """Kullanımdaki bağlantı sayısını ve havuz bekleme süresini raporlayan senkron havuz"""
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        REDIS_POOL_WAIT.labels(pool='sync').observe(time.perf_counter() - start)
+        REDIS_POOL_IN_USE.labels(pool='sync').inc()
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        REDIS_POOL_IN_USE.labels(pool='sync').dec()
+
+
+class InstrumentedAsyncBlockingPool(redis.asyncio.BlockingConnectionPool):
+    """InstrumentedBlockingPool'un redis.asyncio karşılığı"""
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = await super().get_connection(*args, **kwargs)
+        REDIS_POOL_WAIT.labels(pool='async').observe(time.perf_counter() - start)
+        REDIS_POOL_IN_USE.labels(pool='async').inc()
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        REDIS_POOL_IN_USE.labels(pool='async').dec()
+
+
+_lock = threading.Lock()
+_sync_client = None
+_async_client = None
+
+
+def get_redis() -> redis.Redis:
+    """Process'in paylaşılan senkron Redis client'ı"""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                pool = InstrumentedBlockingPool(**_pool_kwargs())
+                REDIS_POOL_MAX.labels(pool='sync').set(pool.max_connections)
+                _sync_client = redis.Redis(connection_pool=pool)
+    return _sync_client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """Process'in paylaşılan async Redis client'ı (event loop içinde çağrılmalı)"""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                pool = InstrumentedAsyncBlockingPool(**_pool_kwargs())
+                REDIS_POOL_MAX.labels(pool='async').set(pool.max_connections)
+                _async_client = redis.asyncio.Redis(connection_pool=pool)
+    return _async_client
+
+
+async def close_redis():
+    """Havuzlardaki bağlantıları kapat (lifespan kapanışı)"""
+    global _sync_client, _async_client
+    with _lock:
+        sync_client, _sync_client = _sync_client, None
+        async_client, _async_client = _async_client, None
+    if async_client is not None:
+        await async_client.connection_pool.disconnect()
+    if sync_client is not None:
+        sync_client.connection_pool.disconnect()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+
+import psutil
+
+from circuit_breaker import read_status as circuit_status
+from models import Session, Language, Translation
+from timeseries import TimeSeriesStore, METRICS, sparkline_points
+
+logger = logging.getLogger('instatest')
+
+LOG_FILES = {
+    "general": "logs/instatest.log",
+    "error": "logs/error.log",
+    "debug": "logs/debug.log"
+}
+
+
+def tail_lines(path: str, count: int, block_size: int = 4096) -> list:
+    """Dosyanın son satırlarını sondan geriye doğru okuyarak getir"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # count satır için count + 1 newline yeterli (son satır newline ile bitebilir)
+        while position > 0 and data.count(b'\n') <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-count:]
+
+
+def read_rate_limits(redis_client, scan_count: int = 500) -> dict:
+    """rate_limit:* sayaçları (RedisRateLimiter'ın SETEX/INCR ile yazdığı string'ler);
+    KEYS yerine SCAN, anahtar başına GET yerine tek pipeline"""
+    keys = list(redis_client.scan_iter(match="rate_limit:*", count=scan_count))
+    if not keys:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.get(key)
+    values = pipe.execute()
+    # SCAN ile GET arasında süresi dolan anahtar None döner
+    return {key: int(value) for key, value in zip(keys, values) if value is not None}
+
+
+class SystemStatusCollector:
+    """/system-status bölümlerini arka planda periyodik olarak hesaplayıp snapshot'ta tutar"""
+
+    def __init__(self, redis_client, cookie_manager, scan_count: int = 500):
+        self.redis = redis_client
+        self.cookie_manager = cookie_manager
+        self.scan_count = scan_count
+        self.history = TimeSeriesStore(redis_client)
+        self.snapshot = {}
+        self.updated_at = {}
+        # Bölüm adı -> (yenileme aralığı sn, hesaplama fonksiyonu)
+        self.sections = {
+            "system_resources": (int(os.getenv('STATUS_RESOURCES_INTERVAL', 5)), self._system_resources),
+            "redis_status": (int(os.getenv('STATUS_REDIS_INTERVAL', 15)), self._redis_status),
+            "cookie_status": (int(os.getenv('STATUS_COOKIES_INTERVAL', 15)), self._cookie_status),
+            "circuit_status": (int(os.getenv('STATUS_CIRCUIT_INTERVAL', 5)), self._circuit_status),
+            "log_status": (int(os.getenv('STATUS_LOGS_INTERVAL', 30)), self._log_status),
+            "last_errors": (int(os.getenv('STATUS_LOGS_INTERVAL', 30)), self._last_errors),
+            "db_status": (int(os.getenv('STATUS_DB_INTERVAL', 60)), self._db_status),
+            "health_history": (int(os.getenv('STATUS_HISTORY_INTERVAL', 60)), self._health_history),
+        }
+        # cpu_percent(interval=None) bir önceki çağrıdan bu yana ölçer, ilk çağrı referans noktasıdır
+        psutil.cpu_percent(interval=None)
+
+    def refresh(self, force: bool = False):
+        """Süresi dolan bölümleri yeniden hesapla"""
+        now = time.time()
+        for name, (interval, compute) in self.sections.items():
+            if not force and now - self.updated_at.get(name, 0) < interval:
+                continue
+            try:
+                self.snapshot[name] = compute()
+            except Exception as e:
+                logger.error(f"System status section {name} failed: {str(e)}")
+                self.snapshot[name] = {"status": "ERROR", "error": str(e)}
+            self.updated_at[name] = now
+
+    async def run(self):
+        """Bölümleri event loop'u bloklamadan thread'de yenile"""
+        tick = min(interval for interval, _ in self.sections.values())
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"System status collector error: {str(e)}")
+            await asyncio.sleep(tick)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.snapshot) == len(self.sections)
+
+    def get_snapshot(self) -> dict:
+        """Son hesaplanan bölümleri ve en eski bölümün yaşını döndür"""
+        snapshot = dict(self.snapshot)
+        snapshot["snapshot_age"] = time.time() - min(self.updated_at.values(), default=time.time())
+        return snapshot
+
+    def _system_resources(self) -> dict:
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        return {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory": {
+                "total": memory.total,
+                "available": memory.available,
+                "percent": memory.percent
+            },
+            "disk": {
+                "total": disk.total,
+                "used": disk.used,
+                "free": disk.free,
+                "percent": disk.percent
+            }
+        }
+
+    def _redis_status(self) -> dict:
+        self.redis.ping()
+        return {
+            "status": "OK",
+            "error": None,
+            "rate_limits": read_rate_limits(self.redis, self.scan_count)
+        }
+
+    def _circuit_status(self) -> dict:
+        breakers = circuit_status(self.redis)
+        return {
+            "status": "OPEN" if any(b["state"] == "open" for b in breakers.values()) else "OK",
+            "error": None,
+            "breakers": breakers
+        }
+
+    def _cookie_status(self) -> dict:
+        cookie_ids = [
+            f[:-len('.json')] for f in os.listdir(self.cookie_manager.cookies_dir)
+            if f.endswith('.json')
+        ]
+        pipe = self.redis.pipeline(transaction=False)
+        for cookie_id in cookie_ids:
+            pipe.hgetall(self.cookie_manager._get_cookie_health_key(cookie_id))
+            pipe.get(self.cookie_manager._get_cookie_cooldown_key(cookie_id))
+            pipe.zcard(self.cookie_manager._get_request_count_key(cookie_id))
+        results = pipe.execute(raise_on_error=False) if cookie_ids else []
+
+        cookies = []
+        for i, cookie_id in enumerate(cookie_ids):
+            health, cooldown, request_count = results[i * 3:i * 3 + 3]
+            cookies.append({
+                "id": cookie_id,
+                "health": health if isinstance(health, dict) and health else {
+                    'successes': '0',
+                    'challenges': '0',
+                    'last_success': '',
+                    'last_challenge': ''
+                },
+                "cooldown": None if isinstance(cooldown, Exception) else cooldown,
+                "request_count": 0 if isinstance(request_count, Exception) else request_count
+            })
+        return {"status": "OK", "error": None, "cookies": cookies}
+
+    def _log_status(self) -> dict:
+        return {
+            "status": "OK",
+            "error": None,
+            "files": {name: os.path.getsize(path) for name, path in LOG_FILES.items()}
+        }
+
+    def _last_errors(self) -> list:
+        try:
+            return [line.strip() for line in tail_lines(LOG_FILES["error"], 10)]
+        except Exception as e:
+            return [f"Error reading log file: {str(e)}"]
+
+    def _health_history(self) -> dict:
+        """Son 24 saatin sparkline verileri"""
+        now = time.time()
+        history = {}
+        for metric in METRICS:
+            values = [value for _, value in self.history.range(metric, now - 86400, now)]
+            history[metric] = {
+                "points": sparkline_points(values),
+                "last": values[-1] if values else None,
+                "min": min(values) if values else None,
+                "max": max(values) if values else None
+            }
+        return history
+
+    def _db_status(self) -> dict:
+        session = Session()
+        try:
+            return {
+                "status": "OK",
+                "error": None,
+                "stats": {
+                    "languages": session.query(Language).count(),
+                    "translations": session.query(Translation).count()
+                }
+            }
+        finally:
+            session.close()
@@ -1,12 +1,17 @@
 from celery import Celery
+from celery import signals
+from kombu import Queue
 import requests
 import json
-import re
 import os
 from bs4 import BeautifulSoup
 import instaloader
 from typing import Optional, Dict, Any
 from redis_manager import RedisManager
+from instagram_url import parse_instagram_url, MEDIA_KINDS
+from metrics import TASK_EVENTS, start_metrics_server
+from tracing import setup_tracing, instrument_celery
+from timeseries import TimeSeriesStore, METRICS
 import logging
 import time
 from datetime import datetime, timedelta
@@ -14,11 +19,48 @@ import aiohttp
 import asyncio
 
 # Celery instance
-celery = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
+BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+# Sonuçlar uygulamanın anahtarlarının olduğu db 0'a değil ayrı bir db'ye yazılır
+RESULT_BACKEND_URL = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/1')
+celery = Celery('tasks', broker=BROKER_URL, backend=RESULT_BACKEND_URL)
+
+# Sonuçlar bu süreden sonra Redis'ten (ve taşan dosyalar diskten) silinir
+RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 3600))
+# Bundan büyük byte sonuçları Redis'e değil TASK_RESULTS_DIR'e yazılır, sonuçta sadece referans kalır
+RESULT_INLINE_MAX = int(os.getenv('CELERY_RESULT_INLINE_MAX', 64 * 1024))
+TASK_RESULTS_DIR = os.getenv('TASK_RESULTS_DIR', 'downloads/task_results')
+
+# Worker metrikleri (task durumları) bu porttan sunulur; 0 kapatır
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 9100))
+
+# Kuyruklar: I/O bekleyen indirmeler ve periyodik bakım birbirini bekletmesin diye
+# ayrı worker'lar tarafından tüketilir (docker-compose.yml)
+QUEUE_FETCH = 'io-fetch'
+QUEUE_MAINTENANCE = 'maintenance'
+QUEUES = (QUEUE_FETCH, QUEUE_MAINTENANCE)
 
 # Redis bağlantısı
 redis_manager = RedisManager()
 
+# Sistem sağlığı geçmişi
+health_history = TimeSeriesStore(redis_manager.client)
+
+# Trace context'i task header'larında taşı
+instrument_celery(signals)
+
+@signals.worker_process_init.connect
+def _init_tracing(**kwargs):
+    # BatchSpanProcessor thread'i fork'tan sonra her worker process'inde kurulmalı
+    setup_tracing('instatest-worker')
+
+@signals.worker_init.connect
+def _init_tracing_without_fork(sender=None, **kwargs):
+    # threads / solo havuzlarında task'lar ana process'te çalışır, worker_process_init gelmez
+    pool = getattr(sender, 'pool_cls', None) or 'prefork'
+    name = pool if isinstance(pool, str) else pool.__module__
+    if 'prefork' not in name:
+        setup_tracing('instatest-worker')
+
 class InstagramDownloader:
     def __init__(self):
         self.L = instaloader.Instaloader()
@@ -60,14 +102,11 @@ class InstagramDownloader:
         """Medyayı indir ve kaydet"""
         try:
             # Instagram post ID'sini çıkar
-            shortcode = re.search(r'/p/([^/]+)/', url)
-            if not shortcode:
-                shortcode = re.search(r'/reel/([^/]+)/', url)
-            
-            if not shortcode:
+            parsed = parse_instagram_url(url)
+            if parsed is None or parsed.kind not in MEDIA_KINDS:
                 return {"success": False, "error": "Invalid Instagram URL"}
 
-            post_code = shortcode.group(1)
+            post_code = parsed.shortcode
             
             # GraphQL endpoint'ini kullan
             post_url = f"https://www.instagram.com/p/{post_code}/?__a=1"
@@ -105,6 +144,38 @@ class InstagramDownloader:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+def _inline_or_spill(task_id: str, content: bytes):
+    """Küçük içerik olduğu gibi döner; büyükse diske yazılır ve {'ref', 'size'} döner"""
+    if len(content) <= RESULT_INLINE_MAX:
+        return content
+    os.makedirs(TASK_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(TASK_RESULTS_DIR, task_id)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return {'ref': path, 'size': len(content)}
+
+def load_result(result):
+    """download_media sonucunu byte olarak döndür (referanssa dosyadan oku)"""
+    if isinstance(result, dict) and 'ref' in result:
+        with open(result['ref'], 'rb') as f:
+            return f.read()
+    return result
+
+def _cleanup_spilled_results() -> int:
+    """Redis'teki sonucu süresi dolmuş taşan dosyaları sil"""
+    if not os.path.isdir(TASK_RESULTS_DIR):
+        return 0
+    removed = 0
+    cutoff = time.time() - RESULT_EXPIRES
+    for entry in os.scandir(TASK_RESULTS_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
 @celery.task(name='tasks.process_download')
 def process_download(url: str, media_type: str = "post") -> Dict[str, Any]:
     """Download task'ini işle"""
@@ -112,8 +183,8 @@ def process_download(url: str, media_type: str = "post") -> Dict[str, Any]:
     result = downloader.download_media(url)
     return result 
 
-@celery.task
-def download_media(url: str, cookie_id: str = None):
+@celery.task(name='tasks.download_media', bind=True)
+def download_media(self, url: str, cookie_id: str = None):
     """Medya indirme işlemini arka planda gerçekleştir"""
     try:
         # Cookie bilgisini al
@@ -126,9 +197,9 @@ def download_media(url: str, cookie_id: str = None):
         # İndirme işlemini başlat
         start_time = time.time()
         
-        # Asenkron indirme işlemini senkron context'te çalıştır
-        loop = asyncio.get_event_loop()
-        result = loop.run_until_complete(download_media_async(url, cookie_data if cookie_id else None))
+        # Asenkron indirme işlemini senkron context'te çalıştır; threads havuzunda her
+        # task kendi thread'inde kendi event loop'unu açar
+        result = asyncio.run(download_media_async(url, cookie_data if cookie_id else None))
         
         # İşlem süresini hesapla
         duration = time.time() - start_time
@@ -137,7 +208,7 @@ def download_media(url: str, cookie_id: str = None):
         if cookie_id:
             update_cookie_stats(cookie_id, True, duration)
         
-        return result
+        return _inline_or_spill(self.request.id, result)
     except Exception as e:
         logging.error(f"Download failed: {str(e)}")
         if cookie_id:
@@ -187,52 +258,128 @@ def update_cookie_stats(cookie_id: str, success: bool, duration: float):
     except Exception as e:
         logging.error(f"Failed to update cookie stats: {str(e)}")
 
-@celery.task
+@celery.task(name='tasks.cleanup_old_data', acks_late=True, reject_on_worker_lost=True)
 def cleanup_old_data():
     """Eski verileri temizle"""
     try:
-        # Eski cookie istatistiklerini temizle
-        redis_manager.cleanup_keys("cookie_stats:*", max_keys=1000)
+        # Eski cookie istatistiklerini temizle (24 saatlik TTL ile yazılıyorlar)
+        redis_manager.cleanup_keys("cookie_stats:", max_keys=1000, max_age=86400)
         
         # Eski task kayıtlarını temizle
-        redis_manager.cleanup_keys("task:*", max_keys=1000)
+        redis_manager.cleanup_keys("task:", max_keys=1000)
         
         # Eski rate limit kayıtlarını temizle
-        redis_manager.cleanup_keys("rate_limit:*", max_keys=1000)
+        redis_manager.cleanup_keys("rate_limit:", max_keys=1000)
+        
+        # Süresi dolmuş task sonuç dosyalarını temizle
+        _cleanup_spilled_results()
     except Exception as e:
         logging.error(f"Cleanup task failed: {str(e)}")
 
-@celery.task
+def _cpu_percent_since_last_run(psutil) -> Optional[float]:
+    """Önceki çalıştırmadan bu yana ortalama CPU kullanımı
+
+    cpu_percent(interval=1) bir saniye bekler ve sadece o saniyeyi ölçer. Bunun yerine
+    cpu_times() Redis'te saklanır ve iki çalıştırma arasındaki fark kullanılır; prefork
+    worker'larda task'ı hangi process'in çalıştırdığı önemli olmaz.
+    """
+    times = psutil.cpu_times()
+    total = sum(times)
+    idle = times.idle + getattr(times, 'iowait', 0)
+    previous = redis_manager.get('system_health:cpu_times', use_cache=False)
+    redis_manager.set('system_health:cpu_times', {'total': total, 'idle': idle})
+    if not previous or total <= previous['total']:
+        return None
+    busy = (total - previous['total']) - (idle - previous['idle'])
+    return round(100 * busy / (total - previous['total']), 1)
+
+def _request_rate_since_last_run() -> Optional[float]:
+    """Web worker'larının Redis'e yazdığı toplam istek sayacından istek/sn hesapla"""
+    now = time.time()
+    total = int(redis_manager.client.get('stats:requests_total') or 0)
+    previous = redis_manager.get('system_health:requests', use_cache=False)
+    redis_manager.set('system_health:requests', {'total': total, 'ts': now})
+    if not previous or now <= previous['ts'] or total < previous['total']:
+        return None
+    return round((total - previous['total']) / (now - previous['ts']), 3)
+
+def _queue_depths() -> Dict[str, int]:
+    """Redis broker'da her kuyruğun bekleyen mesaj sayısı (tek round-trip)"""
+    pipe = redis_manager.client.pipeline(transaction=False)
+    for queue in QUEUES:
+        pipe.llen(queue)
+    return dict(zip(QUEUES, pipe.execute()))
+
+@celery.task(name='tasks.monitor_system_health', acks_late=True, reject_on_worker_lost=True)
 def monitor_system_health():
     """Sistem sağlığını kontrol et"""
     try:
         import psutil
         
         # Sistem kaynak kullanımını kontrol et
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = _cpu_percent_since_last_run(psutil)
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
+        queue_depths = _queue_depths()
+        
         health_data = {
             'timestamp': datetime.utcnow().isoformat(),
             'cpu_percent': cpu_percent,
             'memory_percent': memory.percent,
             'disk_percent': disk.percent,
+            'request_rate': _request_rate_since_last_run(),
+            'queue_depth': sum(queue_depths.values()),
+            'queue_depths': queue_depths,
             'warning_level': 'normal'
         }
         
         # Yüksek kaynak kullanımı varsa uyarı seviyesini güncelle
-        if cpu_percent > 80 or memory.percent > 80 or disk.percent > 80:
+        if (cpu_percent or 0) > 80 or memory.percent > 80 or disk.percent > 80:
             health_data['warning_level'] = 'high'
         
         # Sağlık verilerini Redis'e kaydet
         redis_manager.set('system_health', health_data, ttl=300)  # 5 dakika TTL
         
+        # Geçmiş için zaman serisine ekle (1m -> 1h -> 1d downsampling)
+        health_history.add_samples({
+            metric: health_data[metric] for metric in METRICS
+        })
+        
         return health_data
     except Exception as e:
         logging.error(f"Health monitoring failed: {str(e)}")
         return None
 
+# Task durum metrikleri worker process'inde artar; web'in /metrics'i onları görmez
+@signals.worker_ready.connect
+def _serve_worker_metrics(**kwargs):
+    # threads / solo havuzunda sayaçlar bu process'te; prefork'ta child'ların değerleri
+    # sadece PROMETHEUS_MULTIPROC_DIR ayarlıysa toplanır
+    if not WORKER_METRICS_PORT:
+        return
+    try:
+        start_metrics_server(WORKER_METRICS_PORT)
+        logging.info(f"Worker metrics served on :{WORKER_METRICS_PORT}/metrics")
+    except OSError as e:
+        logging.warning(f"Worker metrics server could not start on :{WORKER_METRICS_PORT}: {str(e)}")
+
+@signals.task_prerun.connect
+def _task_started(sender=None, **kwargs):
+    TASK_EVENTS.labels(task=sender.name, state='started').inc()
+
+@signals.task_success.connect
+def _task_succeeded(sender=None, **kwargs):
+    TASK_EVENTS.labels(task=sender.name, state='success').inc()
+
+@signals.task_failure.connect
+def _task_failed(sender=None, **kwargs):
+    TASK_EVENTS.labels(task=sender.name, state='failure').inc()
+
+@signals.task_retry.connect
+def _task_retried(sender=None, **kwargs):
+    TASK_EVENTS.labels(task=sender.name, state='retry').inc()
+
 # Celery konfigürasyonu
 celery.conf.update(
     beat_schedule={
@@ -246,6 +393,28 @@ celery.conf.update(
         },
     },
     beat_scheduler='redbeat.RedBeatScheduler',
-    redbeat_redis_url='redis://localhost:6379/0',
-    timezone='UTC'
+    redbeat_redis_url=BROKER_URL,
+    timezone='UTC',
+    task_queues=[Queue(name) for name in QUEUES],
+    task_default_queue=QUEUE_FETCH,
+    # acks_late kuyruk bazında: maintenance task'ları idempotent, worker ölürse tekrar
+    # çalışmaları zararsız (acks_late + reject_on_worker_lost). io-fetch bilerek erken
+    # ack'lenir: indirme cookie ile Instagram'a tekrar gider ve cookie istatistiğini
+    # yeniden yazar; Redis broker'da ack'lenmemiş mesaj ancak visibility_timeout (1 saat)
+    # sonra geri gelir, sonucu bekleyen istek çoktan vazgeçmiş olur.
+    task_routes={
+        'tasks.process_download': {'queue': QUEUE_FETCH},
+        'tasks.download_media': {'queue': QUEUE_FETCH},
+        'tasks.cleanup_old_data': {'queue': QUEUE_MAINTENANCE},
+        'tasks.monitor_system_health': {'queue': QUEUE_MAINTENANCE},
+    },
+    # Prefetch worker bazında ayarlanır (docker-compose.yml'de --prefetch-multiplier);
+    # buradaki değer tek worker'ın tüm kuyrukları dinlediği geliştirme ortamı için
+    worker_prefetch_multiplier=1,
+    # Sonuçlar msgpack + zlib ile saklanır; medya byte'ları base64 / JSON kaçışı olmadan yazılır
+    result_serializer='msgpack',
+    result_compression='zlib',
+    result_accept_content=['msgpack', 'json'],
+    accept_content=['json', 'msgpack'],
+    result_expires=RESULT_EXPIRES,
 ) 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""analytics.DownloadAnalytics.flush testleri (fakeredis ile)"""
+import asyncio
+
+import fakeredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from analytics import DownloadAnalytics, _bucket
+
+NOW = 1_700_000_000
+
+
+def _counts(redis, analytics, resolution, field='n|video|original|en|2xx'):
+    key = analytics._key(resolution, _bucket(NOW, resolution))
+    value = asyncio.run(redis.hget(key, field))
+    return int(value or 0)
+
+
+def _record(analytics, count=1):
+    analytics.record('video', 'original', 'en', '2xx', '10.0.0.1', nbytes=100, count=count, timestamp=NOW)
+
+
+def test_failed_command_is_retried_without_double_counting():
+    redis = fakeredis.FakeAsyncRedis()
+    analytics = DownloadAnalytics(redis)
+    day_key = analytics._key('day', _bucket(NOW, 'day'))
+    # Günlük bucket yanlış tipte: o HINCRBY'lar WRONGTYPE alır, saatlikler uygulanır
+    asyncio.run(redis.set(day_key, 'x'))
+
+    _record(analytics)
+    asyncio.run(analytics.flush())
+    assert _counts(redis, analytics, 'hour') == 1
+    assert analytics._retry and all(key == day_key for _, key, _, _ in analytics._retry)
+
+    asyncio.run(redis.delete(day_key))
+    asyncio.run(analytics.flush())
+    assert _counts(redis, analytics, 'hour') == 1
+    assert _counts(redis, analytics, 'day') == 1
+    assert not analytics._retry
+
+    asyncio.run(analytics.flush())
+    assert _counts(redis, analytics, 'hour') == 1
+    assert _counts(redis, analytics, 'day') == 1
+
+
+class _DropsAfterSend:
+    """Pipeline sunucuda uygulanır, ardından bağlantı kopar"""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def pipeline(self, transaction=False):
+        pipe = self.redis.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        async def execute_then_drop(raise_on_error=True):
+            await execute(raise_on_error=raise_on_error)
+            raise RedisConnectionError('Connection closed by server.')
+
+        pipe.execute = execute_then_drop
+        return pipe
+
+
+def test_connection_drop_after_send_does_not_double_count():
+    redis = fakeredis.FakeAsyncRedis()
+    analytics = DownloadAnalytics(_DropsAfterSend(redis))
+
+    _record(analytics, count=3)
+    asyncio.run(analytics.flush())
+    analytics.redis = redis
+    asyncio.run(analytics.flush())
+
+    assert _counts(redis, analytics, 'hour') == 3
+    assert _counts(redis, analytics, 'day') == 3
+    uniq_key = analytics._uniq_key('hour', _bucket(NOW, 'hour'))
+    assert asyncio.run(redis.pfcount(uniq_key)) == 1
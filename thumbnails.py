@@ -0,0 +1,190 @@
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit
+
+from metrics import CACHE_LOOKUPS
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow kurulu değilse /api/thumbnail orijinal resmi döndürür
+    Image = None
+
+logger = logging.getLogger('instatest')
+
+# Sadece bu genişliklerde üretilir; keyfi ?w= değerleri önbelleği parçalamasın
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+
+# Tercih sırası; Accept'te hiçbiri yoksa JPEG
+FORMAT_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+_SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 8},
+    'webp': {'quality': 78, 'method': 4},
+    'jpeg': {'quality': 80, 'optimize': True, 'progressive': True},
+}
+
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# /api/preview'a gömülen bulanık yer tutucu: ~24 px genişlik, base64 ile ~0.5-1 KB
+PLACEHOLDER_WIDTH = 24
+PLACEHOLDER_QUALITY = 40
+
+
+def snap_width(width: Optional[int]) -> int:
+    """İstenen genişliği karşılayan en küçük sabit genişlik"""
+    if not width:
+        return DEFAULT_WIDTH
+    for candidate in THUMBNAIL_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def available_formats() -> tuple:
+    if Image is None:
+        return ()
+    return tuple(name for name in FORMAT_TYPES if name == 'jpeg' or features.check(name))
+
+
+def negotiate_format(accept: str, available: tuple = None) -> str:
+    """Accept header'ına göre AVIF > WebP > JPEG"""
+    available = available if available is not None else available_formats()
+    accept = (accept or '').lower()
+    for name, media_type in FORMAT_TYPES.items():
+        if name in available and (name == 'jpeg' or media_type in accept):
+            return name
+    return 'jpeg'
+
+
+def render_thumbnail(data: bytes, width: int, fmt: str, quality: int = None) -> bytes:
+    """Resmi width genişliğine küçült ve fmt formatında kodla (process havuzunda çalışır)"""
+    with Image.open(io.BytesIO(data)) as source:
+        # JPEG'i doğrudan 1/2, 1/4, 1/8 ölçekte çöz; tam çözünürlüklü bitmap hiç oluşmaz
+        source.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+        if fmt == 'jpeg' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        options = dict(_SAVE_OPTIONS[fmt])
+        if quality is not None:
+            options['quality'] = quality
+        image.save(output, fmt.upper(), **options)
+    return output.getvalue()
+
+
+class ThumbnailService:
+    """Önizleme resimlerini sabit genişliklere küçültür, sonucu diskte tutar.
+
+    Küçültme ayrı process'lerde yapılır (Pillow decode/resize GIL'i tutar). Aynı anda
+    gelen aynı istekler tek render'ı bekler.
+    """
+
+    def __init__(self, directory: str = None, ttl: int = None, workers: int = THUMBNAIL_WORKERS):
+        self.directory = directory or os.getenv('THUMBNAIL_CACHE_DIR', 'thumbnail_cache')
+        self.ttl = ttl if ttl is not None else int(os.getenv('THUMBNAIL_CACHE_TTL', 7 * 86400))
+        self.workers = workers
+        self._executor = None
+        self._inflight = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    @staticmethod
+    def source_key(url: str) -> str:
+        """CDN imzası ve süresi query string'de değişir; dosya yolu resmi tanımlar"""
+        parts = urlsplit(url)
+        return f"{parts.netloc}{parts.path}" if parts.path else url
+
+    def _path(self, url: str, width: int, fmt: str) -> str:
+        digest = hashlib.sha1(f"{self.source_key(url)}|{width}".encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.{fmt}')
+
+    def get(self, url: str, width: int, fmt: str) -> Optional[str]:
+        path = self._path(url, width, fmt)
+        try:
+            if time.time() - os.path.getmtime(path) < self.ttl:
+                CACHE_LOOKUPS.labels(cache='thumbnail', result='hit').inc()
+                return path
+        except FileNotFoundError:
+            pass
+        CACHE_LOOKUPS.labels(cache='thumbnail', result='miss').inc()
+        return None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: worker'lar thread'li ana process'in kilitlerini fork ile devralmasın
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def render(self, url: str, data: bytes, width: int, fmt: str) -> str:
+        """Küçültülmüş dosyanın yolu; aynı anahtar için süren render varsa onu bekler"""
+        path = self._path(url, width, fmt)
+        pending = self._inflight.get(path)
+        if pending is None:
+            pending = asyncio.ensure_future(self._render(path, data, width, fmt))
+            self._inflight[path] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(path, None))
+        return await asyncio.shield(pending)
+
+    async def _render(self, path: str, data: bytes, width: int, fmt: str) -> str:
+        loop = asyncio.get_running_loop()
+        thumbnail = await loop.run_in_executor(self._pool(), render_thumbnail, data, width, fmt)
+        await asyncio.to_thread(self._write, path, thumbnail)
+        return path
+
+    async def placeholder(self, data: bytes) -> str:
+        """Resmin küçük, düşük kaliteli hali (data: URI); JS decoder gerektirmez"""
+        fmt = 'webp' if 'webp' in available_formats() else 'jpeg'
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(
+            self._pool(), render_thumbnail, data, PLACEHOLDER_WIDTH, fmt, PLACEHOLDER_QUALITY
+        )
+        return f"data:{FORMAT_TYPES[fmt]};base64,{base64.b64encode(content).decode()}"
+
+    @staticmethod
+    def _write(path: str, content: bytes):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def cleanup(self) -> int:
+        """Süresi dolmuş küçük resimleri sil"""
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime >= self.ttl:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"Thumbnail cache cleanup removed {removed} entries")
+        return removed
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,125 @@
+import time
+from typing import Optional
+
+# Çözünürlük adı -> (bucket süresi sn, saklama süresi sn)
+RESOLUTIONS = {
+    '1m': (60, 2 * 86400),
+    '1h': (3600, 60 * 86400),
+    '1d': (86400, 730 * 86400),
+}
+
+# Ham örnekler 1m serisine yazılır, üst çözünürlükler ortalama alınarak üretilir
+DOWNSAMPLED = ('1h', '1d')
+
+METRICS = ('cpu_percent', 'memory_percent', 'disk_percent', 'request_rate', 'queue_depth')
+
+
+class TimeSeriesStore:
+    """Redis sorted set'lerinde tutulan, otomatik downsampling yapan zaman serisi deposu
+
+    Her seri için ts:{metric}:{resolution} anahtarında score=bucket başlangıcı,
+    member="{bucket}:{değer}" olarak saklanır. Üst çözünürlüklerin açık bucket'ları
+    ts:{metric}:{resolution}:acc hash'inde toplam/adet olarak birikir ve bucket
+    kapandığında ortalama sorted set'e yazılır.
+    """
+
+    def __init__(self, redis_client, prefix: str = 'ts'):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _key(self, metric: str, resolution: str) -> str:
+        return f"{self.prefix}:{metric}:{resolution}"
+
+    @staticmethod
+    def _bucket(timestamp: float, resolution: str) -> int:
+        step = RESOLUTIONS[resolution][0]
+        return int(timestamp // step * step)
+
+    def add_samples(self, samples: dict, timestamp: Optional[float] = None):
+        """Birden fazla metriğin örneğini tek pipeline ile kaydet"""
+        timestamp = timestamp or time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for metric, value in samples.items():
+            if value is None:
+                continue
+            value = float(value)
+
+            # Ham seri: aynı dakikaya düşen önceki örneğin yerine geçer
+            bucket = self._bucket(timestamp, '1m')
+            key = self._key(metric, '1m')
+            pipe.zremrangebyscore(key, bucket, bucket)
+            pipe.zadd(key, {f"{bucket}:{value}": bucket})
+            pipe.zremrangebyscore(key, '-inf', timestamp - RESOLUTIONS['1m'][1])
+
+            for resolution in DOWNSAMPLED:
+                bucket = self._bucket(timestamp, resolution)
+                acc_key = f"{self._key(metric, resolution)}:acc"
+                pipe.hincrbyfloat(acc_key, f"{bucket}:sum", value)
+                pipe.hincrby(acc_key, f"{bucket}:count", 1)
+        pipe.execute()
+
+        for metric in samples:
+            for resolution in DOWNSAMPLED:
+                self._rollup(metric, resolution, timestamp)
+
+    def _rollup(self, metric: str, resolution: str, timestamp: float):
+        """Kapanmış bucket'ların ortalamasını seriye yaz"""
+        key = self._key(metric, resolution)
+        acc_key = f"{key}:acc"
+        current = self._bucket(timestamp, resolution)
+        acc = self.redis.hgetall(acc_key)
+
+        buckets = {}
+        for field, raw in acc.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            bucket, kind = field.split(':')
+            buckets.setdefault(int(bucket), {})[kind] = float(raw)
+
+        closed = [b for b in buckets if b < current]
+        if not closed:
+            return
+
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket in closed:
+            totals = buckets[bucket]
+            if totals.get('count'):
+                average = round(totals['sum'] / totals['count'], 4)
+                pipe.zremrangebyscore(key, bucket, bucket)
+                pipe.zadd(key, {f"{bucket}:{average}": bucket})
+            pipe.hdel(acc_key, f"{bucket}:sum", f"{bucket}:count")
+        pipe.zremrangebyscore(key, '-inf', timestamp - RESOLUTIONS[resolution][1])
+        pipe.execute()
+
+    @staticmethod
+    def pick_resolution(start: float, end: float) -> str:
+        """Aralığın uzunluğuna göre en uygun çözünürlüğü seç"""
+        span = end - start
+        if span <= RESOLUTIONS['1m'][1]:
+            return '1m'
+        if span <= RESOLUTIONS['1h'][1]:
+            return '1h'
+        return '1d'
+
+    def range(self, metric: str, start: float, end: float, resolution: Optional[str] = None) -> list:
+        """[start, end] aralığındaki (timestamp, değer) çiftlerini getir"""
+        resolution = resolution or self.pick_resolution(start, end)
+        members = self.redis.zrangebyscore(self._key(metric, resolution), start, end)
+        points = []
+        for member in members:
+            member = member.decode() if isinstance(member, bytes) else member
+            bucket, value = member.split(':', 1)
+            points.append((int(bucket), float(value)))
+        return points
+
+
+def sparkline_points(values: list, width: int = 200, height: int = 40) -> str:
+    """Değer listesini SVG polyline 'points' attribute'una çevir"""
+    if len(values) < 2:
+        return ''
+    low, high = min(values), max(values)
+    spread = (high - low) or 1
+    step = width / (len(values) - 1)
+    return ' '.join(
+        f"{i * step:.1f},{height - (v - low) / spread * height:.1f}"
+        for i, v in enumerate(values)
+    )
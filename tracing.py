@@ -0,0 +1,133 @@
+import logging
+import os
+from contextlib import nullcontext
+
+try:
+    from opentelemetry import context, trace, propagate
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:  # opentelemetry kurulu değilse tracing devre dışı
+    context = trace = propagate = None
+
+logger = logging.getLogger('instatest')
+
+# OTEL_TRACES_EXPORTER: otlp (OTEL_EXPORTER_OTLP_ENDPOINT'e gönderir),
+# file (OTEL_TRACES_FILE'a satır başına bir span JSON'u yazar) veya none
+EXPORTER = os.getenv('OTEL_TRACES_EXPORTER', 'none').lower()
+TRACES_FILE = os.getenv('OTEL_TRACES_FILE', 'logs/traces.jsonl')
+
+_enabled = False
+
+
+def setup_tracing(service_name: str) -> bool:
+    """Tracer provider'ı, exporter'ı ve HTTP client instrumentasyonlarını kur"""
+    global _enabled
+    if _enabled or trace is None or EXPORTER == 'none':
+        return _enabled
+
+    if EXPORTER == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif EXPORTER == 'file':
+        os.makedirs(os.path.dirname(TRACES_FILE) or '.', exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(TRACES_FILE, 'a'),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep
+        )
+    else:
+        logger.warning(f"Unknown OTEL_TRACES_EXPORTER: {EXPORTER}, tracing disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    # aiohttp ve requests çağrıları otomatik span üretsin ve traceparent header'ı taşısın
+    try:
+        from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor
+        AioHttpClientInstrumentor().instrument()
+    except ImportError:
+        logger.warning("opentelemetry-instrumentation-aiohttp-client not installed")
+    try:
+        from opentelemetry.instrumentation.requests import RequestsInstrumentor
+        RequestsInstrumentor().instrument()
+    except ImportError:
+        logger.warning("opentelemetry-instrumentation-requests not installed")
+
+    _enabled = True
+    return True
+
+
+def span(name: str, **attributes):
+    """Aktif context altında yeni bir span aç (tracing kapalıysa no-op)"""
+    if not _enabled:
+        return nullcontext()
+    return trace.get_tracer('instatest').start_as_current_span(name, attributes=attributes)
+
+
+def server_span(name: str, headers, **attributes):
+    """Gelen istek için span aç, istemcinin traceparent header'ını parent olarak kullan"""
+    if not _enabled:
+        return nullcontext()
+    return trace.get_tracer('instatest').start_as_current_span(
+        name, context=propagate.extract(headers),
+        kind=trace.SpanKind.SERVER, attributes=attributes
+    )
+
+
+def set_attribute(key: str, value):
+    """Aktif span'e attribute ekle"""
+    if _enabled:
+        trace.get_current_span().set_attribute(key, value)
+
+
+def inject_headers(headers: dict):
+    """Aktif trace context'ini header sözlüğüne yaz"""
+    if _enabled:
+        propagate.inject(headers)
+
+
+class _CeleryRequestCarrier(dict):
+    """Celery task.request üzerindeki custom header'ları propagator'a sözlük gibi göster"""
+
+    def __init__(self, request):
+        super().__init__()
+        for key in ('traceparent', 'tracestate', 'baggage'):
+            value = getattr(request, key, None)
+            if value is None and isinstance(getattr(request, 'headers', None), dict):
+                value = request.headers.get(key)
+            if value is not None:
+                self[key] = value
+
+
+def instrument_celery(signals):
+    """Task yayınlarken context'i header'lara yaz, worker'da span olarak devam ettir"""
+    active_spans = {}
+
+    @signals.before_task_publish.connect(weak=False)
+    def _inject(headers=None, **kwargs):
+        if headers is not None:
+            inject_headers(headers)
+
+    @signals.task_prerun.connect(weak=False)
+    def _start(task_id=None, task=None, **kwargs):
+        if not _enabled:
+            return
+        parent = propagate.extract(_CeleryRequestCarrier(task.request))
+        task_span = trace.get_tracer('instatest').start_span(
+            f"celery.task {task.name}", context=parent,
+            attributes={'celery.task_id': task_id}
+        )
+        token = context.attach(trace.set_span_in_context(task_span))
+        active_spans[task_id] = (task_span, token)
+
+    @signals.task_postrun.connect(weak=False)
+    def _end(task_id=None, state=None, **kwargs):
+        entry = active_spans.pop(task_id, None)
+        if entry is None:
+            return
+        task_span, token = entry
+        task_span.set_attribute('celery.state', state or '')
+        context.detach(token)
+        task_span.end()
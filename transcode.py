@@ -0,0 +1,179 @@
+import json
+import logging
+import subprocess
+import time
+from typing import Optional
+
+from metrics import (
+    TRANSCODER_ACTIVE, TRANSCODE_DECISIONS, TRANSCODE_DURATION, STAGE_TRANSCODE, stage_timer
+)
+
+logger = logging.getLogger('instatest')
+
+FFPROBE_TIMEOUT = 15
+
+# MP4'e kopyalanabilen ve tarayıcılarda sorunsuz oynayan codec'ler
+MP4_VIDEO_CODECS = {'h264'}
+MP4_AUDIO_CODECS = {'aac'}
+MP4_PIXEL_FORMATS = {'yuv420p', 'yuvj420p'}
+
+# Dönüşüm yolları: remux (stream copy), sadece sesi yeniden kodla, tam transcode
+MODE_COPY = 'copy'
+MODE_AUDIO = 'audio'
+MODE_TRANSCODE = 'transcode'
+
+_MP4_ARGS = {
+    MODE_COPY: ['-c', 'copy'],
+    MODE_AUDIO: ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '128k'],
+    MODE_TRANSCODE: ['-c:v', 'libx264', '-preset', 'medium', '-c:a', 'aac', '-b:a', '128k'],
+}
+
+
+def probe(input_file: str) -> Optional[dict]:
+    """ffprobe ile ilk video / ses akışının codec bilgisi; okunamazsa None"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'stream=codec_type,codec_name,pix_fmt',
+            '-of', 'json', input_file
+        ], capture_output=True, check=True, timeout=FFPROBE_TIMEOUT)
+        streams = json.loads(result.stdout).get('streams', [])
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        logger.warning(f"ffprobe failed for {input_file}: {str(e)}")
+        return None
+
+    info = {'video': None, 'pix_fmt': None, 'audio': None}
+    for stream in streams:
+        if stream.get('codec_type') == 'video' and info['video'] is None:
+            info['video'] = stream.get('codec_name')
+            info['pix_fmt'] = stream.get('pix_fmt')
+        elif stream.get('codec_type') == 'audio' and info['audio'] is None:
+            info['audio'] = stream.get('codec_name')
+    return info
+
+
+def plan_mp4(info: Optional[dict]) -> str:
+    """Probe sonucuna göre MP4 için gereken en ucuz dönüşüm yolu"""
+    if not info or info['video'] not in MP4_VIDEO_CODECS:
+        return MODE_TRANSCODE
+    if info['pix_fmt'] and info['pix_fmt'] not in MP4_PIXEL_FORMATS:
+        return MODE_TRANSCODE
+    if info['audio'] is None or info['audio'] in MP4_AUDIO_CODECS:
+        return MODE_COPY
+    return MODE_AUDIO
+
+
+def _run_mp4(input_file: str, output_file: str, mode: str):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-i', input_file,
+        *_MP4_ARGS[mode],
+        '-movflags', '+faststart',
+        output_file
+    ], check=True)
+
+
+# Ses çıkarma: AAC iz m4a'ya kopyalanır (yeniden kodlama yok), MP3 isteğe bağlı
+AUDIO_CODECS = ('auto', 'm4a', 'mp3')
+M4A_AUDIO_CODECS = {'aac'}
+
+# Parçalı MP4: moov başta ve boş, ~1 sn'lik fragment'lar; dosya yazılırken bile oynatılabilir
+_FRAGMENTED_MP4_ARGS = [
+    '-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+    '-frag_duration', '1000000',
+]
+
+
+def extract_audio(input_file: str, codec: str = 'auto') -> tuple:
+    """Videodan sesi çıkar; (dosya, uzantı) döner.
+
+    auto: AAC ise m4a'ya kopyala, değilse MP3. m4a: AAC ise kopyala, değilse AAC'ye kodla.
+    mp3: her zaman libmp3lame ile yeniden kodla.
+    """
+    if codec == 'mp3':
+        return convert_to_mp3(input_file), 'mp3'
+
+    info = probe(input_file)
+    audio = info['audio'] if info else None
+    if codec == 'auto' and audio not in M4A_AUDIO_CODECS:
+        return convert_to_mp3(input_file), 'mp3'
+    return convert_to_m4a(input_file, copy=audio in M4A_AUDIO_CODECS), 'm4a'
+
+
+def convert_to_m4a(input_file: str, copy: bool = True) -> str:
+    """Ses izini parçalı m4a'ya yaz; copy=True ise AAC iz yeniden kodlanmadan kopyalanır"""
+    output_file = f"{input_file}.m4a"
+    mode = 'm4a_copy' if copy else 'm4a_aac'
+    start = time.perf_counter()
+    try:
+        with TRANSCODER_ACTIVE.track_inprogress(), stage_timer(STAGE_TRANSCODE):
+            subprocess.run([
+                'ffmpeg', '-y', '-v', 'error', '-i', input_file,
+                '-vn', '-map', '0:a:0',
+                *(['-c:a', 'copy'] if copy else ['-c:a', 'aac', '-b:a', '128k']),
+                *_FRAGMENTED_MP4_ARGS,
+                '-f', 'mp4', output_file
+            ], check=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"M4A conversion error: {str(e)}")
+        TRANSCODE_DECISIONS.labels(mode=mode, result='error').inc()
+        raise Exception("M4A dönüşümü başarısız oldu")
+    TRANSCODE_DECISIONS.labels(mode=mode, result='ok').inc()
+    TRANSCODE_DURATION.labels(mode=mode).observe(time.perf_counter() - start)
+    return output_file
+
+
+def convert_to_mp3(input_file: str) -> str:
+    """Video dosyasını MP3'e dönüştür"""
+    output_file = f"{input_file}.mp3"
+    start = time.perf_counter()
+    try:
+        with TRANSCODER_ACTIVE.track_inprogress(), stage_timer(STAGE_TRANSCODE):
+            subprocess.run([
+                'ffmpeg', '-y', '-v', 'error', '-i', input_file,
+                '-vn', '-acodec', 'libmp3lame',
+                '-ab', '192k', '-ar', '44100',
+                output_file
+            ], check=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"MP3 conversion error: {str(e)}")
+        TRANSCODE_DECISIONS.labels(mode='mp3', result='error').inc()
+        raise Exception("MP3 dönüşümü başarısız oldu")
+    TRANSCODE_DECISIONS.labels(mode='mp3', result='ok').inc()
+    TRANSCODE_DURATION.labels(mode='mp3').observe(time.perf_counter() - start)
+    return output_file
+
+
+def convert_to_mp4(input_file: str) -> str:
+    """Video dosyasını MP4'e dönüştür; codec'ler uygunsa yeniden kodlamadan remux et"""
+    output_file = f"{input_file}.mp4"
+    start = time.perf_counter()
+    with TRANSCODER_ACTIVE.track_inprogress(), stage_timer(STAGE_TRANSCODE):
+        info = probe(input_file)
+        probe_ms = (time.perf_counter() - start) * 1000
+        mode = plan_mp4(info)
+        try:
+            _run_mp4(input_file, output_file, mode)
+        except subprocess.CalledProcessError as e:
+            if mode == MODE_TRANSCODE:
+                logger.error(f"MP4 conversion error: {str(e)}")
+                TRANSCODE_DECISIONS.labels(mode=mode, result='error').inc()
+                raise Exception("MP4 dönüşümü başarısız oldu")
+            # Kopyalama beklenmedik bir konteyner yüzünden başarısız olursa tam transcode dene
+            logger.warning(f"MP4 {mode} failed, falling back to transcode: {str(e)}")
+            TRANSCODE_DECISIONS.labels(mode=mode, result='fallback').inc()
+            mode = MODE_TRANSCODE
+            try:
+                _run_mp4(input_file, output_file, mode)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"MP4 conversion error: {str(e)}")
+                TRANSCODE_DECISIONS.labels(mode=mode, result='error').inc()
+                raise Exception("MP4 dönüşümü başarısız oldu")
+
+    elapsed = time.perf_counter() - start
+    TRANSCODE_DECISIONS.labels(mode=mode, result='ok').inc()
+    TRANSCODE_DURATION.labels(mode=mode).observe(elapsed)
+    logger.info(
+        f"MP4 conversion via {mode} in {elapsed * 1000:.0f}ms "
+        f"(probe {probe_ms:.0f}ms, streams {info})"
+    )
+    return output_file